@@ -1,8 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
+from flask import Flask, Blueprint, current_app, render_template, request, jsonify, send_file, session, redirect, url_for, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.security import safe_join
 import os
 import time
+import io
+import mimetypes
+import csv
+import json
 from datetime import datetime, timedelta
+from urllib.parse import quote
 from dotenv import load_dotenv, find_dotenv
 
 # 載入環境變數（使用當前目錄的 .env 檔案）
@@ -67,79 +73,207 @@ from services.veo_service import VeoService
 from video_services.openai_video_service import OpenAIVideoService
 from services.simple_admin_service import SimpleAdminService
 from services.simple_stats_service import SimpleStatsService
+from services.job_service import JobService
+from services.operation_tracker import OperationTracker
+from services.rate_limiter import get_rate_limiter
+from services.circuit_breaker import get_circuit_breakers
+from services.result_cache import GenerationResultCache
+from services.llm_cache import LLMResponseCache
+from services.file_etag import FileETagCache
+from services.service_registry import ServiceRegistry
 from prompt_optimizer.prompt_analyzer import PromptAnalyzer
+from prompt_optimizer.style_optimizer import StyleOptimizer
 from pricing_calculator.price_calculator import PriceCalculator
 
-# 建立 Flask 應用程式
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# 會話配置
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
-
-# 啟用 CORS
-CORS(app)
-
-# 除錯資訊：確認 GEMINI_MODEL 設定
-print(f"🔍 除錯資訊 - GEMINI_MODEL 環境變數: {os.environ.get('GEMINI_MODEL')}")
-print(f"🔍 除錯資訊 - app.config['GEMINI_MODEL']: {app.config['GEMINI_MODEL']}")
-
-# 初始化服務
-gemini_service = GeminiService(
-    api_key=app.config['GEMINI_API_KEY'],
-    model_name=app.config['GEMINI_MODEL']
-)
-# 初始化 OpenAI LLM 服務用於 prompt 優化
-openai_llm_service = OpenAILLMService()
-# 檢查 Google Cloud 專案設定
-google_cloud_project = app.config.get('GOOGLE_CLOUD_PROJECT')
-if google_cloud_project:
-    print(f"✅ Google Cloud 專案 ID: {google_cloud_project}")
-    use_imagen_mock = False
-else:
-    print("⚠️ 未設定 Google Cloud 專案 ID")
-    print("🔧 使用 Imagen 模擬模式")
-    use_imagen_mock = True
-
-imagen_service = ImagenService(
-    project_id=google_cloud_project,
-    location=app.config.get('GOOGLE_CLOUD_LOCATION', 'us-central1'),
-    use_mock=use_imagen_mock,
-    model_name=app.config.get('IMAGE_GEN_MODEL')
-)
-openai_image_service = OpenAIImageService()
-image_search_service = GoogleImageSearchService()
-veo_service = VeoService(
-    project_id=google_cloud_project,
-    location=app.config.get('GOOGLE_CLOUD_LOCATION', 'us-central1')
-)
-openai_video_service = OpenAIVideoService()
-prompt_analyzer = PromptAnalyzer(openai_llm_service)
-price_calculator = PriceCalculator()
-
-# 初始化管理服務
-admin_service = SimpleAdminService()
-stats_service = SimpleStatsService()
-
-@app.route('/')
+# 路由集中在 Blueprint，由 create_app() 註冊到應用程式
+bp = Blueprint('main', __name__)
+
+# 服務註冊表：每個程序（gunicorn worker）各自建立自己的服務實例，第一次使用時才建立，
+# 執行緒池、資料庫連線與快取等可變狀態不在程序間共用
+service_registry = ServiceRegistry()
+
+gemini_service = service_registry.lazy('gemini')
+openai_llm_service = service_registry.lazy('openai_llm')
+imagen_service = service_registry.lazy('imagen')
+openai_image_service = service_registry.lazy('openai_image')
+image_search_service = service_registry.lazy('image_search')
+veo_service = service_registry.lazy('veo')
+openai_video_service = service_registry.lazy('openai_video')
+prompt_analyzer = service_registry.lazy('prompt_analyzer')
+price_calculator = service_registry.lazy('price_calculator')
+admin_service = service_registry.lazy('admin')
+stats_service = service_registry.lazy('stats')
+job_service = service_registry.lazy('jobs')
+operation_tracker = service_registry.lazy('operations')
+result_cache = service_registry.lazy('result_cache')
+llm_cache = service_registry.lazy('llm_cache')
+file_etag_cache = service_registry.lazy('file_etags')
+style_optimizer = service_registry.lazy('style_optimizer')
+
+def _register_services(config):
+    """依應用程式設定註冊各服務的建立函數"""
+    google_cloud_project = config.get('GOOGLE_CLOUD_PROJECT')
+    location = config.get('GOOGLE_CLOUD_LOCATION', 'us-central1')
+
+    def build_imagen_service():
+        # 檢查 Google Cloud 專案設定
+        if google_cloud_project:
+            print(f"✅ Google Cloud 專案 ID: {google_cloud_project}")
+            use_imagen_mock = False
+        else:
+            print("⚠️ 未設定 Google Cloud 專案 ID")
+            print("🔧 使用 Imagen 模擬模式")
+            use_imagen_mock = True
+
+        return ImagenService(
+            project_id=google_cloud_project,
+            location=location,
+            use_mock=use_imagen_mock,
+            model_name=config.get('IMAGE_GEN_MODEL'),
+            max_concurrent_batches=config['IMAGEN_MAX_CONCURRENT_BATCHES'],
+            output_dir=os.path.join(config['GENERATED_FOLDER'], 'images')
+        )
+
+    def build_stats_service():
+        service = SimpleStatsService(
+            write_behind=config['STATS_WRITE_BEHIND'],
+            batch_size=config['STATS_BATCH_SIZE'],
+            flush_interval=config['STATS_FLUSH_INTERVAL_MS'] / 1000
+        )
+        if config['STATS_RETENTION_DAYS'] > 0:
+            service.start_retention_worker(
+                days=config['STATS_RETENTION_DAYS'],
+                interval=config['STATS_RETENTION_INTERVAL_HOURS'] * 3600,
+                chunk_size=config['STATS_RETENTION_CHUNK_SIZE'],
+                archive_dir=config['STATS_ARCHIVE_DIR'] or None
+            )
+        return service
+
+    service_registry.register('gemini', lambda: GeminiService(
+        api_key=config['GEMINI_API_KEY'],
+        model_name=config['GEMINI_MODEL']
+    ))
+    # OpenAI LLM 服務用於 prompt 優化
+    service_registry.register('openai_llm', OpenAILLMService)
+    service_registry.register('imagen', build_imagen_service)
+    service_registry.register('openai_image', lambda: OpenAIImageService(generated_dir=config['GENERATED_FOLDER']))
+    service_registry.register('image_search', lambda: GoogleImageSearchService(download_dir=config['DOWNLOADED_IMAGES_FOLDER']))
+    service_registry.register('veo', lambda: VeoService(
+        project_id=google_cloud_project,
+        location=location,
+        operation_tracker=operation_tracker,
+        generated_dir=config['GENERATED_FOLDER']
+    ))
+    service_registry.register('openai_video', lambda: OpenAIVideoService(generated_dir=config['GENERATED_FOLDER']))
+    service_registry.register('prompt_analyzer', lambda: PromptAnalyzer(openai_llm_service))
+    service_registry.register('price_calculator', PriceCalculator)
+
+    # 管理與統計服務
+    service_registry.register('admin', SimpleAdminService)
+    service_registry.register('stats', build_stats_service)
+
+    # 背景任務服務（設定共用儲存時，任一 worker 都能查詢其他 worker 的任務）
+    service_registry.register('jobs', lambda: JobService(
+        worker_limits={
+            'image': config['JOB_IMAGE_WORKERS'],
+            'video': config['JOB_VIDEO_WORKERS']
+        },
+        max_pending=config['JOB_MAX_PENDING'],
+        result_ttl=config['JOB_RESULT_TTL'],
+        store_path=config['JOB_STORE_PATH'] or None
+    ))
+
+    # 長時間操作追蹤器（Veo 影片生成），單一背景執行緒輪詢所有進行中的操作
+    def build_operation_tracker():
+        tracker = OperationTracker(
+            store_path=config['OPERATION_STORE_PATH'],
+            initial_delay=config['VEO_POLL_INITIAL_DELAY'],
+            max_delay=config['VEO_POLL_MAX_DELAY'],
+            multiplier=config['VEO_POLL_MULTIPLIER'],
+            jitter=config['VEO_POLL_JITTER'],
+            timeout=config['VEO_OPERATION_TIMEOUT']
+        )
+        tracker.default_callback = _complete_resumed_operation
+        return tracker
+
+    service_registry.register('operations', build_operation_tracker)
+
+    # 生成結果快取與 LLM 回應快取（prompt 優化與翻譯）
+    service_registry.register('result_cache', lambda: GenerationResultCache(
+        db_path=config['RESULT_CACHE_PATH'],
+        max_entries=config['RESULT_CACHE_MAX_ENTRIES'],
+        ttl=config['RESULT_CACHE_TTL']
+    ))
+    service_registry.register('llm_cache', lambda: LLMResponseCache(
+        db_path=config['LLM_CACHE_PATH'],
+        max_entries=config['LLM_CACHE_MAX_ENTRIES']
+    ))
+
+    # 生成檔案的內容 ETag（/generated/ 條件式請求）
+    service_registry.register('file_etags', FileETagCache)
+
+    # 六種風格 Prompt 優化器（每種風格並行請求）
+    service_registry.register('style_optimizer', lambda: StyleOptimizer(
+        openai_llm_service,
+        llm_cache=llm_cache,
+        style_timeout=config['PROMPT_STYLE_TIMEOUT']
+    ))
+
+def create_app(config_object=Config):
+    """
+    建立 Flask 應用程式
+
+    每個 worker 程序各自呼叫一次（gunicorn: `app_ai_generate:create_app()`），
+    服務在該程序內建立，程序之間不共用可變狀態。
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+
+    # 會話配置（多個 worker 需使用相同的 SECRET_KEY 才能共用登入狀態）
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+
+    # 啟用 CORS
+    CORS(app)
+
+    # 除錯資訊：確認 GEMINI_MODEL 設定
+    print(f"🔍 除錯資訊 - GEMINI_MODEL 環境變數: {os.environ.get('GEMINI_MODEL')}")
+    print(f"🔍 除錯資訊 - app.config['GEMINI_MODEL']: {app.config['GEMINI_MODEL']}")
+
+    _register_services(app.config)
+    app.register_blueprint(bp)
+
+    # 保留作業需在啟動時開始，因此統計服務不延遲建立
+    if app.config['STATS_RETENTION_DAYS'] > 0:
+        service_registry.get('stats')
+
+    # 預先建立指定的服務（在背景執行，不阻塞啟動）
+    if app.config['SERVICE_WARMUP']:
+        warmup_names = None if app.config['SERVICE_WARMUP'] == 'all' else [
+            name.strip() for name in app.config['SERVICE_WARMUP'].split(',') if name.strip()
+        ]
+        service_registry.warm_up(warmup_names, background=True)
+
+    return app
+
+@bp.route('/')
 def index():
     """主頁面"""
     return render_template('index.html')
 
 # 管理功能路由
-@app.route('/admin/login')
+@bp.route('/admin/login')
 def admin_login():
     """管理員登入頁面"""
     if admin_service.is_admin_authenticated():
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('.admin_dashboard'))
     return render_template('admin_login.html')
 
-@app.route('/admin')
+@bp.route('/admin')
 def admin_dashboard():
     """管理區首頁"""
     if not admin_service.is_admin_authenticated():
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('.admin_login'))
     
     admin_username = admin_service.get_admin_username()
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -149,7 +283,7 @@ def admin_dashboard():
                          current_time=current_time)
 
 # 管理 API 路由
-@app.route('/api/admin/login', methods=['POST'])
+@bp.route('/api/admin/login', methods=['POST'])
 def api_admin_login():
     """管理員登入 API"""
     data = request.get_json()
@@ -171,32 +305,135 @@ def api_admin_login():
     else:
         return jsonify(result), 401
 
-@app.route('/api/admin/logout')
+@bp.route('/api/admin/logout')
 def api_admin_logout():
     """管理員登出 API"""
     admin_service.logout_admin()
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-@app.route('/api/admin/statistics', methods=['GET'])
+@bp.route('/api/admin/statistics', methods=['GET'])
 def api_admin_statistics():
     """獲取統計資訊 API（管理員專用）"""
     if not admin_service.is_admin_authenticated():
         return jsonify({'error': '需要管理員權限'}), 403
     
     stats = stats_service.get_statistics()
+    stats['jobs'] = job_service.get_statistics()
+    stats['rate_limits'] = get_rate_limiter().get_statistics()
+    if service_registry.is_built('operations'):
+        stats['operations'] = operation_tracker.get_statistics()
+    stats['circuit_breakers'] = get_circuit_breakers().get_statistics()
+    stats['result_cache'] = result_cache.get_statistics()
+    stats['llm_cache'] = llm_cache.get_statistics()
+    if service_registry.is_built('file_etags'):
+        stats['file_etags'] = file_etag_cache.get_statistics()
+    stats['services'] = service_registry.get_statistics()
     return jsonify({'success': True, 'statistics': stats})
 
-@app.route('/api/admin/recent-generations', methods=['GET'])
+@bp.route('/api/admin/rollups', methods=['GET'])
+def api_admin_rollups():
+    """獲取每小時 / 每日彙總統計 API（管理員專用）"""
+    if not admin_service.is_admin_authenticated():
+        return jsonify({'error': '需要管理員權限'}), 403
+    
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in ('hour', 'day'):
+        return jsonify({'error': 'granularity 必須為 hour 或 day'}), 400
+    
+    rollups = stats_service.get_rollups(
+        granularity=granularity,
+        start=request.args.get('from'),
+        end=request.args.get('to'),
+        generation_type=request.args.get('type'),
+        model_name=request.args.get('model')
+    )
+    return jsonify({'success': True, 'granularity': granularity, 'rollups': rollups})
+
+@bp.route('/api/admin/latency-summary', methods=['GET'])
+def api_admin_latency_summary():
+    """獲取各模型延遲百分位數摘要 API（管理員專用）"""
+    if not admin_service.is_admin_authenticated():
+        return jsonify({'error': '需要管理員權限'}), 403
+    
+    summary = stats_service.get_latency_summary(
+        start=request.args.get('from'),
+        end=request.args.get('to')
+    )
+    return jsonify({'success': True, 'summary': summary})
+
+@bp.route('/api/admin/export', methods=['GET'])
+def api_admin_export():
+    """串流匯出生成記錄 API（管理員專用），支援 CSV 與 JSONL"""
+    if not admin_service.is_admin_authenticated():
+        return jsonify({'error': '需要管理員權限'}), 403
+    
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'jsonl'):
+        return jsonify({'error': 'format 必須為 csv 或 jsonl'}), 400
+    
+    start = request.args.get('from')
+    end = request.args.get('to')
+    for value in (start, end):
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                return jsonify({'error': f'無效的時間格式: {value}'}), 400
+    
+    columns = stats_service.EXPORT_COLUMNS
+    rows = stats_service.iter_generations(start=start, end=end)
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # 加上 BOM 讓 Excel 正確辨識 UTF-8 中文
+        buffer.write('\ufeff')
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    def generate_jsonl():
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+    
+    filename = f"generations-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(generate_csv() if export_format == 'csv' else generate_jsonl()),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@bp.route('/api/admin/recent-generations', methods=['GET'])
 def api_admin_recent_generations():
     """獲取最近生成記錄 API（管理員專用）"""
     if not admin_service.is_admin_authenticated():
         return jsonify({'error': '需要管理員權限'}), 403
     
-    limit = request.args.get('limit', 20, type=int)
-    generations = stats_service.get_recent_generations(limit)
-    return jsonify({'success': True, 'generations': generations})
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    
+    try:
+        page = stats_service.get_generations_page(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            generation_type=request.args.get('type'),
+            status=request.args.get('status'),
+            model_name=request.args.get('model'),
+            prompt_query=request.args.get('q', '').strip() or None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'generations': page['generations'], 'next_cursor': page['next_cursor']})
 
-@app.route('/api/image/optimize-prompt', methods=['POST'])
+@bp.route('/api/image/optimize-prompt', methods=['POST'])
 def optimize_image_prompt():
     """優化圖像生成的 prompt - 提供六種風格化建議"""
     data = request.get_json()
@@ -208,93 +445,25 @@ def optimize_image_prompt():
     if not prompt:
         return jsonify({'error': 'Prompt 不能為空'}), 400
     
-    if len(prompt) > app.config['MAX_PROMPT_LENGTH']:
-        return jsonify({'error': f'Prompt 長度不能超過 {app.config["MAX_PROMPT_LENGTH"]} 字元'}), 400
+    if len(prompt) > current_app.config['MAX_PROMPT_LENGTH']:
+        return jsonify({'error': f'Prompt 長度不能超過 {current_app.config["MAX_PROMPT_LENGTH"]} 字元'}), 400
     
-    try:
-        # 使用 OpenAI LLM 服務生成六種不同風格的優化版本
-        optimization_prompt = f"""
-請為以下圖像生成 prompt 提供六種不同風格的優化版本：
+    result = style_optimizer.optimize(prompt, 'image')
+    if not result['success']:
+        return jsonify({'error': result['error']}), 500
+    return jsonify(result)
 
-原始 prompt：
-{prompt}
+@bp.route('/api/image/optimize-prompt/stream', methods=['POST'])
+def stream_optimize_image_prompt():
+    """優化圖像生成的 prompt - 以 SSE 逐一回傳完成的風格"""
+    return _stream_style_optimizations(request.get_json(), 'image')
 
-請提供六種風格優化版本，每個版本都要保持原意，但應用不同的視覺風格：
-
-1. 自然清新風 (Natural & Clean)：提升整體亮度與對比度，強化綠色與藍色的飽和度，柔化膚色、減少雜訊，適合風景照或日光人像
-2. 電影感風格 (Cinematic Look)：壓低高光、拉深陰影，添加冷色調或橙青對比色分級，加入黑邊或 21:9 膠片比例遮幅，適合街景、情感人像、夜景
-3. 復古懷舊風 (Vintage/Retro)：降低飽和度，添加黃色或綠色色調，模擬底片顆粒與雜訊，使用色調曲線模擬舊照片褪色感，適合文青風或老街場景
-4. 高質感商業風 (High-End Editorial)：精準膚色校正，銳化重點細節（如眼睛、配飾），背景去雜，控制景深或加柔焦，適合人像特寫或商品攝影
-5. 黑白極簡風 (Monochrome Minimalism)：轉為黑白灰階，加強光影對比與形狀線條表現，清除雜點與背景干擾，適合強調情緒或幾何結構
-6. 夢幻光影風 (Soft Dreamy)：加入柔焦/光暈效果，使用粉色、紫色、淡藍作色調分級，降低清晰度，強調柔和過渡，適合婚紗、日落、森林漫步類主題
-
-請按以下格式返回，每個版本用 "---" 分隔：
-
-版本1：[自然清新風格的優化 prompt]
----
-版本2：[電影感風格的優化 prompt]
----
-版本3：[復古懷舊風格的優化 prompt]
----
-版本4：[高質感商業風格的優化 prompt]
----
-版本5：[黑白極簡風格的優化 prompt]
----
-版本6：[夢幻光影風格的優化 prompt]
-"""
-        
-        response = openai_llm_service.generate_content(optimization_prompt)
-        
-        if response and 'content' in response:
-            content = response['content'].strip()
-            
-            # 解析六個版本
-            versions = content.split('---')
-            optimizations = []
-            
-            for i, version in enumerate(versions):
-                version = version.strip()
-                # 移除版本標籤（如 "版本1："）
-                if '：' in version:
-                    version = version.split('：', 1)[1].strip()
-                elif ':' in version:
-                    version = version.split(':', 1)[1].strip()
-                
-                if version:
-                    optimizations.append(version)
-            
-            # 確保有六個版本
-            style_names = [
-                "自然清新風 (Natural & Clean)",
-                "電影感風格 (Cinematic Look)", 
-                "復古懷舊風 (Vintage/Retro)",
-                "高質感商業風 (High-End Editorial)",
-                "黑白極簡風 (Monochrome Minimalism)",
-                "夢幻光影風 (Soft Dreamy)"
-            ]
-            
-            while len(optimizations) < 6:
-                optimizations.append(prompt)  # 如果解析失敗，使用原始 prompt
-            
-            return jsonify({
-                'success': True,
-                'original_prompt': prompt,
-                'optimizations': optimizations[:6],  # 只取前六個
-                'style_names': style_names
-            })
-        else:
-            return jsonify({'error': '優化服務暫時不可用'}), 500
-            
-    except Exception as e:
-        print(f"❌ Prompt 優化失敗: {e}")
-        return jsonify({'error': f'優化失敗: {str(e)}'}), 500
-
-@app.route('/api/image/calculate-price', methods=['POST'])
+@bp.route('/api/image/calculate-price', methods=['POST'])
 def calculate_image_price():
     """價格計算功能已停用"""
     return jsonify({'error': '價格計算功能已停用'}), 404
 
-@app.route('/api/image/translate-prompt', methods=['POST'])
+@bp.route('/api/image/translate-prompt', methods=['POST'])
 def translate_prompt():
     """將中文 prompt 翻譯為適合圖像生成的英文"""
     data = request.get_json()
@@ -308,22 +477,9 @@ def translate_prompt():
     
     try:
         # 使用 OpenAI LLM 服務進行翻譯和優化
-        translation_prompt = f"""
-請將以下中文圖像描述翻譯成最適合 AI 圖像生成的英文 prompt。要求：
-
-1. 保持原意的同時，使用 AI 圖像生成模型容易理解的詞彙
-2. 添加適當的攝影術語和藝術描述詞
-3. 結構清晰，描述具體
-4. 適合 Imagen、DALL-E 等模型使用
-5. 只返回翻譯後的英文 prompt，不要其他說明
-
-原始中文描述：
-{prompt}
-
-請直接返回優化後的英文 prompt：
-"""
+        translation_prompt = _build_translation_prompt(prompt, 'image')
         
-        response = openai_llm_service.generate_content(translation_prompt)
+        response = llm_cache.generate_content(openai_llm_service, 'image_translate:v1', prompt, translation_prompt)
         
         if response and 'content' in response:
             translated_prompt = response['content'].strip()
@@ -341,7 +497,87 @@ def translate_prompt():
         print(f"❌ Prompt 翻譯失敗: {e}")
         return jsonify({'error': f'翻譯失敗: {str(e)}'}), 500
 
-@app.route('/api/image/generate', methods=['POST'])
+@bp.route('/api/image/translate-prompt/stream', methods=['POST'])
+def stream_translate_prompt():
+    """將中文 prompt 翻譯為英文 - 以 SSE 逐段回傳翻譯結果"""
+    return _stream_translation(request.get_json(), 'image')
+
+def _build_translation_prompt(prompt, content_type):
+    """建立翻譯用的 LLM prompt"""
+    if content_type == 'video':
+        return f"""
+請將以下中文影片描述翻譯成最適合 AI 影片生成的英文 prompt。要求：
+
+1. 保持原意的同時，使用 AI 影片生成模型容易理解的詞彙
+2. 添加適當的攝影術語和動態描述詞
+3. 強調動作、運動和時間流程
+4. 適合 Veo、Runway 等影片生成模型使用
+5. 只返回翻譯後的英文 prompt，不要其他說明
+
+原始中文描述：
+{prompt}
+
+請直接返回優化後的英文 prompt：
+"""
+    return f"""
+請將以下中文圖像描述翻譯成最適合 AI 圖像生成的英文 prompt。要求：
+
+1. 保持原意的同時，使用 AI 圖像生成模型容易理解的詞彙
+2. 添加適當的攝影術語和藝術描述詞
+3. 結構清晰，描述具體
+4. 適合 Imagen、DALL-E 等模型使用
+5. 只返回翻譯後的英文 prompt，不要其他說明
+
+原始中文描述：
+{prompt}
+
+請直接返回優化後的英文 prompt：
+"""
+
+def _stream_translation(data, content_type):
+    """以 SSE 串流翻譯結果，模型每產生一段文字即送出"""
+    if not data or 'prompt' not in data:
+        return jsonify({'error': '請提供有效的 prompt'}), 400
+    
+    prompt = data['prompt'].strip()
+    if not prompt:
+        return jsonify({'error': 'Prompt 不能為空'}), 400
+    
+    translation_prompt = _build_translation_prompt(prompt, content_type)
+    
+    def generate():
+        chunks = []
+        try:
+            for delta in llm_cache.stream_content(openai_llm_service, f'{content_type}_translate:v1', prompt, translation_prompt):
+                chunks.append(delta)
+                yield f"data: {json.dumps({'type': 'delta', 'content': delta}, ensure_ascii=False)}\n\n"
+            
+            translated_prompt = ''.join(chunks).strip()
+            if not translated_prompt:
+                # 模型沒有產生任何文字（例如內容被過濾），避免用戶端收到空白翻譯
+                error = {'type': 'error', 'error': '翻譯服務未返回內容'}
+                yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+                return
+            
+            done = {
+                'type': 'done',
+                'original_prompt': prompt,
+                'translated_prompt': translated_prompt,
+                'language': 'en'
+            }
+            yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"❌ Prompt 串流翻譯失敗: {e}")
+            error = {'type': 'error', 'error': f'翻譯失敗: {str(e)}'}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/image/generate', methods=['POST'])
 def generate_image():
     """生成圖像"""
     data = request.get_json()
@@ -362,6 +598,9 @@ def generate_image():
         'style': data.get('style', 'vivid')  # 新增 OpenAI DALL-E 風格參數
     }
     
+    # 設定 fresh 為 true 可略過結果快取，強制重新生成
+    use_cache = not data.get('fresh', False)
+    
     # 獲取模型選擇（預設為 DALL-E）
     model_choice = data.get('model', 'dall-e-3').lower()
     
@@ -376,24 +615,58 @@ def generate_image():
     print(f"   原始請求數據: {data}")
     
     # 驗證數量
-    if params['count'] < 1 or params['count'] > app.config['MAX_IMAGE_COUNT']:
-        return jsonify({'error': f'圖像數量必須在 1-{app.config["MAX_IMAGE_COUNT"]} 之間'}), 400
+    if params['count'] < 1 or params['count'] > current_app.config['MAX_IMAGE_COUNT']:
+        return jsonify({'error': f'圖像數量必須在 1-{current_app.config["MAX_IMAGE_COUNT"]} 之間'}), 400
+    
+    # 非同步模式：立即回傳任務 ID，由背景執行緒池執行生成
+    if data.get('async'):
+        submission = job_service.submit('image', _run_image_generation, params, model_choice, use_cache=use_cache)
+        if not submission['success']:
+            return jsonify({'error': submission['error']}), 503
+        return jsonify({'success': True, 'job': submission['job']}), 202
+    
+    try:
+        result = _run_image_generation(params, model_choice, use_cache=use_cache)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'生成失敗: {str(e)}'}), 500
+
+def _run_image_generation(params, model_choice, progress_callback=None, use_cache=True):
+    """執行圖像生成並記錄統計（同步與背景任務共用）"""
+    prompt = params['prompt']
+    use_openai = model_choice in ['dall-e-3', 'openai']
+    model_display_name = 'DALL-E 3' if use_openai else 'Imagen 4'
+    
+    # 相同參數的請求直接使用已生成的檔案
+    if use_openai:
+        cache_key = result_cache.make_key('openai', openai_image_service.model, params)
+    else:
+        cache_key = result_cache.make_key('imagen', imagen_service.model_name, params)
+    
+    if use_cache:
+        cached_result = result_cache.get(cache_key)
+        if cached_result:
+            print(f"♻️ 使用快取的生成結果: {cache_key[:12]}")
+            if progress_callback:
+                progress_callback('saved', '使用快取的生成結果', progress=95)
+            return cached_result
     
     # 記錄生成開始時間
     start_time = time.time()
     
     try:
         # 根據模型選擇使用不同的服務
-        if model_choice == 'dall-e-3' or model_choice == 'openai':
+        if use_openai:
             # 使用 OpenAI DALL-E 服務生成圖像
-            result = openai_image_service.generate_images(params)
+            result = openai_image_service.generate_images(params, progress_callback=progress_callback)
         else:
             # 使用 Imagen 服務生成圖像
-            result = imagen_service.generate_images(params)
+            result = imagen_service.generate_images(params, progress_callback=progress_callback)
+        
+        result_cache.put(cache_key, result)
         
         # 計算生成時間
         generation_time = time.time() - start_time
-        model_display_name = 'DALL-E 3' if model_choice in ['dall-e-3', 'openai'] else 'Imagen 4'
         
         # 記錄生成結果
         if result.get('success'):
@@ -404,21 +677,18 @@ def generate_image():
         
         print(f"✅ 圖像生成完成，耗時: {generation_time:.2f} 秒")
         
-        return jsonify(result)
+        return result
         
     except Exception as e:
         generation_time = time.time() - start_time
-        error_message = str(e)
-        model_display_name = 'DALL-E 3' if model_choice in ['dall-e-3', 'openai'] else 'Imagen 4'
         
         # 記錄失敗的生成
         stats_service.record_generation('image', prompt, 'failed', model_display_name, generation_time, 0)
         
-        print(f"❌ 圖像生成失敗，耗時: {generation_time:.2f} 秒，錯誤: {error_message}")
-        
-        return jsonify({'error': f'生成失敗: {error_message}'}), 500
+        print(f"❌ 圖像生成失敗，耗時: {generation_time:.2f} 秒，錯誤: {e}")
+        raise
 
-@app.route('/api/image/search', methods=['POST'])
+@bp.route('/api/image/search', methods=['POST'])
 def search_images():
     """搜尋圖片"""
     data = request.get_json()
@@ -472,7 +742,7 @@ def search_images():
             'message': '圖片搜尋服務發生錯誤'
         }), 500
 
-@app.route('/api/image/download', methods=['POST'])
+@bp.route('/api/image/download', methods=['POST'])
 def download_image():
     """下載圖片"""
     data = request.get_json()
@@ -507,7 +777,7 @@ def download_image():
             'message': '圖片下載發生錯誤'
         }), 500
 
-@app.route('/api/image/search-options', methods=['GET'])
+@bp.route('/api/image/search-options', methods=['GET'])
 def get_search_options():
     """獲取圖片搜尋選項"""
     try:
@@ -523,7 +793,7 @@ def get_search_options():
             'error': f'獲取選項失敗: {str(e)}'
         }), 500
 
-@app.route('/api/image/model-options', methods=['GET'])
+@bp.route('/api/image/model-options', methods=['GET'])
 def get_image_model_options():
     """獲取圖像生成模型選項"""
     return jsonify({
@@ -553,7 +823,7 @@ def get_image_model_options():
         ]
     })
 
-@app.route('/api/video/model-options', methods=['GET'])
+@bp.route('/api/video/model-options', methods=['GET'])
 def get_video_model_options():
     """獲取影片生成模型選項"""
     return jsonify({
@@ -581,7 +851,7 @@ def get_video_model_options():
         ]
     })
 
-@app.route('/api/video/optimize-prompt', methods=['POST'])
+@bp.route('/api/video/optimize-prompt', methods=['POST'])
 def optimize_video_prompt():
     """優化影片生成的 prompt - 提供六種風格化建議"""
     data = request.get_json()
@@ -593,88 +863,60 @@ def optimize_video_prompt():
     if not prompt:
         return jsonify({'error': 'Prompt 不能為空'}), 400
     
-    if len(prompt) > app.config['MAX_PROMPT_LENGTH']:
-        return jsonify({'error': f'Prompt 長度不能超過 {app.config["MAX_PROMPT_LENGTH"]} 字元'}), 400
+    if len(prompt) > current_app.config['MAX_PROMPT_LENGTH']:
+        return jsonify({'error': f'Prompt 長度不能超過 {current_app.config["MAX_PROMPT_LENGTH"]} 字元'}), 400
     
-    try:
-        # 使用 OpenAI LLM 服務生成六種不同風格的影片優化版本
-        optimization_prompt = f"""
-請為以下影片生成 prompt 提供六種不同風格的優化版本：
+    result = style_optimizer.optimize(prompt, 'video')
+    if not result['success']:
+        return jsonify({'error': result['error']}), 500
+    return jsonify(result)
 
-原始 prompt：
-{prompt}
+@bp.route('/api/video/optimize-prompt/stream', methods=['POST'])
+def stream_optimize_video_prompt():
+    """優化影片生成的 prompt - 以 SSE 逐一回傳完成的風格"""
+    return _stream_style_optimizations(request.get_json(), 'video')
 
-請提供六種風格優化版本，每個版本都要保持原意，但應用不同的視覺風格和動態效果：
-
-1. 自然清新風 (Natural & Clean)：提升整體亮度與對比度，強化自然色彩，清晰流暢的動作，適合戶外場景或生活記錄
-2. 電影感風格 (Cinematic Look)：電影級攝影技巧，戲劇性燈光，深度景深，慢動作或特殊鏡頭運動，適合敘事性影片
-3. 復古懷舊風 (Vintage/Retro)：復古色調和濾鏡效果，模擬舊時代影片質感，添加顆粒感和色彩偏移，適合懷舊主題
-4. 高質感商業風 (High-End Editorial)：專業級色彩校正，精緻的光影處理，商業廣告級別的視覺品質，適合產品展示或品牌影片
-5. 黑白極簡風 (Monochrome Minimalism)：黑白灰階處理，強調光影對比和構圖線條，極簡主義美學，適合藝術表達
-6. 夢幻光影風 (Soft Dreamy)：柔和的光暈效果，夢幻般的色彩分級，輕柔的動作過渡，適合浪漫或幻想主題
-
-請按以下格式返回，每個版本用 "---" 分隔：
-
-版本1：[自然清新風格的優化 prompt]
----
-版本2：[電影感風格的優化 prompt]
----
-版本3：[復古懷舊風格的優化 prompt]
----
-版本4：[高質感商業風格的優化 prompt]
----
-版本5：[黑白極簡風格的優化 prompt]
----
-版本6：[夢幻光影風格的優化 prompt]
-"""
+def _stream_style_optimizations(data, content_type):
+    """以 SSE 串流六種風格的優化結果，每完成一種風格即送出"""
+    if not data or 'prompt' not in data:
+        return jsonify({'error': '請提供有效的 prompt'}), 400
+    
+    prompt = data['prompt'].strip()
+    if not prompt:
+        return jsonify({'error': 'Prompt 不能為空'}), 400
+    
+    if len(prompt) > current_app.config['MAX_PROMPT_LENGTH']:
+        return jsonify({'error': f'Prompt 長度不能超過 {current_app.config["MAX_PROMPT_LENGTH"]} 字元'}), 400
+    
+    def generate():
+        failed_styles = []
+        try:
+            for item in style_optimizer.iter_optimizations(prompt, content_type):
+                if not item['success']:
+                    failed_styles.append(item['style_name'])
+                yield f"data: {json.dumps(dict(item, type='style'), ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"❌ 串流風格優化失敗: {e}")
+            error = {'type': 'error', 'error': f'優化失敗: {str(e)}'}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+            return
         
-        response = openai_llm_service.generate_content(optimization_prompt)
+        # 所有風格都失敗時送出錯誤事件，用戶端不會只收到六份原始 prompt
+        if len(failed_styles) == len(style_optimizer.get_styles(content_type)):
+            error = {'type': 'error', 'error': '優化服務暫時不可用', 'failed_styles': failed_styles}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+            return
         
-        if response and 'content' in response:
-            content = response['content'].strip()
-            
-            # 解析六個版本
-            versions = content.split('---')
-            optimizations = []
-            
-            for i, version in enumerate(versions):
-                version = version.strip()
-                # 移除版本標籤（如 "版本1："）
-                if '：' in version:
-                    version = version.split('：', 1)[1].strip()
-                elif ':' in version:
-                    version = version.split(':', 1)[1].strip()
-                
-                if version:
-                    optimizations.append(version)
-            
-            # 確保有六個版本
-            style_names = [
-                "自然清新風 (Natural & Clean)",
-                "電影感風格 (Cinematic Look)", 
-                "復古懷舊風 (Vintage/Retro)",
-                "高質感商業風 (High-End Editorial)",
-                "黑白極簡風 (Monochrome Minimalism)",
-                "夢幻光影風 (Soft Dreamy)"
-            ]
-            
-            while len(optimizations) < 6:
-                optimizations.append(prompt)  # 如果解析失敗，使用原始 prompt
-            
-            return jsonify({
-                'success': True,
-                'original_prompt': prompt,
-                'optimizations': optimizations[:6],  # 只取前六個
-                'style_names': style_names
-            })
-        else:
-            return jsonify({'error': '優化服務暫時不可用'}), 500
-            
-    except Exception as e:
-        print(f"❌ 影片 Prompt 優化失敗: {e}")
-        return jsonify({'error': f'優化失敗: {str(e)}'}), 500
+        done = {'type': 'done', 'original_prompt': prompt, 'failed_styles': failed_styles}
+        yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-@app.route('/api/video/translate-prompt', methods=['POST'])
+@bp.route('/api/video/translate-prompt', methods=['POST'])
 def translate_video_prompt():
     """將中文影片 prompt 翻譯為適合影片生成的英文"""
     data = request.get_json()
@@ -688,22 +930,9 @@ def translate_video_prompt():
     
     try:
         # 使用 OpenAI LLM 服務進行翻譯和優化
-        translation_prompt = f"""
-請將以下中文影片描述翻譯成最適合 AI 影片生成的英文 prompt。要求：
-
-1. 保持原意的同時，使用 AI 影片生成模型容易理解的詞彙
-2. 添加適當的攝影術語和動態描述詞
-3. 強調動作、運動和時間流程
-4. 適合 Veo、Runway 等影片生成模型使用
-5. 只返回翻譯後的英文 prompt，不要其他說明
-
-原始中文描述：
-{prompt}
-
-請直接返回優化後的英文 prompt：
-"""
+        translation_prompt = _build_translation_prompt(prompt, 'video')
         
-        response = openai_llm_service.generate_content(translation_prompt)
+        response = llm_cache.generate_content(openai_llm_service, 'video_translate:v1', prompt, translation_prompt)
         
         if response and 'content' in response:
             translated_prompt = response['content'].strip()
@@ -721,12 +950,17 @@ def translate_video_prompt():
         print(f"❌ 影片 Prompt 翻譯失敗: {e}")
         return jsonify({'error': f'翻譯失敗: {str(e)}'}), 500
 
-@app.route('/api/video/calculate-price', methods=['POST'])
+@bp.route('/api/video/translate-prompt/stream', methods=['POST'])
+def stream_translate_video_prompt():
+    """將中文影片 prompt 翻譯為英文 - 以 SSE 逐段回傳翻譯結果"""
+    return _stream_translation(request.get_json(), 'video')
+
+@bp.route('/api/video/calculate-price', methods=['POST'])
 def calculate_video_price():
     """價格計算功能已停用"""
     return jsonify({'error': '價格計算功能已停用'}), 404
 
-@app.route('/api/video/generate', methods=['POST'])
+@bp.route('/api/video/generate', methods=['POST'])
 def generate_video():
     """生成影片"""
     data = request.get_json()
@@ -756,54 +990,167 @@ def generate_video():
     if params['duration'] not in [5, 6, 7, 8]:
         return jsonify({'error': '無效的影片長度設定 (支援5-8秒)'}), 400
     
+    # 非同步模式：立即回傳任務 ID，由背景執行緒池執行生成
+    if data.get('async'):
+        submission = job_service.submit('video', _run_video_generation, params, model_choice)
+        if not submission['success']:
+            return jsonify({'error': submission['error']}), 503
+        return jsonify({'success': True, 'job': submission['job']}), 202
+    
+    try:
+        result = _run_video_generation(params, model_choice)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'生成失敗: {str(e)}'}), 500
+
+def _run_video_generation(params, model_choice, progress_callback=None):
+    """執行影片生成並記錄統計（同步與背景任務共用）"""
+    prompt = params['prompt']
+    model_display_name = 'OpenAI Video' if model_choice == 'openai' else 'Veo 3.0'
+    
     # 記錄生成開始時間
     start_time = time.time()
     
-    try:
-        # 根據模型選擇使用不同的服務
-        if model_choice == 'openai':
-            # 使用 OpenAI 影片服務生成影片
-            result = openai_video_service.generate_videos(params)
-        else:
-            # 使用 Veo 服務生成影片
-            result = veo_service.generate_videos(params)
-        
-        # 計算生成時間
-        generation_time = time.time() - start_time
-        model_display_name = 'OpenAI Video' if model_choice == 'openai' else 'Veo 3.0'
-        
+    def record_result(result):
         # 記錄生成結果
+        generation_time = time.time() - start_time
         if result.get('success'):
             file_count = len(result.get('videos', []))
             stats_service.record_generation('video', prompt, 'success', model_display_name, generation_time, file_count)
         else:
             stats_service.record_generation('video', prompt, 'failed', model_display_name, generation_time, 0)
-        
         print(f"✅ 影片生成完成，耗時: {generation_time:.2f} 秒")
+    
+    try:
+        # 根據模型選擇使用不同的服務
+        if model_choice == 'openai':
+            # 使用 OpenAI 影片服務生成影片
+            result = openai_video_service.generate_videos(params, progress_callback=progress_callback)
+        else:
+            # 使用 Veo 服務生成影片；背景任務不佔用工作執行緒等待，完成後由操作追蹤器寫回任務
+            def complete_job(final_result):
+                record_result(final_result)
+                progress_callback.complete(final_result)
+            
+            on_complete = complete_job if hasattr(progress_callback, 'complete') else None
+            result = veo_service.generate_videos(params, progress_callback=progress_callback, on_complete=on_complete)
+            if result.get('deferred'):
+                return result
         
-        return jsonify(result)
+        record_result(result)
+        return result
         
     except Exception as e:
         generation_time = time.time() - start_time
-        error_message = str(e)
-        model_display_name = 'OpenAI Video' if model_choice == 'openai' else 'Veo 3.0'
         
         # 記錄失敗的生成
         stats_service.record_generation('video', prompt, 'failed', model_display_name, generation_time, 0)
         
-        print(f"❌ 影片生成失敗，耗時: {generation_time:.2f} 秒，錯誤: {error_message}")
-        
-        return jsonify({'error': f'生成失敗: {error_message}'}), 500
+        print(f"❌ 影片生成失敗，耗時: {generation_time:.2f} 秒，錯誤: {e}")
+        raise
 
-@app.route('/generated/<path:filename>')
-def serve_generated_file(filename):
-    """提供生成的檔案"""
+def _complete_resumed_operation(operation, result):
+    """程序重新啟動後接手的操作完成時，記錄統計並寫回任務記錄"""
+    generation_time = time.time() - operation['created_at']
+    status = 'success' if result.get('success') else 'failed'
+    file_count = len(result.get('videos', [])) if result.get('success') else 0
+    stats_service.record_generation('video', operation['context'].get('prompt', ''), status, 'Veo 3.0', generation_time, file_count)
+    if operation.get('job_id'):
+        job_service.complete_job(operation['job_id'], result)
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """查詢背景生成任務狀態與結果"""
+    job = job_service.get_job(job_id)
+    if not job:
+        return jsonify({'error': '任務不存在或已過期'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """以 Server-Sent Events 推送背景生成任務的進度"""
+    if not job_service.get_job(job_id):
+        return jsonify({'error': '任務不存在或已過期'}), 404
+    
+    # 支援斷線重連：瀏覽器會在 Last-Event-ID 標頭帶回最後收到的事件 ID
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', -1))
     try:
-        return send_file(os.path.join('generated', filename))
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = -1
+    
+    def generate():
+        for event in job_service.iter_events(job_id, last_event_id=last_event_id):
+            if event is None:
+                # 保持連線，避免代理伺服器關閉閒置連線
+                yield ': keep-alive\n\n'
+                continue
+            payload = json.dumps(event, ensure_ascii=False)
+            yield f"id: {event['id']}\ndata: {payload}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def _send_stored_file(directory, filename, accel_prefix):
+    """
+    提供 directory 下的生成 / 下載檔案
+
+    檔案寫入後不再變更，因此以內容雜湊作為強 ETag 並設定長期快取。
+    FILE_SERVING_MODE 為 flask 時由 send_file 傳送內容，並處理 304 與 Range 206（影片拖曳播放）；
+    為 x-accel / x-sendfile 時只在這裡檢查路徑並處理 304，內容與 Range 交給前端代理（nginx / Apache）傳送。
+    """
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return jsonify({'error': '檔案不存在'}), 404
+    
+    mode = current_app.config['FILE_SERVING_MODE']
+    sidecar = mode in ('x-accel', 'x-sendfile')
+    max_age = current_app.config['GENERATED_FILE_MAX_AGE']
+    
+    try:
+        etag = file_etag_cache.get_etag(file_path)
+        if not sidecar:
+            response = send_file(file_path, etag=etag, conditional=True, max_age=max_age)
+        else:
+            response = Response(mimetype=mimetypes.guess_type(file_path)[0] or 'application/octet-stream')
+            response.set_etag(etag)
+            response.last_modified = os.path.getmtime(file_path)
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
     except FileNotFoundError:
         return jsonify({'error': '檔案不存在'}), 404
+    
+    # 各服務的檔名含隨機識別碼，同一網址不會被新的生成結果覆蓋
+    response.cache_control.immutable = True
+    
+    if sidecar:
+        response = response.make_conditional(request)
+        if response.status_code != 304:
+            if mode == 'x-accel':
+                relative_path = os.path.relpath(file_path, directory).replace(os.sep, '/')
+                response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(relative_path)
+            else:
+                response.headers['X-Sendfile'] = file_path
+    
+    return response
 
-@app.route('/api/prompt-tips', methods=['GET'])
+@bp.route('/generated/<path:filename>')
+def serve_generated_file(filename):
+    """提供生成的檔案"""
+    return _send_stored_file(current_app.config['GENERATED_FOLDER'], filename, current_app.config['X_ACCEL_GENERATED_PREFIX'])
+
+@bp.route('/static/downloaded_images/<path:filename>')
+def serve_downloaded_image(filename):
+    """提供圖片搜尋下載的圖片（優先於一般靜態檔案路由）"""
+    return _send_stored_file(current_app.config['DOWNLOADED_IMAGES_FOLDER'], filename, current_app.config['X_ACCEL_DOWNLOADED_IMAGES_PREFIX'])
+
+@bp.route('/api/prompt-tips', methods=['GET'])
 def get_prompt_tips():
     """獲取 prompt 撰寫建議"""
     content_type = request.args.get('type', 'image')
@@ -868,9 +1215,14 @@ def get_prompt_tips():
         'tips': tips
     })
 
-if __name__ == '__main__':
+def main():
+    """以開發伺服器啟動（正式環境請使用 gunicorn，見 gunicorn.conf.py）"""
     # 建立必要的目錄
     os.makedirs('uploads', exist_ok=True)
-    os.makedirs('generated', exist_ok=True)
+    os.makedirs(Config.GENERATED_FOLDER, exist_ok=True)
     
-    app.run(debug=True, host='0.0.0.0', port=5001) 
\ No newline at end of file
+    app = create_app()
+    app.run(debug=True, host='0.0.0.0', port=5001)
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+啟動匯入時間檢查腳本
+以 `python -X importtime` 在全新的程序中匯入應用程式，檢查總匯入時間是否超出預算，
+並確認大型 SDK（Vertex AI、Gemini、OpenAI、PIL）沒有在啟動時被匯入
+
+用法:
+    python check_import_time.py                      # 檢查 app_ai_generate
+    python check_import_time.py --budget-ms 800      # 自訂預算
+    python check_import_time.py services.veo_service # 檢查單一模組
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+# 啟動時不應匯入的大型 SDK（只在建立對應服務時才匯入）
+DEFERRED_MODULES = [
+    'vertexai',
+    'google.cloud.aiplatform',
+    'google.cloud.aiplatform_v1',
+    'google.generativeai',
+    'openai',
+    'PIL'
+]
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+def measure_imports(module_name: str):
+    """在新程序中匯入模組，回傳 {模組名稱: 累計微秒} 與頂層模組名稱"""
+    project_root = str(Path(__file__).parent)
+    env = dict(os.environ, PYTHONPATH=project_root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith('import time:')]
+        print('\n'.join(errors[-20:]))
+        raise RuntimeError(f"匯入 {module_name} 失敗")
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='檢查應用程式啟動的匯入時間預算')
+    parser.add_argument('module', nargs='?', default='app_ai_generate', help='要匯入的模組（預設 app_ai_generate）')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500')),
+                        help='匯入時間預算（毫秒，預設 1500 或 IMPORT_TIME_BUDGET_MS）')
+    parser.add_argument('--top', type=int, default=10, help='列出最耗時的模組數量')
+    args = parser.parse_args()
+
+    print(f"🔄 測量匯入時間: {args.module}")
+    try:
+        timings = measure_imports(args.module)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    total_ms = timings.get(args.module, 0) / 1000
+    print(f"⏱️ 總匯入時間: {total_ms:.1f} ms（預算 {args.budget_ms:.0f} ms）")
+
+    print(f"📊 累計時間最長的 {args.top} 個模組:")
+    for name, cumulative in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"   {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager_sdks = [name for name in DEFERRED_MODULES if name in timings]
+    if eager_sdks:
+        print(f"❌ 以下 SDK 在啟動時被匯入（應延遲到建立服務時）: {', '.join(eager_sdks)}")
+        failed = True
+
+    if total_ms > args.budget_ms:
+        print(f"❌ 匯入時間超出預算 {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ 匯入時間在預算內")
+
+if __name__ == "__main__":
+    main()
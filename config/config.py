@@ -1,5 +1,8 @@
 import os
 
+# 專案根目錄（config/ 的上一層），用於組出不受啟動時工作目錄影響的絕對路徑
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     """應用程式配置類別"""
     
@@ -31,14 +34,53 @@ class Config:
     MAX_IMAGE_COUNT = int(os.environ.get('MAX_IMAGE_COUNT', '10'))
     MAX_VIDEO_COUNT = int(os.environ.get('MAX_VIDEO_COUNT', '5'))
     MAX_PROMPT_LENGTH = int(os.environ.get('MAX_PROMPT_LENGTH', '2000'))
-    
 
+    # 背景任務設定
+    JOB_IMAGE_WORKERS = int(os.environ.get('JOB_IMAGE_WORKERS', '4'))
+    JOB_VIDEO_WORKERS = int(os.environ.get('JOB_VIDEO_WORKERS', '2'))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', '50'))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', '3600'))  # 秒
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', 'data/jobs.db')  # 多個 worker 共用的任務狀態，留空則只保存在記憶體
+    
+    # 生成結果快取設定（SQLite 保存，多個 worker 共用）
+    RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', 'data/result_cache.db')
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '500'))
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', '86400'))  # 秒
+    
+    # LLM 回應快取設定（prompt 優化與翻譯）
+    LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', 'data/llm_cache.db')
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '1000'))
     
+    # 生成統計批次寫入設定（累積筆數或等待毫秒數任一達到即寫入）
+    STATS_WRITE_BEHIND = os.environ.get('STATS_WRITE_BEHIND', 'true').lower() == 'true'
+    STATS_BATCH_SIZE = int(os.environ.get('STATS_BATCH_SIZE', '50'))
+    STATS_FLUSH_INTERVAL_MS = int(os.environ.get('STATS_FLUSH_INTERVAL_MS', '500'))
+    
+    # 生成記錄保留設定（保留天數為 0 時不自動清理；封存目錄留空則不封存）
+    STATS_RETENTION_DAYS = int(os.environ.get('STATS_RETENTION_DAYS', '0'))
+    STATS_RETENTION_INTERVAL_HOURS = float(os.environ.get('STATS_RETENTION_INTERVAL_HOURS', '24'))
+    STATS_RETENTION_CHUNK_SIZE = int(os.environ.get('STATS_RETENTION_CHUNK_SIZE', '1000'))
+    STATS_ARCHIVE_DIR = os.environ.get('STATS_ARCHIVE_DIR', '')
+    
+    # 六種風格 Prompt 優化設定（每種風格的等待秒數）
+    PROMPT_STYLE_TIMEOUT = float(os.environ.get('PROMPT_STYLE_TIMEOUT', '20'))
+
+    # 服務預先建立設定（逗號分隔的服務名稱，'all' 表示全部，留空則第一次使用時才建立）
+    SERVICE_WARMUP = os.environ.get('SERVICE_WARMUP', '').strip()
+
     # 檔案上傳設定
     UPLOAD_FOLDER = 'uploads'
-    GENERATED_FOLDER = 'generated'
+    # 生成檔案與下載圖片的目錄（絕對路徑；寫入檔案的服務與傳送檔案的路由共用同一個設定）
+    GENERATED_FOLDER = os.path.abspath(os.environ.get('GENERATED_DIR') or os.path.join(BASE_DIR, 'generated'))
+    DOWNLOADED_IMAGES_FOLDER = os.path.abspath(os.environ.get('DOWNLOADED_IMAGES_DIR') or os.path.join(BASE_DIR, 'static', 'downloaded_images'))
+    GENERATED_FILE_MAX_AGE = int(os.environ.get('GENERATED_FILE_MAX_AGE', '31536000'))  # 生成檔案的瀏覽器快取秒數
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
     
+    # 檔案傳送模式：flask（由 worker 傳送）、x-accel（nginx X-Accel-Redirect）、x-sendfile（Apache / lighttpd X-Sendfile）
+    FILE_SERVING_MODE = os.environ.get('FILE_SERVING_MODE', 'flask').strip().lower()
+    X_ACCEL_GENERATED_PREFIX = os.environ.get('X_ACCEL_GENERATED_PREFIX', '/_protected/generated/')
+    X_ACCEL_DOWNLOADED_IMAGES_PREFIX = os.environ.get('X_ACCEL_DOWNLOADED_IMAGES_PREFIX', '/_protected/downloaded_images/')
+    
     # Imagen 4 支援的參數
     SUPPORTED_IMAGE_SIZES = ['1024x1024', '1024x1792', '1792x1024']
     SUPPORTED_IMAGE_QUALITIES = ['standard', 'high', 'ultra']
@@ -53,9 +95,33 @@ class Config:
         'imagen_requests_per_minute': 60,
         'imagen_images_per_request': 4,  # Imagen 4 每次請求最多 4 張
         'veo_requests_per_minute': 10,
-        'gemini_requests_per_minute': 100
+        'gemini_requests_per_minute': 100,
+        'openai_image_requests_per_minute': 50,
+        'openai_llm_requests_per_minute': 500
     }
     
+    # 速率限制排隊等待上限（秒），超過即拒絕請求
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '30'))
+    
+    # 權杖桶保存在各 worker 程序的記憶體中，API_RATE_LIMITS 為所有 worker 合計的上限，
+    # 每個程序只使用 1 / RATE_LIMIT_PROCESSES 的速率（gunicorn.conf.py 會自動設為 worker 數）
+    RATE_LIMIT_PROCESSES = int(os.environ.get('RATE_LIMIT_PROCESSES', '1'))
+    
+    # Veo 長時間操作輪詢設定（指數退避 + 隨機抖動）
+    VEO_POLL_INITIAL_DELAY = float(os.environ.get('VEO_POLL_INITIAL_DELAY', '10'))  # 秒
+    VEO_POLL_MAX_DELAY = float(os.environ.get('VEO_POLL_MAX_DELAY', '60'))  # 秒
+    VEO_POLL_MULTIPLIER = float(os.environ.get('VEO_POLL_MULTIPLIER', '1.5'))
+    VEO_POLL_JITTER = float(os.environ.get('VEO_POLL_JITTER', '0.2'))
+    VEO_OPERATION_TIMEOUT = float(os.environ.get('VEO_OPERATION_TIMEOUT', '1800'))  # 秒
+    OPERATION_STORE_PATH = os.environ.get('OPERATION_STORE_PATH', 'data/operations.db')
+    
+    # 斷路器設定：模型連續配額錯誤達門檻後暫停呼叫，冷卻後放行一個試探請求
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '1'))
+    CIRCUIT_BREAKER_COOLDOWN = float(os.environ.get('CIRCUIT_BREAKER_COOLDOWN', '60'))  # 秒
+    
+    # Imagen 同時送出的最大批次數（每批最多 4 張）
+    IMAGEN_MAX_CONCURRENT_BATCHES = int(os.environ.get('IMAGEN_MAX_CONCURRENT_BATCHES', '3'))
+    
     @staticmethod
     def validate_api_keys():
         """驗證必要的 API 金鑰和配置是否已設定"""
@@ -0,0 +1,45 @@
+"""
+Gunicorn 設定檔
+
+啟動方式:
+    gunicorn -c gunicorn.conf.py "app_ai_generate:create_app()"
+
+每個 worker 程序各自呼叫 create_app() 建立服務（執行緒池、SQLite 連線、快取、速率限制器），
+程序之間只透過 data/ 下的 SQLite 資料庫（統計、LLM 快取、生成結果快取、任務狀態）共用資料。
+"""
+
+import os
+import multiprocessing
+
+# 監聽位址
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+
+# worker 數量：預設與 CPU 核心數相同
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+
+# 速率限制的權杖桶在各 worker 內，依 worker 數分攤 API_RATE_LIMITS（worker 繼承主程序的環境變數）
+os.environ.setdefault('RATE_LIMIT_PROCESSES', str(workers))
+
+# worker 類型：
+#   gthread（預設）- 每個 worker 使用執行緒處理請求，與 gRPC（Vertex AI SDK）及背景執行緒池相容
+#   gevent        - 以協程處理大量長連線（SSE），需另外安裝 gevent；
+#                   gRPC（Vertex AI SDK）與 gevent 的 monkey patch 相容性有限，使用 Veo / Imagen 時建議維持 gthread
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# gthread 每個 worker 的執行緒數；SSE 串流（任務進度、prompt 串流）每條連線會佔用一個執行緒
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+# gevent 每個 worker 的同時連線數
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# 生成工作已移到背景任務，請求本身不會長時間阻塞；影片同步生成時仍可能需要較長時間
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# 不預先在主程序載入應用程式，讓每個 worker 自行建立服務與背景執行緒
+preload_app = False
+
+# 記錄輸出到標準輸出
+accesslog = '-'
+errorlog = '-'
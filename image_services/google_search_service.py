@@ -9,12 +9,21 @@ from pathlib import Path
 class GoogleImageSearchService:
     """Google 圖片搜尋服務"""
     
-    def __init__(self):
+    def __init__(self, download_dir: str = None):
+        """
+        初始化圖片搜尋服務
+
+        Args:
+            download_dir: 下載圖片的存放目錄（未指定時使用 Config.DOWNLOADED_IMAGES_FOLDER）
+        """
         self.api_key = os.environ.get('GOOGLE_SEARCH_API_KEY')
         self.search_engine_id = os.environ.get('GOOGLE_SEARCH_ENGINE_ID')
         self.base_url = 'https://www.googleapis.com/customsearch/v1'
-        self.download_dir = Path('static/downloaded_images')
-        self.download_dir.mkdir(exist_ok=True)
+        if download_dir is None:
+            from config.config import Config
+            download_dir = Config.DOWNLOADED_IMAGES_FOLDER
+        self.download_dir = Path(download_dir)
+        self.download_dir.mkdir(parents=True, exist_ok=True)
         
         # 如果沒有API金鑰，使用web scraping模式
         self.use_api = bool(self.api_key and self.search_engine_id)
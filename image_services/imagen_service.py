@@ -1,31 +1,23 @@
 import os
 import time
 import random
-from typing import Dict, List, Optional, Tuple
-from PIL import Image, ImageDraw, ImageFont
+from typing import Dict, List, Optional, Tuple, Callable
 import io
 import base64
 import uuid
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-try:
-    from google.cloud import aiplatform
-    from vertexai.vision_models import ImageGenerationModel
-    import vertexai
-    VERTEX_AI_AVAILABLE = True
-except ImportError:
-    try:
-        # 如果穩定版本不可用，嘗試預覽版本
-        from vertexai.preview.vision_models import ImageGenerationModel
-        import vertexai
-        VERTEX_AI_AVAILABLE = True
-    except ImportError:
-        VERTEX_AI_AVAILABLE = False
+from services.rate_limiter import get_rate_limiter, RateLimitExceeded
+from services.sdk_loader import import_sdk
 
 class ImagenService:
     """Imagen 4 圖像生成服務（支援 Vertex AI）"""
     
-    def __init__(self, project_id: str = None, location: str = "us-central1", use_mock: bool = False, model_name: str = None):
+    def __init__(self, project_id: str = None, location: str = "us-central1", use_mock: bool = False, model_name: str = None,
+                 max_concurrent_batches: int = 3, output_dir: str = None):
         """
         初始化 Imagen 服務
         
@@ -34,11 +26,16 @@ class ImagenService:
             location: Google Cloud 區域
             use_mock: 是否使用模擬模式
             model_name: 使用的模型名稱（如果未指定則使用環境變數或預設值）
+            max_concurrent_batches: 同時送出的最大批次數
+            output_dir: 圖像輸出目錄（未指定時使用 Config.GENERATED_FOLDER 下的 images）
         """
         self.project_id = project_id
         self.location = location
         self.use_mock = use_mock  # 不自動切換到模擬模式
         
+        # 批次並行上限（速率限制由全程序共用的 RateLimiter 控制）
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        
         # 設定模型名稱（優先順序：參數 > 環境變數 > 預設值）
         if model_name:
             self.model_name = model_name
@@ -64,14 +61,20 @@ class ImagenService:
         }
         
         # 建立輸出目錄
-        self.output_dir = 'generated/images'
+        if output_dir is None:
+            from config.config import Config
+            output_dir = os.path.join(Config.GENERATED_FOLDER, 'images')
+        self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         
         if self.use_mock:
             print(f"🔧 使用 Imagen 模擬模式 (模型: {self.model_name})")
         else:
-            # 檢查必要條件
-            if not VERTEX_AI_AVAILABLE:
+            # 檢查必要條件（Vertex AI SDK 延遲到真實 API 模式建立服務時才匯入）
+            vertexai = import_sdk('vertexai', 'pip install google-cloud-aiplatform')
+            # 如果穩定版本不可用，嘗試預覽版本
+            vision_models = import_sdk('vertexai.vision_models') or import_sdk('vertexai.preview.vision_models')
+            if vertexai is None or vision_models is None:
                 raise Exception("❌ Vertex AI 套件不可用，請安裝: pip install google-cloud-aiplatform")
             
             if not project_id:
@@ -81,7 +84,7 @@ class ImagenService:
                 # 初始化 Vertex AI
                 vertexai.init(project=project_id, location=location)
                 # 使用配置的模型
-                self.model = ImageGenerationModel.from_pretrained(self.model_name)
+                self.model = vision_models.ImageGenerationModel.from_pretrained(self.model_name)
                 print(f"✅ Imagen 服務已初始化 (專案: {project_id}, 模型: {self.model_name}, 真實 API 模式)")
             except Exception as e:
                 error_msg = f"❌ Vertex AI 初始化失敗: {e}"
@@ -91,7 +94,7 @@ class ImagenService:
                     error_msg += "\n請確保服務帳戶有 Vertex AI 權限"
                 raise Exception(error_msg)
     
-    def generate_images(self, params: Dict[str, any]) -> Dict[str, any]:
+    def generate_images(self, params: Dict[str, any], progress_callback: Optional[Callable] = None) -> Dict[str, any]:
         """
         生成圖像
         
@@ -102,6 +105,7 @@ class ImagenService:
                 - quality: 品質等級 ('standard', 'high', 'ultra')
                 - size: 圖像尺寸 ('1024x1024', '1024x1792', '1792x1024')
                 - style: 風格 ('natural', 'artistic', 'realistic')
+            progress_callback: 進度回報函數 (stage, message, **details)
         
         Returns:
             生成結果字典
@@ -111,6 +115,9 @@ class ImagenService:
         if not validation_result.get('valid'):
             return validation_result
         
+        if progress_callback:
+            progress_callback('validated', '參數驗證完成', progress=5)
+        
         prompt = params['prompt']
         count = params.get('count', 1)
         quality = params.get('quality', 'standard')
@@ -125,11 +132,12 @@ class ImagenService:
         print(f"🔧 使用模式: {'模擬' if self.use_mock else 'Vertex AI'}")
         
         if self.use_mock:
-            return self._generate_images_mock(params, generation_id, start_time)
+            return self._generate_images_mock(params, generation_id, start_time, progress_callback)
         else:
-            return self._generate_images_vertex_ai(params, generation_id, start_time)
+            return self._generate_images_vertex_ai(params, generation_id, start_time, progress_callback)
     
-    def _generate_images_vertex_ai(self, params: Dict[str, any], generation_id: str, start_time: float) -> Dict[str, any]:
+    def _generate_images_vertex_ai(self, params: Dict[str, any], generation_id: str, start_time: float,
+                                   progress_callback: Optional[Callable] = None) -> Dict[str, any]:
         """使用 Vertex AI 生成圖像"""
         try:
             prompt = params['prompt']
@@ -160,57 +168,63 @@ class ImagenService:
             print(f"📤 發送到 Vertex AI 的參數: {vertex_params}")
             print(f"📏 尺寸: {size} -> 長寬比: {aspect_ratio}")
             
-            generated_images = []
-            
             # 如果需要生成超過 4 張，分批處理
             batches = (count + 3) // 4  # 向上取整
-            for batch_num in range(batches):
-                batch_count = min(4, count - batch_num * 4)
-                if batch_count <= 0:
-                    break
-                
-                # 調整批次參數
-                batch_params = vertex_params.copy()
-                batch_params['number_of_images'] = batch_count
-                
-                # 調用 Vertex AI（使用基本參數）
-                try:
-                    response = self.model.generate_images(**batch_params)
-                except Exception as e:
-                    print(f"⚠️ 生成失敗，錯誤: {e}")
-                    raise
+            
+            if progress_callback:
+                progress_callback('submitted', f'已提交至 Vertex AI Imagen（共 {batches} 批）', progress=10, batches=batches)
+            
+            # 各批次並行送出，由並行上限與權杖桶控制對 API 的壓力
+            batch_results = {}
+            batch_error = None
+            stop_event = threading.Event()  # 任一批次失敗時設定，尚未呼叫 API 的批次不再送出
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent_batches, batches)) as executor:
+                futures = {}
+                for batch_num in range(batches):
+                    batch_params = vertex_params.copy()
+                    batch_params['number_of_images'] = min(4, count - batch_num * 4)
+                    futures[executor.submit(self._generate_batch, batch_params, batch_num, generation_id, size, quality,
+                                            stop_event)] = batch_num
                 
-                # 處理返回的圖像
-                for i, image in enumerate(response.images):
-                    image_index = batch_num * 4 + i + 1
-                    
-                    # 儲存圖像
-                    filename = f"imagen4_{generation_id}_{image_index}_{int(time.time())}.png"
-                    filepath = os.path.join(self.output_dir, filename)
-                    
-                    # 儲存圖像到檔案
-                    image.save(location=filepath, include_generation_parameters=False)
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    batch_num = futures[future]
+                    if future.cancelled():
+                        continue
+                    try:
+                        batch_images = future.result()
+                        if batch_images is None:
+                            continue  # 其他批次已失敗，未送出
+                        batch_results[batch_num] = batch_images
+                    except Exception as e:
+                        print(f"⚠️ 批次 {batch_num + 1} 生成失敗，錯誤: {e}")
+                        if batch_error is None:
+                            batch_error = e
+                            # 與逐批處理相同，第一個批次失敗即停止：取消尚未開始的批次，不再消耗配額與權杖
+                            for other in futures:
+                                other.cancel()
+                        continue
                     
-                    generated_images.append({
-                        'image_id': f"{generation_id}_{image_index}",
-                        'filename': filename,
-                        'filepath': filepath,
-                        'url': f"/generated/images/{filename}",
-                        'size': size,
-                        'quality': quality,
-                        'file_size': os.path.getsize(filepath),
-                        'created_at': datetime.now().isoformat(),
-                        'model_version': 'imagen-4',
-                        'batch_number': batch_num + 1
-                    })
-                
-                # 批次間等待（避免 API 限制）
-                if batch_num < batches - 1:
-                    time.sleep(1)
+                    if progress_callback and not batch_error:
+                        progress_callback('batch_completed', f'批次 {completed}/{batches} 完成',
+                                          progress=10 + 85 * completed // batches,
+                                          batch=batch_num + 1, batches=batches)
+            
+            if batch_error:
+                # 整個請求以失敗回傳，刪除其他批次已儲存但不會回傳的圖像
+                for images in batch_results.values():
+                    self._remove_image_files(images)
+                raise batch_error
+            
+            generated_images = []
+            for batch_num in sorted(batch_results):
+                generated_images.extend(batch_results[batch_num])
             
             end_time = time.time()
             generation_time = round(end_time - start_time, 2)
             
+            if progress_callback:
+                progress_callback('saved', f'已保存 {len(generated_images)} 張圖像', progress=95)
+            
             return {
                 'success': True,
                 'generation_id': generation_id,
@@ -229,7 +243,10 @@ class ImagenService:
             print(f"❌ Vertex AI 生成失敗: {e}")
             
             # 根據錯誤類型提供更詳細的錯誤訊息
-            if '429' in error_message or 'Quota exceeded' in error_message:
+            if isinstance(e, RateLimitExceeded):
+                error_type = 'rate_limited'
+                user_message = error_message
+            elif '429' in error_message or 'Quota exceeded' in error_message:
                 error_type = 'quota_exceeded'
                 user_message = '配額已用完，請稍後再試或申請增加配額。詳情請參考：https://cloud.google.com/vertex-ai/docs/generative-ai/quotas-genai'
             elif '403' in error_message or 'permission' in error_message.lower():
@@ -256,7 +273,65 @@ class ImagenService:
     
 
     
-    def _generate_images_mock(self, params: Dict[str, any], generation_id: str, start_time: float) -> Dict[str, any]:
+    def _generate_batch(self, batch_params: Dict[str, any], batch_num: int, generation_id: str, size: str, quality: str,
+                        stop_event: Optional[threading.Event] = None) -> Optional[List[Dict[str, any]]]:
+        """生成並儲存單一批次的圖像（在工作執行緒中執行）；stop_event 已設定時不送出並回傳 None"""
+        if stop_event is not None and stop_event.is_set():
+            return None
+        
+        try:
+            # 依 API_RATE_LIMITS 取得權杖後才呼叫 Vertex AI
+            get_rate_limiter().acquire('imagen', self.model_name)
+            
+            # 調用 Vertex AI（使用基本參數）
+            response = self.model.generate_images(**batch_params)
+        except Exception:
+            if stop_event is not None:
+                stop_event.set()
+            raise
+        
+        batch_images = []
+        for i, image in enumerate(response.images):
+            image_index = batch_num * 4 + i + 1
+            
+            # 儲存圖像
+            filename = f"imagen4_{generation_id}_{image_index}_{int(time.time())}.png"
+            filepath = os.path.join(self.output_dir, filename)
+            
+            # 儲存圖像到檔案（失敗時刪除本批次已儲存的圖像與不完整的檔案）
+            try:
+                image.save(location=filepath, include_generation_parameters=False)
+            except Exception:
+                if stop_event is not None:
+                    stop_event.set()
+                self._remove_image_files(batch_images + [{'filepath': filepath}])
+                raise
+            
+            batch_images.append({
+                'image_id': f"{generation_id}_{image_index}",
+                'filename': filename,
+                'filepath': filepath,
+                'url': f"/generated/images/{filename}",
+                'size': size,
+                'quality': quality,
+                'file_size': os.path.getsize(filepath),
+                'created_at': datetime.now().isoformat(),
+                'model_version': 'imagen-4',
+                'batch_number': batch_num + 1
+            })
+        
+        return batch_images
+    
+    def _remove_image_files(self, images: List[Dict[str, any]]):
+        """刪除已儲存但不會回傳給使用者的圖像檔案"""
+        for image in images:
+            try:
+                os.remove(image['filepath'])
+            except OSError:
+                pass
+    
+    def _generate_images_mock(self, params: Dict[str, any], generation_id: str, start_time: float,
+                              progress_callback: Optional[Callable] = None) -> Dict[str, any]:
         """模擬圖像生成（開發測試用）"""
         prompt = params['prompt']
         count = params.get('count', 1)
@@ -287,6 +362,9 @@ class ImagenService:
             
             # 模擬生成延遲
             time.sleep(0.5)
+            
+            if progress_callback:
+                progress_callback('saved', f'已保存模擬圖像 {i+1}/{count}', progress=10 + 85 * (i + 1) // count)
         
         end_time = time.time()
         generation_time = round(end_time - start_time, 2)
@@ -305,6 +383,8 @@ class ImagenService:
     
     def _create_placeholder_image(self, filepath: str, size: str, prompt: str, quality: str):
         """創建佔位符圖像"""
+        from PIL import Image, ImageDraw, ImageFont
+        
         width, height = map(int, size.split('x'))
         
         # 創建圖像
@@ -433,7 +513,8 @@ class ImagenService:
         base_time = base_time_per_image.get(quality, 10)
         batches = (count + 3) // 4  # 每批最多 4 張
         
-        return base_time * batches + (batches - 1) * 5  # 加上批次間等待時間
+        # 批次並行執行，只需等待 ceil(批次數 / 並行上限) 輪
+        return base_time * math.ceil(batches / self.max_concurrent_batches)
     
     def get_generation_status(self, generation_id: str) -> Dict[str, any]:
         """獲取生成狀態"""
@@ -460,6 +541,7 @@ class ImagenService:
             return {'error': '圖像檔案不存在'}
         
         try:
+            from PIL import Image
             with Image.open(filepath) as img:
                 return {
                     'filepath': filepath,
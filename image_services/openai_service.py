@@ -5,41 +5,50 @@ OpenAI DALL-E 圖像生成服務
 
 import os
 import time
+import uuid
 import requests
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from dotenv import load_dotenv
 
+from services.rate_limiter import get_rate_limiter, RateLimitExceeded
+from services.sdk_loader import import_sdk
+from services.stream_download import atomic_write, mount_connection_pool
+
 # 載入環境變數
 load_dotenv()
 
-# 嘗試導入 OpenAI SDK
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-    print("✅ OpenAI SDK 可用")
-except ImportError as e:
-    print(f"⚠️ OpenAI SDK 不可用: {e}")
-    print("💡 請執行: pip install openai")
-    OPENAI_AVAILABLE = False
-    
-    # 創建模擬的 OpenAI 類別
-    class openai:
-        class OpenAI:
-            def __init__(self, api_key=None):
-                raise Exception("OpenAI SDK 不可用")
-
 class OpenAIImageService:
     """OpenAI DALL-E 圖像生成服務"""
     
-    def __init__(self):
-        """初始化 OpenAI 圖像生成服務"""
+    # 圖像下載設定
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 每次寫入 64KB
+    DOWNLOAD_TIMEOUT = 30
+    MAX_DOWNLOAD_WORKERS = 4
+    
+    def __init__(self, generated_dir: str = None):
+        """
+        初始化 OpenAI 圖像生成服務
+
+        Args:
+            generated_dir: 圖像輸出目錄（未指定時使用 Config.GENERATED_FOLDER）
+        """
+        if generated_dir is None:
+            from config.config import Config
+            generated_dir = Config.GENERATED_FOLDER
+        self.generated_dir = generated_dir
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.model = os.getenv('OPENAI_IMAGE_GEN_MODEL', 'dall-e-3')
         self.use_mock = False
         
-        if not OPENAI_AVAILABLE:
+        # 共用的 HTTP 連線池，重複使用與 CDN 的連線
+        self.http_session = mount_connection_pool(requests.Session(), self.MAX_DOWNLOAD_WORKERS)
+        
+        # OpenAI SDK 延遲到建立服務時才匯入
+        openai = import_sdk('openai', 'pip install openai')
+        if openai is None:
             print("⚠️ OpenAI SDK 不可用，將使用模擬模式")
             self.use_mock = True
             return
@@ -60,7 +69,7 @@ class OpenAIImageService:
             print(f"❌ OpenAI 圖像服務初始化失敗: {e}")
             self.use_mock = True
     
-    def generate_images(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_images(self, params: Dict[str, Any], progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
         """
         生成圖像
         
@@ -71,6 +80,7 @@ class OpenAIImageService:
                 - size: 圖像尺寸 ('1024x1024', '1024x1792', '1792x1024')
                 - quality: 圖像品質 ('standard', 'hd')
                 - style: 圖像風格 ('vivid', 'natural')
+            progress_callback: 進度回報函數 (stage, message, **details)
         
         Returns:
             包含生成結果的字典
@@ -93,11 +103,20 @@ class OpenAIImageService:
             quality = params.get('quality', 'standard')
             style = params.get('style', 'vivid')
             
+            if progress_callback:
+                progress_callback('validated', '參數驗證完成', progress=5)
+            
             print(f"🎨 開始生成圖像 (OpenAI DALL-E)...")
             print(f"   Prompt: {prompt[:100]}...")
             print(f"   數量: {count}, 尺寸: {size}")
             print(f"   品質: {quality}, 風格: {style}")
             
+            if progress_callback:
+                progress_callback('submitted', '已提交至 OpenAI DALL-E', progress=10)
+            
+            # 依速率限制取得權杖後才調用 API
+            get_rate_limiter().acquire('openai_image', self.model)
+            
             # 調用 OpenAI API (根據官方範例)
             response = self.client.images.generate(
                 model=self.model,
@@ -109,54 +128,57 @@ class OpenAIImageService:
             )
             
             # 處理響應
-            images = []
-            generated_dir = os.path.join(os.getcwd(), 'generated')
+            generated_dir = self.generated_dir
             os.makedirs(generated_dir, exist_ok=True)
             
-            for i, image_data in enumerate(response.data):
-                try:
-                    # 下載圖像
-                    image_url = image_data.url
-                    print(f"📥 下載圖像 {i+1}...")
-                    
-                    # 生成檔案名稱
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    safe_prompt = "".join(filter(str.isalnum, prompt[:30])).lower()
-                    filename = f"dalle_{safe_prompt}_{timestamp}_{i}.png"
-                    local_path = os.path.join(generated_dir, filename)
-                    
-                    # 下載圖像檔案
-                    img_response = requests.get(image_url, timeout=30)
-                    img_response.raise_for_status()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            safe_prompt = "".join(filter(str.isalnum, prompt[:30])).lower()
+            batch_id = str(uuid.uuid4())[:8]  # 同一秒內的多次生成不會互相覆蓋檔案
+            total = len(response.data)
+            
+            if progress_callback:
+                progress_callback('downloading', f'下載 {total} 張圖像', progress=70)
+            
+            # 並行下載所有圖像，單張失敗不影響其他圖像
+            downloaded = {}
+            with ThreadPoolExecutor(max_workers=min(self.MAX_DOWNLOAD_WORKERS, max(total, 1))) as executor:
+                futures = {}
+                for i, image_data in enumerate(response.data):
+                    filename = f"dalle_{safe_prompt}_{timestamp}_{batch_id}_{i}.png"
+                    futures[executor.submit(self._download_image, image_data.url, os.path.join(generated_dir, filename))] = (i, filename, image_data)
+                
+                for finished, future in enumerate(as_completed(futures), start=1):
+                    i, filename, image_data = futures[future]
+                    try:
+                        file_size = future.result()
+                    except Exception as e:
+                        print(f"❌ 下載第 {i+1} 張圖像時發生錯誤: {e}")
+                        continue
                     
-                    with open(local_path, 'wb') as f:
-                        f.write(img_response.content)
+                    if progress_callback:
+                        progress_callback('downloading', f'已下載圖像 {finished}/{total}',
+                                          progress=70 + 25 * finished // total)
                     
-                    # 檢查檔案大小
-                    file_size = os.path.getsize(local_path)
-                    if file_size > 0:
-                        image_info = {
-                            'url': f'/generated/{filename}',
-                            'filename': filename,
-                            'path': local_path,
-                            'size': size,
-                            'quality': quality,
-                            'style': style,
-                            'file_size': file_size,
-                            'timestamp': datetime.now().isoformat(),
-                            'model': self.model,
-                            'revised_prompt': getattr(image_data, 'revised_prompt', prompt)
-                        }
-                        images.append(image_info)
-                        print(f"✅ 圖像 {i+1} 已保存: {filename} ({file_size:,} bytes)")
-                    else:
-                        print(f"❌ 圖像檔案大小為0: {filename}")
-                        
-                except Exception as e:
-                    print(f"❌ 下載第 {i+1} 張圖像時發生錯誤: {e}")
-                    continue
+                    downloaded[i] = {
+                        'url': f'/generated/{filename}',
+                        'filename': filename,
+                        'path': os.path.join(generated_dir, filename),
+                        'size': size,
+                        'quality': quality,
+                        'style': style,
+                        'file_size': file_size,
+                        'timestamp': datetime.now().isoformat(),
+                        'model': self.model,
+                        'revised_prompt': getattr(image_data, 'revised_prompt', prompt)
+                    }
+                    print(f"✅ 圖像 {i+1} 已保存: {filename} ({file_size:,} bytes)")
+            
+            # 維持與 API 回傳相同的順序
+            images = [downloaded[i] for i in sorted(downloaded)]
             
             if images:
+                if progress_callback:
+                    progress_callback('saved', f'已保存 {len(images)} 張圖像', progress=95)
                 return {
                     'success': True,
                     'images': images,
@@ -185,7 +207,13 @@ class OpenAIImageService:
             
             # 檢查是否為內容政策錯誤
             error_message = str(e)
-            if 'image_generation_user_error' in error_message or 'content_policy' in error_message.lower():
+            if isinstance(e, RateLimitExceeded):
+                return {
+                    'success': False,
+                    'error': error_message,
+                    'error_type': 'rate_limited'
+                }
+            elif 'image_generation_user_error' in error_message or 'content_policy' in error_message.lower():
                 return {
                     'success': False,
                     'error': 'Prompt 內容不符合 OpenAI 內容政策，請修改後重試。建議移除可能敏感的描述，或使用「🎨 優化 Prompt」功能獲得安全的替代建議。',
@@ -206,6 +234,27 @@ class OpenAIImageService:
                     'error_type': 'general_error'
                 }
     
+    def _download_image(self, image_url: str, local_path: str) -> int:
+        """
+        以串流方式下載圖像至檔案，回傳寫入的位元組數
+
+        先寫入暫存檔，完整下載後才改名為目標檔名；下載中斷或內容為空時不會在 generated 留下檔案
+        """
+        print(f"📥 下載圖像: {os.path.basename(local_path)}")
+        
+        file_size = 0
+        with self.http_session.get(image_url, timeout=self.DOWNLOAD_TIMEOUT, stream=True) as img_response:
+            img_response.raise_for_status()
+            with atomic_write(local_path) as f:
+                for chunk in img_response.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        file_size += len(chunk)
+                if file_size == 0:
+                    raise ValueError("圖像檔案大小為0")
+        
+        return file_size
+    
     def _generate_mock_images(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """生成模擬圖像（當無法使用真實 API 時）"""
         print("🎭 使用模擬模式生成圖像...")
@@ -219,12 +268,13 @@ class OpenAIImageService:
         
         # 創建模擬圖像
         images = []
-        generated_dir = os.path.join(os.getcwd(), 'generated')
+        generated_dir = self.generated_dir
         os.makedirs(generated_dir, exist_ok=True)
+        batch_id = str(uuid.uuid4())[:8]
         
         for i in range(count):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"dalle_mock_{timestamp}_{i}.png"
+            filename = f"dalle_mock_{timestamp}_{batch_id}_{i}.png"
             local_path = os.path.join(generated_dir, filename)
             
             # 創建簡單的模擬圖像
@@ -2,10 +2,15 @@
 """
 資料庫初始化腳本
 如果遇到 "database is locked" 錯誤，可以運行此腳本來修復
+
+用法:
+    python init_database.py                        # 初始化 / 修復資料庫
+    python init_database.py --incremental-vacuum   # 將既有資料庫轉換為增量 VACUUM 模式（維護時段執行，僅需一次）
 """
 
 import os
 import sys
+import argparse
 from pathlib import Path
 
 # 添加專案根目錄到 Python 路徑
@@ -15,6 +20,22 @@ from services.simple_stats_service import SimpleStatsService
 
 def main():
     """主函數"""
+    parser = argparse.ArgumentParser(description='初始化統計資料庫')
+    parser.add_argument('--incremental-vacuum', action='store_true',
+                        help='將既有資料庫轉換為增量 VACUUM 模式（需完整 VACUUM，執行期間會鎖住資料庫）')
+    args = parser.parse_args()
+    
+    if args.incremental_vacuum:
+        try:
+            if SimpleStatsService().enable_incremental_vacuum():
+                print("✅ 已轉換為增量 VACUUM 模式，保留作業清理後會自動歸還空間")
+            else:
+                print("✅ 資料庫已是增量 VACUUM 模式，不需轉換")
+        except Exception as e:
+            print(f"❌ 轉換失敗: {e}")
+            sys.exit(1)
+        return
+    
     print("🔄 開始初始化資料庫...")
     
     try:
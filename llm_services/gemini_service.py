@@ -1,7 +1,9 @@
-import google.generativeai as genai
 import re
 import os
-from typing import Dict, List, Union
+from typing import Dict, List, Union, Iterator, Optional
+
+from services.rate_limiter import get_rate_limiter
+from services.sdk_loader import import_sdk
 
 class GeminiService:
     """Gemini LLM 服務類別"""
@@ -11,6 +13,11 @@ class GeminiService:
         if not api_key:
             raise ValueError("Gemini API 金鑰不能為空")
         
+        # Gemini SDK 延遲到建立服務時才匯入
+        genai = import_sdk('google.generativeai', 'pip install google-generativeai')
+        if genai is None:
+            raise ImportError("Gemini SDK 不可用，請安裝: pip install google-generativeai")
+        
         # 配置 Gemini API
         genai.configure(api_key=api_key)
         
@@ -89,6 +96,7 @@ class GeminiService:
         請直接返回優化後的提示詞，不要有額外的說明或格式。
         """
         
+        get_rate_limiter().acquire('gemini', self.model_name)
         response = self.model.generate_content(optimization_prompt)
         return response.text.strip()
     
@@ -122,6 +130,7 @@ class GeminiService:
         建議C：[提示詞內容]
         """
         
+        get_rate_limiter().acquire('gemini', self.model_name)
         response = self.model.generate_content(suggestion_prompt)
         suggestions_text = response.text.strip()
         
@@ -235,10 +244,12 @@ class GeminiService:
         """檢查內容是否符合政策"""
         return not self._check_sensitive_keywords(prompt)
     
-    def generate_content(self, prompt: str) -> Dict:
-        """生成內容的統一接口"""
+    def generate_content(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """生成內容的統一接口（timeout 為等待權杖與單次 API 呼叫的最長秒數）"""
         try:
-            response = self.model.generate_content(prompt)
+            get_rate_limiter().acquire('gemini', self.model_name, timeout=timeout)
+            request_options = {'timeout': timeout} if timeout else None
+            response = self.model.generate_content(prompt, request_options=request_options)
             return {
                 'success': True,
                 'content': response.text.strip()
@@ -248,4 +259,37 @@ class GeminiService:
             return {
                 'success': False,
                 'error': str(e)
-            } 
\ No newline at end of file
+            }
+    
+    def generate_content_stream(self, prompt: str) -> Iterator[str]:
+        """串流生成內容的統一接口，逐段產生模型輸出的文字片段
+
+        失敗（包含內容被安全過濾器阻擋）時直接拋出例外，由呼叫端決定如何回報
+        """
+        get_rate_limiter().acquire('gemini', self.model_name)
+        response = self.model.generate_content(prompt, stream=True)
+        
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # 片段被阻擋或不含文字（例如只帶有 finish_reason）時，存取 chunk.text 會拋出 ValueError
+                block_reason = self._stream_block_reason(chunk)
+                if block_reason:
+                    raise Exception(f"Gemini 已阻擋此內容（{block_reason}），請調整 prompt 後再試")
+                continue
+            if text:
+                yield text
+    
+    def _stream_block_reason(self, chunk) -> Optional[str]:
+        """取得串流片段被阻擋的原因，未被阻擋時回傳 None"""
+        feedback = getattr(chunk, 'prompt_feedback', None)
+        if feedback is not None and getattr(feedback, 'block_reason', None):
+            return getattr(feedback.block_reason, 'name', str(feedback.block_reason))
+        
+        for candidate in getattr(chunk, 'candidates', None) or []:
+            finish_reason = getattr(candidate, 'finish_reason', None)
+            reason = getattr(finish_reason, 'name', str(finish_reason))
+            if reason in ('SAFETY', 'RECITATION', 'BLOCKLIST', 'PROHIBITED_CONTENT', 'SPII'):
+                return reason
+        return None
\ No newline at end of file
@@ -5,28 +5,15 @@ OpenAI LLM 服務
 
 import os
 import re
-from typing import Dict, List, Union
+from typing import Dict, List, Union, Iterator, Optional
 from dotenv import load_dotenv
 
+from services.rate_limiter import get_rate_limiter
+from services.sdk_loader import import_sdk
+
 # 載入環境變數
 load_dotenv()
 
-# 嘗試導入 OpenAI SDK
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-    print("✅ OpenAI SDK 可用")
-except ImportError as e:
-    print(f"⚠️ OpenAI SDK 不可用: {e}")
-    print("💡 請執行: pip install openai")
-    OPENAI_AVAILABLE = False
-    
-    # 創建模擬的 OpenAI 類別
-    class openai:
-        class OpenAI:
-            def __init__(self, api_key=None):
-                raise Exception("OpenAI SDK 不可用")
-
 class OpenAILLMService:
     """OpenAI LLM 服務類別"""
     
@@ -36,7 +23,9 @@ class OpenAILLMService:
         self.model_name = model_name or os.getenv('OPENAI_TEXT_GEN_MODEL', 'gpt-4')
         self.use_mock = False
         
-        if not OPENAI_AVAILABLE:
+        # OpenAI SDK 延遲到建立服務時才匯入
+        openai = import_sdk('openai', 'pip install openai')
+        if openai is None:
             print("⚠️ OpenAI SDK 不可用，將使用模擬模式")
             self.use_mock = True
             return
@@ -126,6 +115,7 @@ class OpenAILLMService:
         """
         
         try:
+            get_rate_limiter().acquire('openai_llm', self.model_name)
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
@@ -174,6 +164,7 @@ class OpenAILLMService:
         """
         
         try:
+            get_rate_limiter().acquire('openai_llm', self.model_name)
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
@@ -263,8 +254,8 @@ class OpenAILLMService:
         """檢查內容政策（返回 True 表示安全）"""
         return not self._check_sensitive_keywords(prompt)
     
-    def generate_content(self, prompt: str) -> Dict:
-        """生成內容（通用方法）"""
+    def generate_content(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """生成內容（通用方法，timeout 為等待權杖與單次 API 呼叫的最長秒數）"""
         if self.use_mock:
             return {
                 'success': True,
@@ -273,13 +264,16 @@ class OpenAILLMService:
             }
         
         try:
+            get_rate_limiter().acquire('openai_llm', self.model_name, timeout=timeout)
+            request_options = {'timeout': timeout} if timeout else {}
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1000,
-                temperature=0.7
+                temperature=0.7,
+                **request_options
             )
             
             return {
@@ -296,6 +290,35 @@ class OpenAILLMService:
                 'mock_mode': False
             }
     
+    def generate_content_stream(self, prompt: str) -> Iterator[str]:
+        """串流生成內容（通用方法），逐段產生模型輸出的文字片段
+
+        失敗時直接拋出例外，由呼叫端決定如何回報
+        """
+        if self.use_mock:
+            content = f"模擬回應：{prompt[:50]}..."
+            for i in range(0, len(content), 8):
+                yield content[i:i + 8]
+            return
+        
+        get_rate_limiter().acquire('openai_llm', self.model_name)
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True
+        )
+        
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    
     # 模擬模式方法
     def _mock_analyze_prompt_safety(self, prompt: str, content_type: str) -> Dict:
         """模擬 prompt 安全性分析"""
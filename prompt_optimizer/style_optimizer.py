@@ -0,0 +1,178 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Iterator
+
+# 六種風格的名稱與說明（圖像）
+IMAGE_STYLES = [
+    ("自然清新風 (Natural & Clean)", "提升整體亮度與對比度，強化綠色與藍色的飽和度，柔化膚色、減少雜訊，適合風景照或日光人像"),
+    ("電影感風格 (Cinematic Look)", "壓低高光、拉深陰影，添加冷色調或橙青對比色分級，加入黑邊或 21:9 膠片比例遮幅，適合街景、情感人像、夜景"),
+    ("復古懷舊風 (Vintage/Retro)", "降低飽和度，添加黃色或綠色色調，模擬底片顆粒與雜訊，使用色調曲線模擬舊照片褪色感，適合文青風或老街場景"),
+    ("高質感商業風 (High-End Editorial)", "精準膚色校正，銳化重點細節（如眼睛、配飾），背景去雜，控制景深或加柔焦，適合人像特寫或商品攝影"),
+    ("黑白極簡風 (Monochrome Minimalism)", "轉為黑白灰階，加強光影對比與形狀線條表現，清除雜點與背景干擾，適合強調情緒或幾何結構"),
+    ("夢幻光影風 (Soft Dreamy)", "加入柔焦/光暈效果，使用粉色、紫色、淡藍作色調分級，降低清晰度，強調柔和過渡，適合婚紗、日落、森林漫步類主題")
+]
+
+# 六種風格的名稱與說明（影片）
+VIDEO_STYLES = [
+    ("自然清新風 (Natural & Clean)", "提升整體亮度與對比度，強化自然色彩，清晰流暢的動作，適合戶外場景或生活記錄"),
+    ("電影感風格 (Cinematic Look)", "電影級攝影技巧，戲劇性燈光，深度景深，慢動作或特殊鏡頭運動，適合敘事性影片"),
+    ("復古懷舊風 (Vintage/Retro)", "復古色調和濾鏡效果，模擬舊時代影片質感，添加顆粒感和色彩偏移，適合懷舊主題"),
+    ("高質感商業風 (High-End Editorial)", "專業級色彩校正，精緻的光影處理，商業廣告級別的視覺品質，適合產品展示或品牌影片"),
+    ("黑白極簡風 (Monochrome Minimalism)", "黑白灰階處理，強調光影對比和構圖線條，極簡主義美學，適合藝術表達"),
+    ("夢幻光影風 (Soft Dreamy)", "柔和的光暈效果，夢幻般的色彩分級，輕柔的動作過渡，適合浪漫或幻想主題")
+]
+
+class StyleOptimizer:
+    """六種風格 Prompt 優化器 - 每種風格各自發出一次較小的請求並行處理"""
+
+    def __init__(self, llm_service, llm_cache=None, max_workers: int = 6, style_timeout: float = 20.0):
+        """
+        初始化風格優化器
+
+        Args:
+            llm_service: 提供 generate_content 的 LLM 服務
+            llm_cache: LLM 回應快取（可選）
+            max_workers: 每個請求同時進行的風格請求數（每個請求使用自己的執行緒池）
+            style_timeout: 每個請求的等待秒數，逾時的風格以原始 prompt 代替；
+                           同時作為單次 LLM 呼叫的逾時，放棄的呼叫會自行結束，不會佔住執行緒
+        """
+        if not llm_service:
+            raise ValueError("LLM 服務不能為空")
+
+        self.llm_service = llm_service
+        self.llm_cache = llm_cache
+        self.max_workers = max(1, max_workers)
+        self.style_timeout = style_timeout
+
+    def get_styles(self, content_type: str) -> List[tuple]:
+        """獲取內容類型對應的風格清單"""
+        return VIDEO_STYLES if content_type == 'video' else IMAGE_STYLES
+
+    def _build_style_prompt(self, prompt: str, content_type: str, style_name: str, style_description: str) -> str:
+        """建立單一風格的優化 prompt"""
+        if content_type == 'video':
+            return f"""
+請將以下影片生成 prompt 優化為「{style_name}」風格的版本，保持原意，但應用此風格的視覺風格和動態效果：
+
+風格說明：{style_description}
+
+原始 prompt：
+{prompt}
+
+只返回優化後的 prompt，不要加上版本標籤或其他說明。
+"""
+        return f"""
+請將以下圖像生成 prompt 優化為「{style_name}」風格的版本，保持原意，但應用此風格的視覺風格：
+
+風格說明：{style_description}
+
+原始 prompt：
+{prompt}
+
+只返回優化後的 prompt，不要加上版本標籤或其他說明。
+"""
+
+    def _optimize_style(self, prompt: str, content_type: str, index: int) -> Dict[str, Any]:
+        """執行單一風格的優化"""
+        style_name, style_description = self.get_styles(content_type)[index]
+        style_prompt = self._build_style_prompt(prompt, content_type, style_name, style_description)
+
+        if self.llm_cache:
+            template = f'{content_type}_style_{index + 1}:v1'
+            response = self.llm_cache.generate_content(self.llm_service, template, prompt, style_prompt,
+                                                       timeout=self.style_timeout)
+        else:
+            response = self.llm_service.generate_content(style_prompt, timeout=self.style_timeout)
+
+        content = (response or {}).get('content', '').strip()
+        if not content:
+            raise Exception((response or {}).get('error') or '優化服務未返回內容')
+        return {'prompt': content, 'cached': bool(response.get('cached'))}
+
+    def iter_optimizations(self, prompt: str, content_type: str = 'image') -> Iterator[Dict[str, Any]]:
+        """
+        並行優化六種風格，依完成順序產生結果
+
+        Yields:
+            包含 index、style_name、prompt、success 的字典；失敗或逾時的風格以原始 prompt 代替
+        """
+        styles = self.get_styles(content_type)
+
+        # 每個請求使用自己的執行緒池：不會排在其他請求（或其逾時後仍在執行的呼叫）之後，
+        # 所有風格同時開始，逾時從送出時起算
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(styles)),
+                                      thread_name_prefix='style-optimizer')
+        futures = {
+            executor.submit(self._optimize_style, prompt, content_type, index): index
+            for index in range(len(styles))
+        }
+        pending = set(futures)
+        deadline = time.monotonic() + self.style_timeout
+
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    for future in sorted(pending, key=futures.get):
+                        index = futures[future]
+                        print(f"⚠️ 風格 {styles[index][0]} 優化逾時 ({self.style_timeout} 秒)")
+                        yield {
+                            'index': index,
+                            'style_name': styles[index][0],
+                            'prompt': prompt,
+                            'success': False,
+                            'error': '優化逾時',
+                            'timed_out': True
+                        }
+                    break
+
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+                for future in sorted(done, key=futures.get):
+                    pending.discard(future)
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                        yield {
+                            'index': index,
+                            'style_name': styles[index][0],
+                            'prompt': result['prompt'],
+                            'success': True,
+                            'cached': result['cached']
+                        }
+                    except Exception as e:
+                        print(f"⚠️ 風格 {styles[index][0]} 優化失敗: {e}")
+                        yield {
+                            'index': index,
+                            'style_name': styles[index][0],
+                            'prompt': prompt,
+                            'success': False,
+                            'error': str(e)
+                        }
+        finally:
+            # 逾時或用戶端中斷時不等待剩餘的呼叫；它們會在 LLM 呼叫逾時後結束並釋放執行緒
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def optimize(self, prompt: str, content_type: str = 'image') -> Dict[str, Any]:
+        """並行優化六種風格，回傳依風格順序排列的完整結果"""
+        styles = self.get_styles(content_type)
+        optimizations = [prompt] * len(styles)
+        failed_styles = []
+
+        for item in self.iter_optimizations(prompt, content_type):
+            optimizations[item['index']] = item['prompt']
+            if not item['success']:
+                failed_styles.append(item['style_name'])
+
+        if len(failed_styles) == len(styles):
+            return {'success': False, 'error': '優化服務暫時不可用'}
+
+        return {
+            'success': True,
+            'original_prompt': prompt,
+            'optimizations': optimizations,
+            'style_names': [name for name, _ in styles],
+            'failed_styles': failed_styles
+        }
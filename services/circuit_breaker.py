@@ -0,0 +1,135 @@
+import time
+import threading
+from typing import Dict, List, Any, Optional
+
+class CircuitBreaker:
+    """
+    斷路器 - 模型配額用盡時暫停呼叫，冷卻後只放行一個試探請求
+
+    狀態:
+        closed: 正常放行
+        open: 冷卻中，所有請求直接跳過此模型
+        half_open: 冷卻結束，放行一個試探請求；成功則關閉，失敗則重新打開
+    """
+
+    def __init__(self, failure_threshold: int = 1, cooldown: float = 60.0):
+        """
+        初始化斷路器
+
+        Args:
+            failure_threshold: 連續失敗幾次後打開
+            cooldown: 打開後的冷卻秒數
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counters = {'allowed': 0, 'rejected': 0, 'opened': 0}
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """是否可以呼叫此模型；half_open 狀態下同時只放行一個試探請求"""
+        with self.lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self.probe_in_flight = False
+
+            if self.state == 'closed' or (self.state == 'half_open' and not self.probe_in_flight):
+                if self.state == 'half_open':
+                    self.probe_in_flight = True
+                self.counters['allowed'] += 1
+                return True
+
+            self.counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """呼叫成功，關閉斷路器"""
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """配額相關的失敗，達到門檻（或試探失敗）時打開斷路器"""
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.counters['opened'] += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def release(self):
+        """呼叫因與配額無關的原因結束（如參數錯誤、本地限流），不改變狀態，只釋放試探名額"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def get_state(self) -> str:
+        with self.lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                return 'half_open'
+            return self.state
+
+    def retry_after(self) -> float:
+        """距離可以試探還有幾秒"""
+        with self.lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class CircuitBreakerRegistry:
+    """斷路器登記表 - 每個提供者 / 模型一個斷路器，在程序內所有請求之間共用"""
+
+    def __init__(self, failure_threshold: int = 1, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, provider: str, model: Optional[str] = None) -> CircuitBreaker:
+        """取得（或建立）提供者 / 模型對應的斷路器"""
+        key = (provider, model or '*')
+        with self.lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(self.failure_threshold, self.cooldown)
+            return self.breakers[key]
+
+    def get_statistics(self) -> List[Dict[str, Any]]:
+        """獲取各斷路器的狀態"""
+        with self.lock:
+            items = sorted(self.breakers.items(), key=lambda item: item[0])
+
+        stats = []
+        for (provider, model), breaker in items:
+            with breaker.lock:
+                counters = dict(breaker.counters)
+            stats.append({
+                'provider': provider,
+                'model': model,
+                'state': breaker.get_state(),
+                'retry_after': round(breaker.retry_after(), 1),
+                **counters
+            })
+        return stats
+
+
+_circuit_breakers = None
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """獲取全程序共用的斷路器登記表（首次呼叫時依 Config 建立）"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        with _circuit_breakers_lock:
+            if _circuit_breakers is None:
+                from config.config import Config
+                _circuit_breakers = CircuitBreakerRegistry(
+                    failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    cooldown=Config.CIRCUIT_BREAKER_COOLDOWN
+                )
+    return _circuit_breakers
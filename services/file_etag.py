@@ -0,0 +1,62 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+class FileETagCache:
+    """檔案內容 ETag 快取 - 以內容雜湊作為強 ETag，檔案的修改時間與大小不變時不重新計算"""
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, max_entries: int = 2048):
+        """
+        初始化 ETag 快取
+
+        Args:
+            max_entries: 最多保留的檔案數量，超過時淘汰最久未使用者
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # path -> (mtime_ns, size, etag)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hashed_bytes = 0
+
+    def get_etag(self, path: str) -> str:
+        """取得檔案的 ETag（內容 BLAKE2b 雜湊），檔案不存在時拋出 FileNotFoundError"""
+        stat = os.stat(path)
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+
+        # 在鎖外計算雜湊，大型影片不會阻塞其他檔案的請求
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+
+        with self.lock:
+            self.entries[path] = (stat.st_mtime_ns, stat.st_size, etag)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.misses += 1
+            self.hashed_bytes += stat.st_size
+
+        return etag
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取快取統計"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hashed_bytes': self.hashed_bytes
+            }
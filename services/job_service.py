@@ -0,0 +1,405 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterator, Optional
+
+class JobStore:
+    """任務狀態共用儲存 - 讓多個 worker 程序能查詢彼此執行中的任務狀態與事件"""
+
+    def __init__(self, db_path: str = 'data/jobs.db'):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                snapshot TEXT NOT NULL,
+                events TEXT NOT NULL,
+                expires_at REAL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs(expires_at)')
+        self.conn.commit()
+
+    def save(self, job: Dict[str, Any]):
+        """寫入任務目前的狀態與事件"""
+        snapshot = {key: value for key, value in job.items() if key not in ('expires_at', 'events')}
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO jobs (job_id, job_type, status, snapshot, events, expires_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job['job_id'], job['job_type'], job['status'],
+                json.dumps(snapshot, ensure_ascii=False, default=str),
+                json.dumps(job['events'], ensure_ascii=False, default=str),
+                job['expires_at'], time.time()
+            ))
+            self.conn.commit()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """讀取任務（包含事件），不存在或已過期時回傳 None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT snapshot, events, expires_at FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+        if row is None or (row[2] is not None and row[2] < time.time()):
+            return None
+
+        job = json.loads(row[0])
+        job['events'] = json.loads(row[1])
+        job['expires_at'] = row[2]
+        return job
+
+    def cleanup(self, stale_after: float):
+        """刪除已過期的任務，以及超過 stale_after 秒未更新的未完成任務（例如 worker 已停止）"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''
+                DELETE FROM jobs
+                WHERE (expires_at IS NOT NULL AND expires_at < ?)
+                   OR (expires_at IS NULL AND updated_at < ?)
+            ''', (now, now - stale_after))
+            self.conn.commit()
+
+
+class JobProgress:
+    """任務進度回報函數 - 以 progress_callback(stage, message, **details) 呼叫；延後完成的任務以 complete(result) 結束"""
+
+    def __init__(self, job_service: 'JobService', job_id: str):
+        self.job_service = job_service
+        self.job_id = job_id
+
+    def __call__(self, stage: str, message: str = '', **details):
+        self.job_service.report_progress(self.job_id, stage, message, **details)
+
+    def complete(self, result: Dict[str, Any]):
+        self.job_service.complete_job(self.job_id, result)
+
+
+class JobService:
+    """背景生成任務服務 - 以有界執行緒池執行耗時的圖像 / 影片生成"""
+
+    def __init__(self, worker_limits: Dict[str, int] = None, max_pending: int = 50, result_ttl: int = 3600,
+                 store_path: Optional[str] = None):
+        """
+        初始化任務服務
+
+        Args:
+            worker_limits: 各任務類型的工作執行緒數量，例如 {'image': 4, 'video': 2}
+            max_pending: 每種任務類型允許排隊 + 執行中的最大任務數
+            result_ttl: 已完成任務結果保留秒數
+            store_path: 任務共用儲存路徑，多個 worker 程序時需設定，讓任一 worker 都能查詢任務
+        """
+        self.worker_limits = worker_limits or {'image': 4, 'video': 2}
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.store = JobStore(store_path) if store_path else None
+
+        # 每種任務類型使用獨立的執行緒池，避免影片任務佔滿圖像任務的資源
+        self.executors = {
+            job_type: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{job_type}-job')
+            for job_type, workers in self.worker_limits.items()
+        }
+
+        self.jobs = {}
+        self.lock = threading.Lock()
+        # 任務事件更新時通知等待中的 SSE 串流
+        self.events_changed = threading.Condition(self.lock)
+
+        print(f"✅ 任務服務已初始化 (工作執行緒: {self.worker_limits}, 佇列上限: {max_pending})")
+
+    def submit(self, job_type: str, func: Callable, *args, **kwargs) -> Dict[str, Any]:
+        """
+        提交背景任務
+
+        Args:
+            job_type: 任務類型（'image' 或 'video'）
+            func: 實際執行生成的函數，回傳結果字典
+
+        Returns:
+            包含任務資訊的字典
+        """
+        executor = self.executors.get(job_type)
+        if executor is None:
+            return {'success': False, 'error': f'不支援的任務類型: {job_type}'}
+
+        with self.lock:
+            self._cleanup_expired_jobs()
+
+            pending = sum(
+                1 for job in self.jobs.values()
+                if job['job_type'] == job_type and job['status'] in ('queued', 'running')
+            )
+            if pending >= self.max_pending:
+                return {'success': False, 'error': '任務佇列已滿，請稍後再試'}
+
+            job_id = str(uuid.uuid4())
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'job_type': job_type,
+                'status': 'queued',
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+                'progress': 0,
+                'stage': 'queued',
+                'events': [],
+                'expires_at': None
+            }
+            self._append_event(self.jobs[job_id], 'queued', '任務已排入佇列', progress=0)
+            self._persist(self.jobs[job_id])
+
+        executor.submit(self._run_job, job_id, func, *args, **kwargs)
+        print(f"📥 已提交 {job_type} 任務: {job_id}")
+
+        return {'success': True, 'job': self.get_job(job_id)}
+
+    def _run_job(self, job_id: str, func: Callable, *args, **kwargs):
+        """在工作執行緒中執行任務"""
+        self._update_job(job_id, status='running', started_at=datetime.now().isoformat())
+        self.report_progress(job_id, 'running', '開始執行生成任務', progress=1)
+
+        progress_callback = JobProgress(self, job_id)
+
+        try:
+            result = func(*args, progress_callback=progress_callback, **kwargs)
+            if result.get('deferred'):
+                # 結果由外部（如長時間操作追蹤器）稍後以 complete_job 寫回，工作執行緒不需等待
+                print(f"⏳ 任務 {job_id} 已提交，等待外部操作完成")
+                return
+            self.complete_job(job_id, result)
+        except Exception as e:
+            print(f"❌ 任務 {job_id} 執行失敗: {e}")
+            self._finish_job(job_id, 'failed', error=str(e))
+
+    def complete_job(self, job_id: str, result: Dict[str, Any]):
+        """
+        以生成結果結束任務
+
+        任務不在本程序（例如由其他 worker 提交、或程序重新啟動後接手的操作）時直接更新共用儲存。
+        """
+        status = 'completed' if result.get('success') else 'failed'
+        error = None if status == 'completed' else result.get('error')
+
+        with self.lock:
+            is_local = job_id in self.jobs
+        if is_local:
+            self._finish_job(job_id, status, result=result, error=error)
+        elif self.store is not None:
+            job = self.store.load(job_id)
+            if not job or job['status'] in ('completed', 'failed'):
+                return
+            job.update(
+                status=status,
+                result=result,
+                error=error,
+                finished_at=datetime.now().isoformat(),
+                expires_at=time.time() + self.result_ttl
+            )
+            message = '生成任務完成' if status == 'completed' else (error or '生成任務失敗')
+            self._append_event(job, status, message, progress=100 if status == 'completed' else job['progress'])
+            self._persist(job)
+        else:
+            return
+        print(f"✅ 任務 {job_id} 結束，狀態: {status}")
+
+    def _finish_job(self, job_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
+        """標記任務結束並發出最終事件"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] in ('completed', 'failed'):
+                return
+            job.update(
+                status=status,
+                result=result,
+                error=error,
+                finished_at=datetime.now().isoformat(),
+                expires_at=time.time() + self.result_ttl
+            )
+            message = '生成任務完成' if status == 'completed' else (error or '生成任務失敗')
+            self._append_event(job, status, message, progress=100 if status == 'completed' else job['progress'])
+            self._persist(job)
+            self.events_changed.notify_all()
+
+    def _update_job(self, job_id: str, **fields):
+        """更新任務欄位"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                job.update(fields)
+                self._persist(job)
+
+    def report_progress(self, job_id: str, stage: str, message: str = '', **details):
+        """
+        記錄任務進度事件
+
+        Args:
+            job_id: 任務 ID
+            stage: 階段名稱（如 'validated'、'submitted'、'batch_completed'、'downloading'、'saved'）
+            message: 顯示給使用者的訊息
+            **details: 其他細節，可包含 progress（0-100）
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] in ('completed', 'failed'):
+                return
+            self._append_event(job, stage, message, **details)
+            self._persist(job)
+            self.events_changed.notify_all()
+
+    def _append_event(self, job: Dict[str, Any], stage: str, message: str, **details):
+        """新增事件到任務（呼叫端需持有鎖）"""
+        progress = details.pop('progress', None)
+        if progress is not None:
+            # 進度只前進不後退
+            job['progress'] = max(job['progress'], int(progress))
+        job['stage'] = stage
+
+        event = {
+            'id': len(job['events']),
+            'stage': stage,
+            'message': message,
+            'progress': job['progress'],
+            'timestamp': datetime.now().isoformat()
+        }
+        if details:
+            event['details'] = details
+        job['events'].append(event)
+
+    def _persist(self, job: Dict[str, Any]):
+        """同步任務到共用儲存（呼叫端需持有鎖）"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            print(f"⚠️ 任務 {job['job_id']} 寫入共用儲存失敗: {e}")
+
+    def iter_events(self, job_id: str, last_event_id: int = -1, heartbeat: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        依序產生任務事件，直到任務結束
+
+        Args:
+            job_id: 任務 ID
+            last_event_id: 已收到的最後事件 ID（用於斷線重連）
+            heartbeat: 無新事件時產生 None 的間隔秒數，供呼叫端送出保持連線訊息
+
+        Yields:
+            事件字典；逾時無事件時為 None
+        """
+        next_index = last_event_id + 1
+
+        with self.lock:
+            is_local = job_id in self.jobs
+        if not is_local:
+            # 任務由其他 worker 程序執行，改為輪詢共用儲存
+            yield from self._iter_stored_events(job_id, next_index, heartbeat)
+            return
+
+        while True:
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if not job:
+                    return
+
+                if next_index >= len(job['events']) and job['status'] not in ('completed', 'failed'):
+                    self.events_changed.wait(timeout=heartbeat)
+
+                events = job['events'][next_index:]
+                finished = job['status'] in ('completed', 'failed')
+                result = job['result']
+
+            for event in events:
+                if event['stage'] in ('completed', 'failed'):
+                    event = dict(event, result=result)
+                yield event
+            next_index += len(events)
+
+            if finished and not events:
+                return
+            if not events:
+                yield None
+
+    def _iter_stored_events(self, job_id: str, next_index: int, heartbeat: float,
+                            poll_interval: float = 0.5) -> Iterator[Optional[Dict[str, Any]]]:
+        """從共用儲存輪詢其他 worker 的任務事件"""
+        if self.store is None:
+            return
+
+        idle_since = time.time()
+        while True:
+            job = self.store.load(job_id)
+            if not job:
+                return
+
+            events = job['events'][next_index:]
+            finished = job['status'] in ('completed', 'failed')
+            for event in events:
+                if event['stage'] in ('completed', 'failed'):
+                    event = dict(event, result=job['result'])
+                yield event
+            next_index += len(events)
+
+            if finished:
+                return
+            if events:
+                idle_since = time.time()
+            elif time.time() - idle_since >= heartbeat:
+                idle_since = time.time()
+                yield None
+            time.sleep(poll_interval)
+
+    def _cleanup_expired_jobs(self):
+        """移除已過期的任務記錄（呼叫端需持有鎖）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['expires_at'] is not None and job['expires_at'] < now
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if self.store is not None:
+            self.store.cleanup(stale_after=self.result_ttl)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """獲取任務狀態與結果"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if not job and self.store is not None:
+            job = self.store.load(job_id)
+        if not job:
+            return None
+        with self.lock:
+            return {key: value for key, value in job.items() if key not in ('expires_at', 'events')}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取任務佇列統計"""
+        with self.lock:
+            stats = {}
+            for job_type in self.executors:
+                jobs = [job for job in self.jobs.values() if job['job_type'] == job_type]
+                stats[job_type] = {
+                    'workers': self.worker_limits[job_type],
+                    'queued': sum(1 for job in jobs if job['status'] == 'queued'),
+                    'running': sum(1 for job in jobs if job['status'] == 'running')
+                }
+            return stats
+
+    def shutdown(self, wait: bool = True):
+        """關閉所有執行緒池"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
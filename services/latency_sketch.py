@@ -0,0 +1,69 @@
+import json
+import math
+from typing import Dict, Optional
+
+class LatencySketch:
+    """精簡的延遲分佈草圖 - 以對數間隔的桶計數估算百分位數（相對誤差約 5%）"""
+
+    MIN_VALUE = 0.01  # 秒，小於此值的延遲歸入第一個桶
+    GAMMA = 1.1       # 相鄰桶的上下界比例
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets = dict(buckets or {})
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> 'LatencySketch':
+        """從資料庫中的 JSON 字串還原"""
+        if not text:
+            return cls()
+        return cls({int(index): count for index, count in json.loads(text).items()})
+
+    def to_json(self) -> str:
+        """轉為可存入資料庫的 JSON 字串（只保存非零的桶）"""
+        return json.dumps({str(index): count for index, count in sorted(self.buckets.items()) if count})
+
+    def _bucket_index(self, value: float) -> int:
+        if value <= self.MIN_VALUE:
+            return 0
+        return int(math.log(value / self.MIN_VALUE) / math.log(self.GAMMA)) + 1
+
+    def add(self, value: float, count: int = 1):
+        """加入一筆延遲（秒）"""
+        index = self._bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: 'LatencySketch'):
+        """合併另一個草圖"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估算第 q 分位數（0-1），無資料時回傳 None"""
+        total = self.count()
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                if index == 0:
+                    return self.MIN_VALUE
+                # 以桶上下界的幾何中點作為估計值
+                return self.MIN_VALUE * self.GAMMA ** (index - 0.5)
+        return self.MIN_VALUE * self.GAMMA ** (max(self.buckets) - 0.5)
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        """獲取 p50 / p95 / p99"""
+        return {
+            name: (round(value, 3) if value is not None else None)
+            for name, value in (
+                ('p50', self.quantile(0.50)),
+                ('p95', self.quantile(0.95)),
+                ('p99', self.quantile(0.99))
+            )
+        }
@@ -0,0 +1,152 @@
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator
+
+class LLMResponseCache:
+    """LLM 回應快取 - 以 SQLite 持久保存相同輸入的優化 / 翻譯結果"""
+
+    def __init__(self, db_path: str = 'data/llm_cache.db', max_entries: int = 1000):
+        """
+        初始化 LLM 回應快取
+
+        Args:
+            db_path: 快取資料庫路徑
+            max_entries: 最多保留的回應數量，超過時淘汰最久未使用者
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                template TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                hit_count INTEGER DEFAULT 0
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache(last_accessed)')
+        self.conn.commit()
+
+        print(f"✅ LLM 回應快取已初始化 ({self.db_path}, 上限 {max_entries} 筆)")
+
+    def make_key(self, model_name: str, template: str, user_input: str) -> str:
+        """依模型、模板版本與正規化後的輸入計算快取鍵"""
+        normalized = ' '.join(user_input.split())
+        payload = '\x1f'.join([model_name or '', template, normalized])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查詢快取的回應內容"""
+        with self.lock:
+            row = self.conn.execute('SELECT content FROM llm_cache WHERE cache_key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.conn.execute(
+                'UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?',
+                (time.time(), key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model_name: str, template: str, content: str):
+        """儲存回應內容，並淘汰超出上限的舊項目"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (cache_key, model_name, template, content, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, model_name or '', template, content, now, now))
+            self.conn.execute('''
+                DELETE FROM llm_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_cache
+                    ORDER BY last_accessed DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            self.conn.commit()
+
+    def generate_content(self, llm_service, template: str, user_input: str, prompt: str,
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        透過快取呼叫 LLM 服務的 generate_content
+
+        Args:
+            llm_service: 提供 generate_content 與 model_name 的 LLM 服務
+            template: 模板名稱與版本（如 'image_translate:v1'），模板內容變更時需更新版本
+            user_input: 使用者原始輸入，用於計算快取鍵
+            prompt: 實際送出的完整 prompt
+            timeout: 未命中時呼叫 LLM 服務的最長秒數（None 表示使用服務預設值）
+
+        Returns:
+            與 llm_service.generate_content 相同格式的結果，命中時附加 cached: True
+        """
+        model_name = getattr(llm_service, 'model_name', '')
+        key = self.make_key(model_name, template, user_input)
+
+        content = self.get(key)
+        if content is not None:
+            print(f"♻️ 使用快取的 LLM 回應: {template}")
+            return {
+                'success': True,
+                'content': content,
+                'model': model_name,
+                'mock_mode': False,
+                'cached': True
+            }
+
+        response = llm_service.generate_content(prompt, timeout=timeout)
+        if response and response.get('success') and not response.get('mock_mode') and response.get('content'):
+            self.put(key, model_name, template, response['content'])
+        return response
+
+    def stream_content(self, llm_service, template: str, user_input: str, prompt: str) -> Iterator[str]:
+        """
+        透過快取呼叫 LLM 服務的 generate_content_stream
+
+        命中時一次產生完整內容；未命中時逐段轉發模型輸出，完整結束後才寫入快取
+        """
+        model_name = getattr(llm_service, 'model_name', '')
+        key = self.make_key(model_name, template, user_input)
+
+        content = self.get(key)
+        if content is not None:
+            print(f"♻️ 使用快取的 LLM 回應: {template}")
+            yield content
+            return
+
+        chunks = []
+        for delta in llm_service.generate_content_stream(prompt):
+            chunks.append(delta)
+            yield delta
+
+        content = ''.join(chunks).strip()
+        if content and not getattr(llm_service, 'use_mock', False):
+            self.put(key, model_name, template, content)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取快取統計"""
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total > 0 else 0
+            }
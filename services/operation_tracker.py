@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import random
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+
+class OperationTracker:
+    """
+    長時間操作追蹤器 - 以單一背景執行緒輪詢所有進行中的外部操作（如 Veo 影片生成）
+
+    操作名稱保存在 SQLite，程序重新啟動後會由任一 worker 接手繼續輪詢；
+    每個操作以指數退避加上隨機抖動安排下一次輪詢，完成後的結果處理交給小型執行緒池。
+    """
+
+    LEASE_SECONDS = 120  # 操作租約秒數，擁有者停止續約後其他 worker 可接手
+
+    def __init__(self, store_path: str = 'data/operations.db', initial_delay: float = 10.0, max_delay: float = 60.0,
+                 multiplier: float = 1.5, jitter: float = 0.2, timeout: float = 1800.0, completion_workers: int = 2):
+        """
+        初始化操作追蹤器
+
+        Args:
+            store_path: 操作記錄資料庫路徑
+            initial_delay: 提交後第一次輪詢前的等待秒數
+            max_delay: 輪詢間隔上限（秒）
+            multiplier: 每次輪詢後間隔的放大倍數
+            jitter: 隨機抖動比例（0.2 表示 ±20%），避免大量操作同時輪詢
+            timeout: 操作最長等待秒數，超過視為失敗
+            completion_workers: 處理完成結果（下載、保存檔案）的執行緒數
+        """
+        self.store_path = Path(store_path)
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+        self.handlers = {}
+        self.callbacks = {}
+        self.default_callback = None
+        self.schedule = []  # (下次輪詢時間, 操作 ID)
+        self.operations = {}
+        self.completed_count = 0
+        self.failed_count = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.stop_event = threading.Event()
+        self.completion_executor = ThreadPoolExecutor(max_workers=completion_workers, thread_name_prefix='operation-complete')
+
+        self.conn = sqlite3.connect(self.store_path, timeout=10.0, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS operations (
+                operation_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                operation_name TEXT NOT NULL,
+                job_id TEXT,
+                context TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                result TEXT,
+                owner TEXT,
+                lease_until REAL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_operations_status_kind ON operations(status, kind)')
+        self.conn.commit()
+        self.db_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self._poll_loop, name='operation-poller', daemon=True)
+        self.thread.start()
+
+        print(f"✅ 操作追蹤器已初始化 ({self.store_path}, 輪詢間隔 {initial_delay:g}-{max_delay:g} 秒)")
+
+    def register_handler(self, kind: str, poll: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                         complete: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]):
+        """
+        註冊某類操作的處理函數，並接手資料庫中無人負責的同類操作
+
+        Args:
+            kind: 操作類型（如 'veo'）
+            poll: 查詢操作狀態，尚未完成回傳 None，完成時回傳原始操作內容
+            complete: 將完成的原始操作轉換為生成結果（下載、保存檔案等）
+        """
+        with self.lock:
+            self.handlers[kind] = {'poll': poll, 'complete': complete}
+        self._claim_orphaned_operations(kind)
+
+    def track(self, kind: str, operation_name: str, context: Dict[str, Any], job_id: Optional[str] = None,
+              on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+              on_poll: Optional[Callable[[int, float], None]] = None) -> str:
+        """
+        開始追蹤已提交的操作
+
+        Args:
+            kind: 操作類型，需先以 register_handler 註冊
+            operation_name: 外部服務回傳的操作名稱
+            context: 完成時處理結果所需的資訊（需可 JSON 序列化）
+            job_id: 對應的背景任務 ID
+            on_complete: 完成時以生成結果呼叫
+            on_poll: 每次輪詢仍未完成時以（輪詢次數, 已等待秒數）呼叫
+
+        Returns:
+            操作 ID
+        """
+        operation_id = str(uuid.uuid4())
+        now = time.time()
+        with self.db_lock:
+            self.conn.execute('''
+                INSERT INTO operations (operation_id, kind, operation_name, job_id, context, created_at, owner, lease_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (operation_id, kind, operation_name, job_id, json.dumps(context, ensure_ascii=False),
+                  now, self.owner, now + self.LEASE_SECONDS))
+            self.conn.commit()
+
+        operation = {
+            'operation_id': operation_id,
+            'kind': kind,
+            'operation_name': operation_name,
+            'job_id': job_id,
+            'context': context,
+            'attempts': 0,
+            'created_at': now
+        }
+        with self.lock:
+            self.operations[operation_id] = operation
+            self.callbacks[operation_id] = {'on_complete': on_complete, 'on_poll': on_poll}
+            heapq.heappush(self.schedule, (now + self._next_delay(0), operation_id))
+            self.wakeup.notify()
+
+        print(f"🛰️ 開始追蹤操作: {operation_name}")
+        return operation_id
+
+    def _next_delay(self, attempts: int) -> float:
+        """第 attempts 次輪詢後的等待秒數（指數退避 + 隨機抖動）"""
+        delay = min(self.max_delay, self.initial_delay * (self.multiplier ** attempts))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _claim_orphaned_operations(self, kind: str):
+        """接手租約已過期（原擁有者已停止）的未完成操作"""
+        now = time.time()
+        with self.db_lock:
+            self.conn.execute('''
+                UPDATE operations SET owner = ?, lease_until = ?
+                WHERE status = 'pending' AND kind = ? AND (lease_until IS NULL OR lease_until < ?)
+            ''', (self.owner, now + self.LEASE_SECONDS, kind, now))
+            self.conn.commit()
+            rows = self.conn.execute('''
+                SELECT operation_id, operation_name, job_id, context, attempts, created_at
+                FROM operations WHERE status = 'pending' AND kind = ? AND owner = ?
+            ''', (kind, self.owner)).fetchall()
+
+        with self.lock:
+            for operation_id, operation_name, job_id, context, attempts, created_at in rows:
+                if operation_id in self.operations:
+                    continue
+                self.operations[operation_id] = {
+                    'operation_id': operation_id,
+                    'kind': kind,
+                    'operation_name': operation_name,
+                    'job_id': job_id,
+                    'context': json.loads(context),
+                    'attempts': attempts,
+                    'created_at': created_at
+                }
+                heapq.heappush(self.schedule, (now, operation_id))
+                print(f"🛰️ 接手未完成的操作: {operation_name}")
+            self.wakeup.notify()
+
+    def _renew_leases(self):
+        """續約本程序負責的操作"""
+        now = time.time()
+        with self.db_lock:
+            self.conn.execute(
+                "UPDATE operations SET lease_until = ? WHERE owner = ? AND status = 'pending'",
+                (now + self.LEASE_SECONDS, self.owner)
+            )
+            self.conn.commit()
+
+    def _poll_loop(self):
+        """背景輪詢迴圈：取出到期的操作逐一查詢"""
+        last_maintenance = time.time()
+        while not self.stop_event.is_set():
+            due = []
+            with self.lock:
+                now = time.time()
+                wait = self.schedule[0][0] - now if self.schedule else self.LEASE_SECONDS / 4
+                if wait > 0:
+                    # 等到最早的輪詢時間，或有新操作加入時被喚醒
+                    self.wakeup.wait(timeout=min(wait, self.LEASE_SECONDS / 4))
+                else:
+                    while self.schedule and self.schedule[0][0] <= now:
+                        due.append(heapq.heappop(self.schedule)[1])
+
+            for operation_id in due:
+                self._poll_operation(operation_id)
+
+            if time.time() - last_maintenance >= self.LEASE_SECONDS / 4:
+                last_maintenance = time.time()
+                try:
+                    self._renew_leases()
+                    for kind in list(self.handlers):
+                        self._claim_orphaned_operations(kind)
+                except sqlite3.Error as e:
+                    print(f"⚠️ 操作租約更新失敗: {e}")
+
+    def _poll_operation(self, operation_id: str):
+        """查詢單一操作，未完成時依退避重新排程"""
+        with self.lock:
+            operation = self.operations.get(operation_id)
+            handler = self.handlers.get(operation['kind']) if operation else None
+            callbacks = self.callbacks.get(operation_id, {})
+        if not operation or not handler:
+            return
+
+        elapsed = time.time() - operation['created_at']
+        operation['attempts'] += 1
+
+        try:
+            raw = handler['poll'](operation)
+        except Exception as e:
+            # 暫時性錯誤：繼續退避重試，直到逾時
+            print(f"⚠️ 輪詢操作失敗 ({operation['operation_name']}): {e}")
+            raw = None
+
+        if raw is None:
+            if elapsed >= self.timeout:
+                self._finish(operation, {'success': False, 'error': f'影片生成逾時（超過 {self.timeout:g} 秒）'}, callbacks)
+                return
+
+            if callbacks.get('on_poll'):
+                try:
+                    callbacks['on_poll'](operation['attempts'], elapsed)
+                except Exception as e:
+                    print(f"⚠️ 輪詢進度回報失敗: {e}")
+
+            with self.db_lock:
+                self.conn.execute('UPDATE operations SET attempts = ? WHERE operation_id = ?',
+                                  (operation['attempts'], operation_id))
+                self.conn.commit()
+            with self.lock:
+                heapq.heappush(self.schedule, (time.time() + self._next_delay(operation['attempts']), operation_id))
+            return
+
+        # 結果處理可能需要下載檔案，交給執行緒池以免阻塞其他操作的輪詢
+        def complete():
+            try:
+                result = handler['complete'](operation, raw)
+            except Exception as e:
+                print(f"❌ 處理操作結果失敗 ({operation['operation_name']}): {e}")
+                result = {'success': False, 'error': f'處理生成結果失敗: {e}'}
+            self._finish(operation, result, callbacks)
+
+        self.completion_executor.submit(complete)
+
+    def _finish(self, operation: Dict[str, Any], result: Dict[str, Any], callbacks: Dict[str, Any]):
+        """保存結果並通知等待者"""
+        status = 'done' if result.get('success') else 'failed'
+        with self.db_lock:
+            self.conn.execute('''
+                UPDATE operations SET status = ?, finished_at = ?, result = ?, attempts = ?
+                WHERE operation_id = ?
+            ''', (status, time.time(), json.dumps(result, ensure_ascii=False, default=str),
+                  operation['attempts'], operation['operation_id']))
+            self.conn.commit()
+
+        with self.lock:
+            self.operations.pop(operation['operation_id'], None)
+            self.callbacks.pop(operation['operation_id'], None)
+            if status == 'done':
+                self.completed_count += 1
+            else:
+                self.failed_count += 1
+
+        print(f"{'✅' if status == 'done' else '❌'} 操作結束: {operation['operation_name']} ({operation['attempts']} 次輪詢)")
+
+        callback = callbacks.get('on_complete')
+        try:
+            if callback:
+                callback(result)
+            elif self.default_callback:
+                # 程序重新啟動後接手的操作沒有原本的回呼，改由預設回呼（如寫回任務記錄）處理
+                self.default_callback(operation, result)
+        except Exception as e:
+            print(f"⚠️ 操作完成回呼失敗: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取追蹤中的操作統計"""
+        with self.lock:
+            return {
+                'in_flight': len(self.operations),
+                'completed': self.completed_count,
+                'failed': self.failed_count
+            }
+
+    def shutdown(self):
+        """停止輪詢（未完成的操作保留在資料庫，重新啟動後繼續）"""
+        self.stop_event.set()
+        with self.lock:
+            self.wakeup.notify_all()
+        self.completion_executor.shutdown(wait=False)
@@ -0,0 +1,208 @@
+import time
+import threading
+from typing import Dict, List, Any, Optional
+
+class TokenBucket:
+    """權杖桶限流器 - 以每分鐘請求數控制呼叫外部 API 的速率"""
+
+    def __init__(self, requests_per_minute: float, capacity: Optional[float] = None):
+        """
+        初始化權杖桶
+
+        Args:
+            requests_per_minute: 每分鐘允許的請求數
+            capacity: 桶容量（允許的瞬間突發量），預設等於每分鐘請求數
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("每分鐘請求數必須大於 0")
+
+        self.requests_per_minute = requests_per_minute
+        self.capacity = capacity or requests_per_minute
+        self.refill_rate = requests_per_minute / 60.0  # 每秒補充的權杖數
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        """依經過時間補充權杖（呼叫端需持有鎖）"""
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.last_refill = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """嘗試立即取得權杖，不等待"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        取得權杖，必要時等待補充
+
+        Args:
+            tokens: 需要的權杖數
+            timeout: 最長等待秒數，None 表示無限等待
+
+        Returns:
+            是否成功取得權杖
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait_time = (tokens - self.tokens) / self.refill_rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait_time > remaining:
+                    return False
+                wait_time = min(wait_time, remaining)
+
+            time.sleep(wait_time)
+
+    def available_tokens(self) -> float:
+        """獲取目前可用的權杖數"""
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+
+class RateLimitExceeded(Exception):
+    """在允許的等待時間內無法取得 API 呼叫權杖"""
+
+    def __init__(self, provider: str, model: Optional[str] = None):
+        self.provider = provider
+        self.model = model
+        target = f"{provider}/{model}" if model else provider
+        super().__init__(f"{target} 已達每分鐘請求上限，請稍後再試")
+
+
+class RateLimiter:
+    """
+    全程序共用的 API 速率限制器 - 依提供者 / 模型維護各自的權杖桶
+
+    權杖桶保存在程序記憶體中；多個 worker 程序時，每個程序只分配到 1 / process_count 的速率，
+    使所有 worker 合計不超過設定的每分鐘請求數
+    """
+
+    def __init__(self, limits: Dict[str, int], max_wait: float = 30.0, process_count: int = 1):
+        """
+        初始化速率限制器
+
+        Args:
+            limits: 各提供者每分鐘請求數（所有 worker 合計），例如 {'imagen': 60, 'veo': 10}
+            max_wait: 取得權杖的最長排隊秒數，超過即快速拒絕
+            process_count: 共用這些限制的 worker 程序數
+        """
+        self.process_count = max(1, process_count)
+        self.limits = {provider: rate / self.process_count for provider, rate in limits.items()}
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, api_rate_limits: Dict[str, int], max_wait: float = 30.0, process_count: int = 1) -> 'RateLimiter':
+        """從 Config.API_RATE_LIMITS 的 '<provider>_requests_per_minute' 設定建立限制器"""
+        suffix = '_requests_per_minute'
+        limits = {
+            key[:-len(suffix)]: value
+            for key, value in api_rate_limits.items()
+            if key.endswith(suffix)
+        }
+        return cls(limits, max_wait=max_wait, process_count=process_count)
+
+    def _get_bucket(self, provider: str, model: Optional[str]) -> Optional[TokenBucket]:
+        """取得（或建立）提供者 / 模型對應的權杖桶"""
+        key = (provider, model or '*')
+        with self.lock:
+            if key not in self.buckets:
+                requests_per_minute = self.limits.get(provider)
+                if not requests_per_minute:
+                    return None
+                # 分攤後每分鐘可能不足 1 個請求，桶容量至少保留 1 個權杖
+                self.buckets[key] = TokenBucket(requests_per_minute, capacity=max(1.0, requests_per_minute))
+                self.counters[key] = {'acquired': 0, 'rejected': 0, 'wait_seconds': 0.0}
+            return self.buckets[key]
+
+    def acquire(self, provider: str, model: Optional[str] = None, wait: bool = True, timeout: Optional[float] = None):
+        """
+        在呼叫外部 API 前取得權杖
+
+        Args:
+            provider: 提供者名稱（如 'imagen'、'veo'、'gemini'）
+            model: 模型名稱，不同模型使用獨立的配額
+            wait: 是否排隊等待權杖；False 時無權杖立即拒絕
+            timeout: 最長等待秒數，預設使用 max_wait
+
+        Raises:
+            RateLimitExceeded: 無法在限制時間內取得權杖
+        """
+        bucket = self._get_bucket(provider, model)
+        if bucket is None:
+            # 未設定限制的提供者不受限
+            return
+
+        key = (provider, model or '*')
+        start_time = time.monotonic()
+
+        if wait:
+            acquired = bucket.acquire(timeout=self.max_wait if timeout is None else timeout)
+        else:
+            acquired = bucket.try_acquire()
+
+        waited = time.monotonic() - start_time
+        with self.lock:
+            counters = self.counters[key]
+            counters['wait_seconds'] += waited
+            if acquired:
+                counters['acquired'] += 1
+            else:
+                counters['rejected'] += 1
+
+        if not acquired:
+            print(f"⚠️ 速率限制拒絕請求: {provider}/{model or '*'}")
+            raise RateLimitExceeded(provider, model)
+
+    def get_statistics(self) -> List[Dict[str, Any]]:
+        """獲取各權杖桶的狀態"""
+        with self.lock:
+            items = list(self.buckets.items())
+            counters = {key: dict(value) for key, value in self.counters.items()}
+
+        stats = []
+        for (provider, model), bucket in sorted(items, key=lambda item: item[0]):
+            stats.append({
+                'provider': provider,
+                'model': model,
+                'requests_per_minute': round(bucket.requests_per_minute, 2),
+                'process_count': self.process_count,
+                'available_tokens': round(bucket.available_tokens(), 2),
+                'acquired': counters[(provider, model)]['acquired'],
+                'rejected': counters[(provider, model)]['rejected'],
+                'wait_seconds': round(counters[(provider, model)]['wait_seconds'], 2)
+            })
+        return stats
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """獲取全程序共用的速率限制器（首次呼叫時依 Config 建立）"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                from config.config import Config
+                _rate_limiter = RateLimiter.from_config(Config.API_RATE_LIMITS, max_wait=Config.RATE_LIMIT_MAX_WAIT,
+                                                        process_count=Config.RATE_LIMIT_PROCESSES)
+    return _rate_limiter
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+class GenerationResultCache:
+    """生成結果快取 - 以正規化參數雜湊對應到已存在於 generated/ 的檔案（SQLite 保存，多個 worker 共用）"""
+
+    # 參與快取鍵計算的生成參數
+    KEY_FIELDS = ('prompt', 'count', 'size', 'quality', 'style')
+
+    def __init__(self, db_path: str = 'data/result_cache.db', max_entries: int = 500, ttl: int = 86400):
+        """
+        初始化結果快取
+
+        Args:
+            db_path: 快取資料庫路徑
+            max_entries: 最多保留的結果數量，超過時淘汰最久未使用者
+            ttl: 結果保留秒數
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS result_cache (
+                cache_key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_last_accessed ON result_cache(last_accessed)')
+        self.conn.commit()
+
+    def make_key(self, provider: str, model: str, params: Dict[str, Any]) -> str:
+        """依提供者、模型與正規化後的參數計算快取鍵"""
+        normalized = {'provider': provider, 'model': model}
+        for field in self.KEY_FIELDS:
+            value = params.get(field)
+            if isinstance(value, str):
+                # 忽略前後空白與連續空白的差異
+                value = ' '.join(value.split())
+            normalized[field] = value
+
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查詢快取，檔案已被刪除或過期的結果視為未命中"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT result, expires_at FROM result_cache WHERE cache_key = ?', (key,)).fetchone()
+            result = json.loads(row[0]) if row else None
+
+            if result and row[1] > now and self._files_exist(result):
+                self.conn.execute('UPDATE result_cache SET last_accessed = ? WHERE cache_key = ?', (now, key))
+                self.conn.commit()
+                self.hits += 1
+                result['cached'] = True
+                return result
+
+            if row:
+                self.conn.execute('DELETE FROM result_cache WHERE cache_key = ?', (key,))
+                self.conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """儲存成功的生成結果，並淘汰超出上限的舊項目"""
+        if not result.get('success') or result.get('mock_mode') or result.get('service') == 'mock':
+            return
+
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO result_cache (cache_key, result, expires_at, last_accessed)
+                VALUES (?, ?, ?, ?)
+            ''', (key, payload, now + self.ttl, now))
+            self.conn.execute('''
+                DELETE FROM result_cache WHERE cache_key IN (
+                    SELECT cache_key FROM result_cache
+                    ORDER BY last_accessed DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            self.conn.commit()
+
+    def _files_exist(self, result: Dict[str, Any]) -> bool:
+        """確認結果中的所有圖像檔案仍存在"""
+        images = result.get('images', [])
+        if not images:
+            return False
+        return all(os.path.exists(image.get('path') or image.get('filepath') or '') for image in images)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取快取統計（命中次數為本 worker 的統計）"""
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM result_cache').fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total > 0 else 0
+            }
@@ -0,0 +1,35 @@
+import importlib
+import threading
+from typing import Dict, Optional
+from types import ModuleType
+
+# 已嘗試匯入的 SDK（匯入失敗者記為 None，避免重複嘗試）
+_loaded: Dict[str, Optional[ModuleType]] = {}
+_lock = threading.Lock()
+
+def import_sdk(module_name: str, install_hint: Optional[str] = None) -> Optional[ModuleType]:
+    """
+    延遲匯入第三方 SDK - 各服務第一次需要時才匯入，避免啟動時載入用不到的大型套件
+
+    Args:
+        module_name: 模組名稱（如 'openai'、'vertexai.vision_models'）
+        install_hint: 匯入失敗時顯示的安裝提示，None 表示不顯示訊息
+
+    Returns:
+        匯入的模組，不可用時回傳 None
+    """
+    if module_name in _loaded:
+        return _loaded[module_name]
+
+    with _lock:
+        if module_name not in _loaded:
+            try:
+                _loaded[module_name] = importlib.import_module(module_name)
+                if install_hint:
+                    print(f"✅ {module_name} SDK 可用")
+            except ImportError as e:
+                _loaded[module_name] = None
+                if install_hint:
+                    print(f"⚠️ {module_name} SDK 不可用: {e}")
+                    print(f"💡 請執行: {install_hint}")
+        return _loaded[module_name]
@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Callable, Iterable, Optional
+
+class ServiceRegistry:
+    """服務註冊表 - 第一次使用時才建立服務，避免啟動時初始化用不到的 SDK"""
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.build_times = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+        # fork 出的子程序（如 gunicorn preload 後的 worker）不沿用父程序建立的實例，
+        # 各自重新建立執行緒池、資料庫連線等狀態
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """註冊服務的建立函數"""
+        with self.lock:
+            self.factories[name] = factory
+            self.locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """取得服務實例，尚未建立時於此建立（每個服務各自加鎖，只會建立一次）"""
+        instance = self.instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self.factories:
+            raise KeyError(f"未註冊的服務: {name}")
+
+        with self.locks[name]:
+            instance = self.instances.get(name)
+            if instance is None:
+                start_time = time.time()
+                instance = self.factories[name]()
+                self.build_times[name] = round(time.time() - start_time, 3)
+                self.instances[name] = instance
+                print(f"✅ 服務 {name} 已建立 ({self.build_times[name]} 秒)")
+        return instance
+
+    def lazy(self, name: str) -> 'LazyService':
+        """取得延遲建立的服務代理，存取任何屬性時才建立實際服務"""
+        return LazyService(self, name)
+
+    def reset(self):
+        """捨棄所有已建立的實例（保留註冊的建立函數）"""
+        self.lock = threading.Lock()
+        self.locks = {name: threading.Lock() for name in self.factories}
+        self.instances = {}
+        self.build_times = {}
+
+    def is_built(self, name: str) -> bool:
+        return name in self.instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = False):
+        """
+        預先建立服務
+
+        Args:
+            names: 要預先建立的服務名稱，None 表示全部
+            background: 是否在背景執行緒建立，不阻塞啟動
+        """
+        targets = list(self.factories) if names is None else [name for name in names if name in self.factories]
+
+        def build_all():
+            for name in targets:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ 預先建立服務 {name} 失敗: {e}")
+
+        if background:
+            threading.Thread(target=build_all, name='service-warm-up', daemon=True).start()
+        else:
+            build_all()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取各服務的建立狀態"""
+        return {
+            name: {
+                'built': name in self.instances,
+                'build_seconds': self.build_times.get(name)
+            }
+            for name in self.factories
+        }
+
+
+class LazyService:
+    """服務代理 - 將屬性存取轉交給註冊表中的實際服務"""
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute):
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._registry.get(self._name), attribute, value)
+
+    def __repr__(self):
+        state = '已建立' if self._registry.is_built(self._name) else '尚未建立'
+        return f"<LazyService {self._name} ({state})>"
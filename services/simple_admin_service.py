@@ -51,7 +51,7 @@ class SimpleAdminService:
             def wrapper(*args, **kwargs):
                 if not self.is_admin_authenticated():
                     from flask import redirect, url_for
-                    return redirect(url_for('admin_login'))
+                    return redirect(url_for('main.admin_login'))
                 return func(*args, **kwargs)
             wrapper.__name__ = func.__name__
             return wrapper
@@ -1,13 +1,37 @@
 import os
 import json
+import time
+import gzip
+import base64
+import queue
+import atexit
 import sqlite3
-from datetime import datetime, date
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 
+from services.latency_sketch import LatencySketch
+
 class SimpleStatsService:
     """簡單的統計記錄服務"""
     
-    def __init__(self):
+    # 保留作業租約秒數（每批清理都會延長）
+    RETENTION_LEASE_SECONDS = 600
+    
+    # 本程序中已完成初始化的資料庫路徑，避免每次建構都重新檢查檔案
+    _initialized_paths = set()
+    _init_lock = threading.Lock()
+    
+    def __init__(self, write_behind=True, batch_size=50, flush_interval=0.5, max_queue_size=10000):
+        """
+        初始化統計服務
+
+        Args:
+            write_behind: 是否在背景批次寫入生成記錄（False 時每筆同步寫入）
+            batch_size: 累積多少筆記錄即寫入一次
+            flush_interval: 第一筆記錄進入佇列後最多等待的秒數
+            max_queue_size: 佇列上限，佇列已滿時改為同步寫入
+        """
         # 創建數據目錄
         self.data_dir = Path('data')
         self.data_dir.mkdir(exist_ok=True)
@@ -15,27 +39,93 @@ class SimpleStatsService:
         # SQLite 數據庫路徑
         self.db_path = self.data_dir / 'stats.db'
         
+        # 每個執行緒保留一條連線重複使用（連線內的 SQL 語句快取也隨之重用）
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        
+        # 背景批次寫入（寫入執行緒在第一次記錄時才啟動）
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+        
+        # 背景保留作業（定期清理過期記錄）
+        self._retention_thread = None
+        self._retention_stop = threading.Event()
+        
+        # prompt 全文檢索表是否可用（第一次搜尋時檢查）
+        self._fts_available = None
+        
         # 初始化數據庫
         self._init_database()
     
+    def _connect(self):
+        """建立新連線並套用連線層級的 PRAGMA"""
+        conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False, cached_statements=64)
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL 模式下安全且避免每次提交都 fsync
+        conn.execute('PRAGMA busy_timeout=10000')
+        return conn
+    
+    def _get_connection(self):
+        """取得目前執行緒的資料庫連線"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.generation = self._generation
+            with self._connections_lock:
+                # 關閉已結束執行緒遺留的連線（開發伺服器每個請求使用新執行緒）
+                for thread in [t for t in self._connections if not t.is_alive()]:
+                    try:
+                        self._connections.pop(thread).close()
+                    except sqlite3.Error:
+                        pass
+                self._connections[threading.current_thread()] = conn
+        return conn
+    
+    def close(self):
+        """關閉所有執行緒的連線，之後的呼叫會自動重新連線"""
+        with self._connections_lock:
+            self._generation += 1
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+    
     def _init_database(self):
         """初始化數據庫表格"""
+        db_key = str(self.db_path.resolve())
+        with SimpleStatsService._init_lock:
+            # 檔案被外部刪除（如 init_database.py 重置）時才需要重新建立
+            if db_key in SimpleStatsService._initialized_paths and self.db_path.exists():
+                return
+            self._create_schema()
+            SimpleStatsService._initialized_paths.add(db_key)
+    
+    def _create_schema(self):
+        """建立資料表（呼叫端需持有初始化鎖）"""
         try:
-            # 確保資料庫檔案不存在損壞的情況
-            if self.db_path.exists():
-                # 嘗試打開檢查是否可用
-                try:
-                    test_conn = sqlite3.connect(self.db_path, timeout=10.0)
-                    test_conn.execute('SELECT 1')
-                    test_conn.close()
-                except sqlite3.Error:
-                    # 如果資料庫損壞，刪除重建
-                    print("⚠️ 資料庫檔案可能損壞，正在重建...")
-                    self.db_path.unlink()
+            try:
+                conn = self._get_connection()
+                # 新資料庫啟用增量 VACUUM（必須在切換 WAL 與建立資料表之前設定；既有資料庫需執行 init_database.py --incremental-vacuum 轉換）
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('PRAGMA journal_mode=WAL')  # 使用 WAL 模式避免鎖定（設定會保存在資料庫檔案中）
+            except sqlite3.DatabaseError:
+                # 如果資料庫損壞，刪除重建
+                print("⚠️ 資料庫檔案可能損壞，正在重建...")
+                self.close()
+                self.db_path.unlink()
+                conn = self._get_connection()
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('PRAGMA journal_mode=WAL')
             
-            # 使用 timeout 和 check_same_thread=False 來避免鎖定問題
-            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
-            conn.execute('PRAGMA journal_mode=WAL')  # 使用 WAL 模式避免鎖定
             cursor = conn.cursor()
             
             # 創建生成記錄表
@@ -52,13 +142,83 @@ class SimpleStatsService:
                 )
             ''')
             
+            # 分頁以 (created_at, id) 為鍵，各篩選欄位的索引也以同樣順序結尾
+            cursor.execute('DROP INDEX IF EXISTS idx_generations_created_at')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_created_id ON generations(created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_type_status ON generations(generation_type, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_type_created ON generations(generation_type, created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_status_created ON generations(status, created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_model_created ON generations(model_name, created_at, id)')
+            
+            self._create_fts(cursor)
+            
+            # 依日期 / 類型 / 狀態累計的計數表，由 record_generation 遞增維護
+            counters_exist = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generation_counters'"
+            ).fetchone()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS generation_counters (
+                    day TEXT NOT NULL,
+                    generation_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, generation_type, status)
+                )
+            ''')
+            if not counters_exist:
+                # 舊資料庫升級時，從既有記錄回填計數
+                cursor.execute('''
+                    INSERT INTO generation_counters (day, generation_type, status, count)
+                    SELECT DATE(created_at), generation_type, status, COUNT(*)
+                    FROM generations
+                    GROUP BY DATE(created_at), generation_type, status
+                ''')
+            
+            # 每小時 / 每日依模型與類型彙總的延遲統計，保留時間可長於原始記錄
+            rollups_exist = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generation_rollups'"
+            ).fetchone()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS generation_rollups (
+                    granularity TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    generation_type TEXT NOT NULL,
+                    model_name TEXT NOT NULL DEFAULT '',
+                    count INTEGER NOT NULL DEFAULT 0,
+                    success_count INTEGER NOT NULL DEFAULT 0,
+                    failure_count INTEGER NOT NULL DEFAULT 0,
+                    time_count INTEGER NOT NULL DEFAULT 0,
+                    time_sum REAL NOT NULL DEFAULT 0,
+                    time_min REAL,
+                    time_max REAL,
+                    latency_sketch TEXT,
+                    PRIMARY KEY (granularity, bucket, generation_type, model_name)
+                )
+            ''')
+            if not rollups_exist:
+                # 舊資料庫升級時，從既有記錄回填彙總
+                rows = cursor.execute('''
+                    SELECT generation_type, prompt, status, created_at, model_name, generation_time, file_count
+                    FROM generations
+                ''')
+                self._apply_rollups(conn, rows)
+            
+            # 維護作業租約（多個 worker 程序中同時只有一個執行保留作業）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS maintenance_leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            
             conn.commit()
-            conn.close()
             print("✅ 資料庫初始化完成")
             
         except sqlite3.Error as e:
             print(f"❌ 資料庫初始化失敗: {e}")
             # 如果還是失敗，嘗試移除檔案重建
+            self.close()
             if self.db_path.exists():
                 try:
                     self.db_path.unlink()
@@ -71,51 +231,186 @@ class SimpleStatsService:
             raise e
     
     def record_generation(self, generation_type, prompt, status, model_name=None, generation_time=None, file_count=0):
-        """記錄生成活動"""
-        try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
-            cursor = conn.cursor()
+        """記錄生成活動（預設放入佇列，由背景執行緒批次寫入）"""
+        # 建立時間在記錄當下決定，與 CURRENT_TIMESTAMP 相同使用 UTC
+        created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        row = (generation_type, prompt[:500], status, created_at, model_name, generation_time, file_count)
+        
+        if self.write_behind and not self._closed:
+            self._ensure_writer()
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                print("⚠️ 統計寫入佇列已滿，改為同步寫入")
+        
+        self._write_batch([row])
+    
+    def _ensure_writer(self):
+        """啟動背景寫入執行緒"""
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name='stats-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.shutdown)
+    
+    def _writer_loop(self):
+        """背景寫入迴圈：累積 batch_size 筆或等待 flush_interval 秒後以單一交易寫入"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
             
-            cursor.execute('''
-                INSERT INTO generations (generation_type, prompt, status, model_name, generation_time, file_count)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (generation_type, prompt[:500], status, model_name, generation_time, file_count))
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    # flush() 要求立即寫入
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
             
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"記錄生成活動失敗: {e}")
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
     
-    def get_statistics(self):
-        """獲取統計資訊"""
+    def _write_batch(self, rows):
+        """以單一交易寫入多筆生成記錄"""
         try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
-            cursor = conn.cursor()
+            deltas = {}
+            for generation_type, _, status, created_at, _, _, _ in rows:
+                key = (created_at[:10], generation_type, status)
+                deltas[key] = deltas.get(key, 0) + 1
             
-            # 總生成次數
-            cursor.execute('SELECT COUNT(*) FROM generations')
-            total_generations = cursor.fetchone()[0]
+            conn = self._get_connection()
+            with conn:
+                conn.executemany('''
+                    INSERT INTO generations (generation_type, prompt, status, created_at, model_name, generation_time, file_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                self._apply_counter_deltas(conn, deltas)
+                self._apply_rollups(conn, rows)
+        except Exception as e:
+            print(f"記錄生成活動失敗（{len(rows)} 筆）: {e}")
+    
+    def _apply_counter_deltas(self, conn, deltas):
+        """更新計數表（呼叫端需在同一交易中）"""
+        conn.executemany('''
+            INSERT INTO generation_counters (day, generation_type, status, count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, generation_type, status) DO UPDATE SET count = count + excluded.count
+        ''', [(day, generation_type, status, count) for (day, generation_type, status), count in deltas.items()])
+        conn.execute('DELETE FROM generation_counters WHERE count <= 0')
+    
+    def _apply_rollups(self, conn, rows):
+        """將生成記錄併入每小時 / 每日彙總（呼叫端需在同一交易中並已取得寫入鎖）"""
+        aggregates = {}
+        for generation_type, _, status, created_at, model_name, generation_time, _ in rows:
+            created_at = str(created_at)
+            for granularity, bucket in (('hour', created_at[:13] + ':00'), ('day', created_at[:10])):
+                key = (granularity, bucket, generation_type, model_name or '')
+                aggregate = aggregates.setdefault(key, {
+                    'count': 0, 'success_count': 0, 'failure_count': 0,
+                    'time_count': 0, 'time_sum': 0.0, 'time_min': None, 'time_max': None,
+                    'sketch': LatencySketch()
+                })
+                aggregate['count'] += 1
+                if status == 'success':
+                    aggregate['success_count'] += 1
+                else:
+                    aggregate['failure_count'] += 1
+                if generation_time is not None:
+                    aggregate['time_count'] += 1
+                    aggregate['time_sum'] += generation_time
+                    aggregate['time_min'] = generation_time if aggregate['time_min'] is None else min(aggregate['time_min'], generation_time)
+                    aggregate['time_max'] = generation_time if aggregate['time_max'] is None else max(aggregate['time_max'], generation_time)
+                    aggregate['sketch'].add(generation_time)
+        
+        for key, aggregate in aggregates.items():
+            existing = conn.execute('''
+                SELECT count, success_count, failure_count, time_count, time_sum, time_min, time_max, latency_sketch
+                FROM generation_rollups
+                WHERE granularity = ? AND bucket = ? AND generation_type = ? AND model_name = ?
+            ''', key).fetchone()
             
-            # 今日生成次數
-            today = date.today().isoformat()
-            cursor.execute('SELECT COUNT(*) FROM generations WHERE DATE(created_at) = ?', (today,))
-            today_generations = cursor.fetchone()[0]
+            if existing:
+                count, success_count, failure_count, time_count, time_sum, time_min, time_max, sketch_json = existing
+                aggregate['count'] += count
+                aggregate['success_count'] += success_count
+                aggregate['failure_count'] += failure_count
+                aggregate['time_count'] += time_count
+                aggregate['time_sum'] += time_sum
+                if time_min is not None:
+                    aggregate['time_min'] = time_min if aggregate['time_min'] is None else min(aggregate['time_min'], time_min)
+                if time_max is not None:
+                    aggregate['time_max'] = time_max if aggregate['time_max'] is None else max(aggregate['time_max'], time_max)
+                aggregate['sketch'].merge(LatencySketch.from_json(sketch_json))
             
-            # 圖像生成次數
-            cursor.execute('SELECT COUNT(*) FROM generations WHERE generation_type = "image"')
-            image_generations = cursor.fetchone()[0]
+            conn.execute('''
+                INSERT OR REPLACE INTO generation_rollups (
+                    granularity, bucket, generation_type, model_name, count, success_count, failure_count,
+                    time_count, time_sum, time_min, time_max, latency_sketch
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', key + (
+                aggregate['count'], aggregate['success_count'], aggregate['failure_count'],
+                aggregate['time_count'], aggregate['time_sum'], aggregate['time_min'], aggregate['time_max'],
+                aggregate['sketch'].to_json()
+            ))
+    
+    def flush(self, timeout=10.0):
+        """等待佇列中已有的記錄全部寫入"""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def shutdown(self, timeout=10.0):
+        """停止背景寫入並寫入剩餘記錄，之後的記錄改為同步寫入"""
+        if self._closed:
+            return
+        self._closed = True
+        self._retention_stop.set()
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+            print("✅ 統計記錄已全部寫入")
+    
+    def get_statistics(self):
+        """獲取統計資訊"""
+        try:
+            conn = self._get_connection()
             
-            # 影片生成次數
-            cursor.execute('SELECT COUNT(*) FROM generations WHERE generation_type = "video"')
-            video_generations = cursor.fetchone()[0]
+            # 從計數表一次取得所有統計，不需掃描 generations（created_at 為 UTC，今日也以 UTC 計算）
+            today = datetime.utcnow().date().isoformat()
+            total_generations, today_generations, image_generations, video_generations, success_count = conn.execute('''
+                SELECT
+                    COALESCE(SUM(count), 0),
+                    COALESCE(SUM(CASE WHEN day = ? THEN count ELSE 0 END), 0),
+                    COALESCE(SUM(CASE WHEN generation_type = 'image' THEN count ELSE 0 END), 0),
+                    COALESCE(SUM(CASE WHEN generation_type = 'video' THEN count ELSE 0 END), 0),
+                    COALESCE(SUM(CASE WHEN status = 'success' THEN count ELSE 0 END), 0)
+                FROM generation_counters
+            ''', (today,)).fetchone()
             
             # 成功率
-            cursor.execute('SELECT COUNT(*) FROM generations WHERE status = "success"')
-            success_count = cursor.fetchone()[0]
             success_rate = (success_count / total_generations * 100) if total_generations > 0 else 0
             
-            conn.close()
-            
             return {
                 'total_generations': total_generations,
                 'today_generations': today_generations,
@@ -133,66 +428,481 @@ class SimpleStatsService:
                 'success_rate': 0
             }
     
-    def get_recent_generations(self, limit=10):
-        """獲取最近的生成記錄"""
+    def _query_rollups(self, granularity, start=None, end=None, generation_type=None, model_name=None):
+        """查詢彙總資料列，延遲草圖已還原為 LatencySketch"""
+        conditions = ['granularity = ?']
+        params = [granularity]
+        if start:
+            conditions.append('bucket >= ?')
+            params.append(start)
+        if end:
+            conditions.append('bucket <= ?')
+            params.append(end)
+        if generation_type:
+            conditions.append('generation_type = ?')
+            params.append(generation_type)
+        if model_name:
+            conditions.append('model_name = ?')
+            params.append(model_name)
+        
+        cursor = self._get_connection().execute('''
+            SELECT bucket, generation_type, model_name, count, success_count, failure_count,
+                   time_count, time_sum, time_min, time_max, latency_sketch
+            FROM generation_rollups
+            WHERE {}
+            ORDER BY bucket, generation_type, model_name
+        '''.format(' AND '.join(conditions)), params)
+        
+        for row in cursor:
+            yield {
+                'bucket': row[0],
+                'generation_type': row[1],
+                'model_name': row[2] or None,
+                'count': row[3],
+                'success_count': row[4],
+                'failure_count': row[5],
+                'time_count': row[6],
+                'time_sum': row[7],
+                'time_min': row[8],
+                'time_max': row[9],
+                'sketch': LatencySketch.from_json(row[10])
+            }
+    
+    def get_rollups(self, granularity='hour', start=None, end=None, generation_type=None, model_name=None):
+        """
+        獲取每小時或每日的彙總統計
+
+        Args:
+            granularity: 'hour' 或 'day'
+            start: 起始時間桶（含），如 '2025-01-01' 或 '2025-01-01 08:00'
+            end: 結束時間桶（含）
+            generation_type: 只取指定類型
+            model_name: 只取指定模型
+        """
         try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
-            cursor = conn.cursor()
+            rollups = []
+            for row in self._query_rollups(granularity, start, end, generation_type, model_name):
+                sketch = row.pop('sketch')
+                time_count = row.pop('time_count')
+                row['time_avg'] = round(row['time_sum'] / time_count, 3) if time_count > 0 else None
+                row['time_sum'] = round(row['time_sum'], 3)
+                row.update(sketch.percentiles())
+                rollups.append(row)
+            return rollups
+        except Exception as e:
+            print(f"獲取彙總統計失敗: {e}")
+            return []
+    
+    def get_latency_summary(self, granularity='day', start=None, end=None):
+        """依模型與類型合併時間範圍內的彙總，取得整體延遲百分位數"""
+        try:
+            summary = {}
+            for row in self._query_rollups(granularity, start, end):
+                key = (row['generation_type'], row['model_name'] or '')
+                item = summary.get(key)
+                if item is None:
+                    summary[key] = row
+                    continue
+                
+                item['count'] += row['count']
+                item['success_count'] += row['success_count']
+                item['failure_count'] += row['failure_count']
+                item['time_count'] += row['time_count']
+                item['time_sum'] += row['time_sum']
+                if row['time_min'] is not None:
+                    item['time_min'] = row['time_min'] if item['time_min'] is None else min(item['time_min'], row['time_min'])
+                if row['time_max'] is not None:
+                    item['time_max'] = row['time_max'] if item['time_max'] is None else max(item['time_max'], row['time_max'])
+                # 百分位數需合併草圖，不能由各時間桶的百分位數平均
+                item['sketch'].merge(row['sketch'])
             
+            results = []
+            for key in sorted(summary):
+                item = summary[key]
+                item.pop('bucket')
+                sketch = item.pop('sketch')
+                time_count = item.pop('time_count')
+                item['time_avg'] = round(item['time_sum'] / time_count, 3) if time_count > 0 else None
+                item['time_sum'] = round(item['time_sum'], 3)
+                item.update(sketch.percentiles())
+                results.append(item)
+            return results
+        except Exception as e:
+            print(f"獲取延遲摘要失敗: {e}")
+            return []
+    
+    def _create_fts(self, cursor):
+        """建立 prompt 全文檢索表與同步觸發器（SQLite 未編入 FTS5 時略過）"""
+        fts_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generations_fts'"
+        ).fetchone()
+        if fts_exists:
+            return
+        
+        try:
+            # trigram 分詞可做任意子字串比對，中文 prompt 也適用
             cursor.execute('''
-                SELECT generation_type, prompt, status, created_at, model_name, generation_time
-                FROM generations
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
+                CREATE VIRTUAL TABLE generations_fts USING fts5(
+                    prompt, content='generations', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ 無法建立 prompt 全文檢索表，搜尋將改用 LIKE: {e}")
+            return
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS generations_fts_insert AFTER INSERT ON generations BEGIN
+                INSERT INTO generations_fts (rowid, prompt) VALUES (new.id, new.prompt);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS generations_fts_delete AFTER DELETE ON generations BEGIN
+                INSERT INTO generations_fts (generations_fts, rowid, prompt) VALUES ('delete', old.id, old.prompt);
+            END
+        ''')
+        # 舊資料庫升級時建立既有記錄的索引
+        cursor.execute("INSERT INTO generations_fts (generations_fts) VALUES ('rebuild')")
+    
+    def _has_fts(self, conn):
+        """檢查 prompt 全文檢索表是否存在"""
+        if self._fts_available is None:
+            self._fts_available = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generations_fts'"
+            ).fetchone() is not None
+        return self._fts_available
+    
+    @staticmethod
+    def _encode_cursor(created_at, row_id):
+        """將分頁位置編碼為不透明的游標字串"""
+        return base64.urlsafe_b64encode(f'{created_at}|{row_id}'.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor):
+        """解析游標字串，回傳 (created_at, id)"""
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(row_id)
+    
+    def get_generations_page(self, limit=20, cursor=None, generation_type=None, status=None, model_name=None, prompt_query=None):
+        """
+        以游標分頁獲取生成記錄（依 created_at、id 由新到舊）
+
+        Args:
+            limit: 每頁筆數
+            cursor: 上一頁回傳的 next_cursor，None 表示第一頁
+            generation_type: 只取指定類型（'image' / 'video'）
+            status: 只取指定狀態（'success' / 'failed'）
+            model_name: 只取指定模型
+            prompt_query: prompt 子字串搜尋
+
+        Returns:
+            包含 generations 與 next_cursor（無下一頁時為 None）的字典
+
+        Raises:
+            ValueError: 游標格式錯誤
+        """
+        try:
+            after = self._decode_cursor(cursor) if cursor else None
+        except Exception:
+            raise ValueError('無效的分頁游標')
+        
+        try:
+            conn = self._get_connection()
+            conditions = []
+            params = []
+            
+            if after:
+                # 列值比較可直接使用 (created_at, id) 索引，不需 OFFSET 掃描
+                conditions.append('(g.created_at, g.id) < (?, ?)')
+                params.extend(after)
+            if generation_type:
+                conditions.append('g.generation_type = ?')
+                params.append(generation_type)
+            if status:
+                conditions.append('g.status = ?')
+                params.append(status)
+            if model_name:
+                conditions.append('g.model_name = ?')
+                params.append(model_name)
+            if prompt_query:
+                if self._has_fts(conn) and len(prompt_query) >= 3:
+                    # trigram 全文檢索至少需要三個字元，以片語比對子字串
+                    conditions.append('g.id IN (SELECT rowid FROM generations_fts WHERE generations_fts MATCH ?)')
+                    params.append('"{}"'.format(prompt_query.replace('"', '""')))
+                else:
+                    conditions.append("g.prompt LIKE ? ESCAPE '\\'")
+                    escaped = prompt_query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    params.append(f'%{escaped}%')
             
-            rows = cursor.fetchall()
-            conn.close()
+            where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+            rows = conn.execute('''
+                SELECT g.id, g.generation_type, g.prompt, g.status, g.created_at, g.model_name, g.generation_time
+                FROM generations g
+                {}
+                ORDER BY g.created_at DESC, g.id DESC
+                LIMIT ?
+            '''.format(where), params + [limit + 1]).fetchall()
             
             generations = []
-            for row in rows:
+            for row in rows[:limit]:
                 generations.append({
-                    'generation_type': row[0],
-                    'prompt': row[1],
-                    'status': row[2],
-                    'created_at': row[3],
-                    'model_name': row[4],
-                    'generation_time': row[5]
+                    'id': row[0],
+                    'generation_type': row[1],
+                    'prompt': row[2],
+                    'status': row[3],
+                    'created_at': row[4],
+                    'model_name': row[5],
+                    'generation_time': row[6]
                 })
             
-            return generations
+            next_cursor = None
+            if len(rows) > limit and generations:
+                last = generations[-1]
+                next_cursor = self._encode_cursor(last['created_at'], last['id'])
+            
+            return {'generations': generations, 'next_cursor': next_cursor}
         except Exception as e:
             print(f"獲取生成記錄失敗: {e}")
-            return []
+            return {'generations': [], 'next_cursor': None}
+    
+    EXPORT_COLUMNS = ('id', 'generation_type', 'prompt', 'status', 'created_at', 'model_name', 'generation_time', 'file_count')
+    
+    def iter_generations(self, start=None, end=None, batch_size=500):
+        """
+        依時間由舊到新逐筆產生生成記錄，供匯出使用
+
+        以 (created_at, id) 游標分批查詢，每批都是短暫的讀取，不會長時間佔用資料庫，
+        也不會把完整結果載入記憶體
+
+        Args:
+            start: 起始時間（含），如 '2025-01-01' 或 '2025-01-01 08:00:00'
+            end: 結束時間（含）；只給日期時包含當天全部記錄
+            batch_size: 每批查詢筆數
+
+        Yields:
+            以 EXPORT_COLUMNS 為欄位順序的 tuple
+        """
+        conditions = []
+        params = []
+        # created_at 以 'YYYY-MM-DD HH:MM:SS' 儲存，ISO 格式的 'T' 需換成空白才能正確比較
+        start = start.replace('T', ' ') if start else None
+        end = end.replace('T', ' ') if end else None
+        if start:
+            conditions.append('created_at >= ?')
+            params.append(start)
+        if end:
+            if len(end) == 10:
+                conditions.append('created_at < ?')
+                params.append((datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+            else:
+                conditions.append('created_at <= ?')
+                params.append(end)
+        
+        last_key = None
+        while True:
+            batch_conditions = list(conditions)
+            batch_params = list(params)
+            if last_key:
+                batch_conditions.append('(created_at, id) > (?, ?)')
+                batch_params.extend(last_key)
+            where = 'WHERE ' + ' AND '.join(batch_conditions) if batch_conditions else ''
+            
+            rows = self._get_connection().execute('''
+                SELECT {}
+                FROM generations
+                {}
+                ORDER BY created_at, id
+                LIMIT ?
+            '''.format(', '.join(self.EXPORT_COLUMNS), where), batch_params + [batch_size]).fetchall()
+            
+            for row in rows:
+                yield row
+            
+            if len(rows) < batch_size:
+                return
+            last_key = (rows[-1][4], rows[-1][0])
+    
+    def get_recent_generations(self, limit=10):
+        """獲取最近的生成記錄"""
+        return self.get_generations_page(limit=limit)['generations']
     
-    def cleanup_old_records(self, days=30):
-        """清理舊記錄"""
+    def cleanup_old_records(self, days=30, chunk_size=1000, archive_dir=None, pause=0.05):
+        """
+        清理舊記錄
+
+        以小批次刪除，每批是一個只包含刪除與計數更新的短交易，封存在交易開始前完成，避免長時間佔用寫入鎖；
+        清理後以增量 VACUUM 歸還空間。多個 worker 程序以資料庫中的租約協調，同時只有一個程序執行清理。
+
+        Args:
+            days: 保留天數
+            chunk_size: 每批刪除筆數
+            archive_dir: 刪除前將記錄依月份附加到 gzip 壓縮的 JSONL 檔（None 表示不封存）
+            pause: 每批之間暫停的秒數，讓請求中的寫入有機會取得鎖
+
+        Returns:
+            刪除的記錄數
+        """
+        deleted_count = 0
+        lease_owner = f'{os.getpid()}-{threading.get_ident()}'
         try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
-            cursor = conn.cursor()
+            conn = self._get_connection()
+            if not self._acquire_lease(conn, 'retention', lease_owner, self.RETENTION_LEASE_SECONDS):
+                # 其他 worker 正在清理
+                return 0
             
-            cursor.execute('''
-                DELETE FROM generations 
-                WHERE created_at < datetime('now', '-{} days')
-            '''.format(days))
+            cutoff = conn.execute("SELECT datetime('now', '-' || ? || ' days')", (int(days),)).fetchone()[0]
             
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            while True:
+                # 選取與封存不佔用寫入鎖；持有租約的程序才會刪除，因此選取的記錄不會被其他程序刪除
+                rows = conn.execute('''
+                    SELECT {}
+                    FROM generations
+                    WHERE created_at < ?
+                    ORDER BY created_at, id
+                    LIMIT ?
+                '''.format(', '.join(self.EXPORT_COLUMNS)), (cutoff, chunk_size)).fetchall()
+                if not rows:
+                    break
+                
+                if archive_dir:
+                    self._archive_rows(Path(archive_dir), rows)
+                
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    # 只扣除實際刪除的記錄的計數，與刪除在同一交易中完成
+                    deltas = {}
+                    chunk_deleted = 0
+                    for row in rows:
+                        if conn.execute('DELETE FROM generations WHERE id = ?', (row[0],)).rowcount:
+                            key = (str(row[4])[:10], row[1], row[3])
+                            deltas[key] = deltas.get(key, 0) - 1
+                            chunk_deleted += 1
+                    self._apply_counter_deltas(conn, deltas)
+                    # 每批延長租約，清理時間較長時不會被其他程序接手
+                    conn.execute('UPDATE maintenance_leases SET expires_at = ? WHERE name = ? AND owner = ?',
+                                 (time.time() + self.RETENTION_LEASE_SECONDS, 'retention', lease_owner))
+                
+                deleted_count += chunk_deleted
+                if len(rows) < chunk_size:
+                    break
+                time.sleep(pause)
+            
+            if deleted_count:
+                self._incremental_vacuum(conn)
             
             return deleted_count
         except Exception as e:
             print(f"清理舊記錄失敗: {e}")
-            return 0
+            return deleted_count
+        finally:
+            self._release_lease('retention', lease_owner)
+    
+    def _acquire_lease(self, conn, name, owner, seconds):
+        """取得維護作業租約（無人持有或已過期時才能取得），回傳是否成功"""
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR IGNORE INTO maintenance_leases (name, owner, expires_at) VALUES (?, ?, 0)', (name, owner))
+            cursor = conn.execute(
+                'UPDATE maintenance_leases SET owner = ?, expires_at = ? WHERE name = ? AND (owner = ? OR expires_at < ?)',
+                (owner, now + seconds, name, owner, now)
+            )
+            return cursor.rowcount == 1
+    
+    def _release_lease(self, name, owner):
+        """釋放維護作業租約"""
+        try:
+            conn = self._get_connection()
+            with conn:
+                conn.execute('DELETE FROM maintenance_leases WHERE name = ? AND owner = ?', (name, owner))
+        except sqlite3.Error as e:
+            print(f"⚠️ 釋放維護租約失敗: {e}")
+    
+    def _archive_rows(self, archive_dir, rows):
+        """將記錄依月份附加到壓縮封存檔（generations-YYYY-MM.jsonl.gz）"""
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(str(row[4])[:7], []).append(row)
+        
+        for month, month_rows in by_month.items():
+            # gzip 以附加模式寫入會產生多個成員，解壓時會依序串接
+            with gzip.open(archive_dir / f'generations-{month}.jsonl.gz', 'at', encoding='utf-8') as archive:
+                for row in month_rows:
+                    archive.write(json.dumps(dict(zip(self.EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n')
+    
+    def _incremental_vacuum(self, conn):
+        """歸還已刪除記錄佔用的頁面（資料庫需已啟用增量 VACUUM 模式，否則只提示轉換方式）"""
+        if self._has_fts(conn):
+            # 合併全文檢索的索引段，刪除記錄所佔的空間才會釋出
+            with conn:
+                conn.execute("INSERT INTO generations_fts (generations_fts) VALUES ('optimize')")
+        
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if auto_vacuum != 2:
+            # 轉換需要完整 VACUUM 並長時間鎖住資料庫，不在保留作業中自動執行
+            print("💡 統計資料庫未啟用增量 VACUUM，刪除的空間不會歸還；請在維護時段執行: python init_database.py --incremental-vacuum")
+            return
+        
+        # execute() 只會執行一步（釋放一頁），executescript() 才會執行到完成
+        conn.executescript('PRAGMA incremental_vacuum;')
+        # WAL 模式下需檢查點才會實際縮小資料庫檔案
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
+    def enable_incremental_vacuum(self):
+        """
+        將既有資料庫轉換為增量 VACUUM 模式（維護步驟，僅需執行一次）
+
+        需要完整 VACUUM，執行期間會鎖住資料庫，請在維護時段或停止服務後執行
+
+        Returns:
+            是否執行了轉換（已是增量模式時回傳 False）
+        """
+        conn = self._get_connection()
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        
+        print("🔄 轉換統計資料庫為增量 VACUUM 模式...")
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return True
+    
+    def start_retention_worker(self, days, interval=86400, chunk_size=1000, archive_dir=None):
+        """
+        啟動背景保留作業，定期清理超過保留天數的記錄
+
+        Args:
+            days: 保留天數
+            interval: 執行間隔秒數
+            chunk_size: 每批刪除筆數
+            archive_dir: 封存目錄（None 表示不封存）
+        """
+        if self._retention_thread is not None:
+            return
+        
+        def run():
+            while not self._retention_stop.is_set():
+                deleted_count = self.cleanup_old_records(days, chunk_size=chunk_size, archive_dir=archive_dir)
+                if deleted_count:
+                    print(f"🧹 已清理 {deleted_count} 筆超過 {days} 天的生成記錄")
+                self._retention_stop.wait(interval)
+        
+        self._retention_thread = threading.Thread(target=run, name='stats-retention', daemon=True)
+        self._retention_thread.start()
+        print(f"✅ 統計保留作業已啟動 (保留 {days} 天，每 {interval / 3600:g} 小時執行)")
     
     def reset_database(self):
         """重置資料庫（刪除並重建）"""
         try:
+            self.flush()
+            self.close()
             if self.db_path.exists():
                 self.db_path.unlink()
                 print("✅ 已刪除舊資料庫檔案")
             
-            self._init_database()
+            with SimpleStatsService._init_lock:
+                self._create_schema()
+                SimpleStatsService._initialized_paths.add(str(self.db_path.resolve()))
             print("✅ 資料庫重置完成")
             return True
         except Exception as e:
@@ -0,0 +1,168 @@
+import os
+import time
+import base64
+import binascii
+import tempfile
+from contextlib import contextmanager
+from typing import Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 每次寫入 1 MB
+DEFAULT_POOL_SIZE = 10
+BASE64_CHUNK_CHARS = 4 * 256 * 1024  # 每次解碼 1 MB 的 base64 字元（4 的倍數）
+
+class IncompleteDownload(IOError):
+    """下載的位元組數少於伺服器宣告的大小"""
+
+
+def mount_connection_pool(session: requests.Session, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """讓 session 對 http / https 使用固定大小的連線池，多個下載之間重用 TCP / TLS 連線"""
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _parse_content_range(value: Optional[str]):
+    """解析 `bytes start-end/total`，回傳 (start, total)；total 未知時為 None"""
+    if not value or not value.startswith('bytes '):
+        return None, None
+    byte_range, _, total = value[len('bytes '):].partition('/')
+    start = byte_range.split('-', 1)[0]
+    return (int(start) if start.isdigit() else None), (int(total) if total.isdigit() else None)
+
+
+@contextmanager
+def atomic_write(dest_path: str):
+    """
+    寫入與目標同目錄的暫存檔，區塊正常結束時 fsync 並原子性地改名為目標檔名；發生例外時刪除暫存檔
+
+    用法:
+        with atomic_write(path) as f:
+            f.write(...)
+    """
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dest_dir, prefix=f'.{os.path.basename(dest_path)}.', suffix='.part')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def download_to_file(session: requests.Session, url: str, dest_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     max_retries: int = 3, timeout: float = 60) -> int:
+    """
+    串流下載檔案到磁碟 - 分塊寫入暫存檔，連線中斷時以 HTTP Range 從中斷處續傳，完成後原子性地改名為目標檔名
+
+    記憶體用量固定為一個區塊，不隨檔案大小增加；下載失敗時不會留下不完整的目標檔案。
+
+    Args:
+        session: 用於下載的連線（可為帶認證的 AuthorizedSession）
+        url: 下載網址
+        dest_path: 目標檔案路徑
+        chunk_size: 每次讀取 / 寫入的位元組數
+        max_retries: 中斷後最多續傳幾次
+        timeout: 連線與每次讀取的逾時秒數
+
+    Returns:
+        下載的位元組數
+    """
+    downloaded = 0
+    total = None
+    validator = None  # 續傳時以 If-Range 確認遠端檔案沒有變更
+
+    with atomic_write(dest_path) as f:
+        for attempt in range(max_retries + 1):
+            headers = {}
+            if downloaded:
+                headers['Range'] = f'bytes={downloaded}-'
+                if validator:
+                    headers['If-Range'] = validator
+
+            try:
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    response.raise_for_status()
+
+                    if downloaded:
+                        start, _ = _parse_content_range(response.headers.get('Content-Range'))
+                        if response.status_code != 206 or start != downloaded:
+                            # 伺服器不支援續傳或檔案已變更，從頭下載
+                            print(f"⚠️ 伺服器未接受續傳，重新下載")
+                            f.seek(0)
+                            f.truncate()
+                            downloaded = 0
+
+                    if not downloaded:
+                        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                        content_length = response.headers.get('Content-Length')
+                        # 有內容編碼時解壓後的大小與 Content-Length 不同，無法用來檢查完整性
+                        if content_length and content_length.isdigit() and not response.headers.get('Content-Encoding'):
+                            total = int(content_length)
+                        else:
+                            total = None
+
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            downloaded += len(chunk)
+
+                if total is not None and downloaded < total:
+                    raise IncompleteDownload(f"只收到 {downloaded:,} / {total:,} bytes")
+                break
+
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, IncompleteDownload) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = min(2 ** attempt, 10)
+                print(f"⚠️ 下載中斷（已下載 {downloaded:,} bytes），{delay} 秒後續傳: {e}")
+                time.sleep(delay)
+
+    return downloaded
+
+
+def decode_base64_to_file(encoded: Union[str, bytes], dest_path: str, chunk_chars: int = BASE64_CHUNK_CHARS) -> int:
+    """
+    分段解碼 base64 並寫入磁碟 - 每次只解碼一段，不會同時在記憶體中保留完整的編碼字串與解碼後的位元組
+
+    Args:
+        encoded: base64 編碼的內容（可含換行等空白字元）
+        dest_path: 目標檔案路徑（原子性寫入）
+        chunk_chars: 每段解碼的字元數（會調整為 4 的倍數）
+
+    Returns:
+        寫入的位元組數
+    """
+    chunk_chars = max(4, chunk_chars - chunk_chars % 4)
+    written = 0
+    carry = encoded[:0]  # 上一段不足 4 個字元的剩餘部分
+
+    with atomic_write(dest_path) as f:
+        for offset in range(0, len(encoded), chunk_chars):
+            # 去除空白字元後，只解碼長度為 4 的倍數的部分，剩餘字元併入下一段
+            piece = carry + encoded[offset:offset + chunk_chars]
+            piece = piece[:0].join(piece.split())
+
+            usable = len(piece) - len(piece) % 4
+            try:
+                decoded = base64.b64decode(piece[:usable], validate=True)
+            except binascii.Error as e:
+                raise ValueError(f"base64 內容無效（位置約 {offset:,}）: {e}")
+            f.write(decoded)
+            written += len(decoded)
+            carry = piece[usable:]
+
+        if carry:
+            raise ValueError("base64 內容長度不正確")
+
+    return written
@@ -1,41 +1,48 @@
 import os
 import time
 import uuid
-import requests
+import threading
 import subprocess
 import traceback
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from dotenv import load_dotenv
 
-# 嘗試導入 Vertex AI SDK，如果失敗則使用模擬模式
-try:
-    import vertexai
-    from google.cloud import aiplatform
-    from google.cloud import aiplatform_v1
-    from google.api_core import exceptions as google_api_exceptions
-    from google.auth import default
-    import google.auth
-    VERTEX_AI_AVAILABLE = True
-    print("✅ Vertex AI SDK 可用")
-except ImportError as e:
-    print(f"⚠️ Vertex AI SDK 不可用: {e}")
-    print("💡 請執行: pip install google-cloud-aiplatform")
-    print("🔄 將使用模擬模式")
-    VERTEX_AI_AVAILABLE = False
-    # 創建模擬的類別和異常
-    class vertexai:
-        @staticmethod
-        def init(**kwargs):
-            raise Exception("Vertex AI SDK 不可用")
-    
-    class google_api_exceptions:
-        class GoogleAPIError(Exception):
-            pass
-        class NotFound(GoogleAPIError):
-            pass
-        class ResourceExhausted(GoogleAPIError):
-            pass
+from services.rate_limiter import get_rate_limiter, RateLimitExceeded
+from services.circuit_breaker import get_circuit_breakers
+from services.sdk_loader import import_sdk
+from services.operation_tracker import OperationTracker
+from services.stream_download import download_to_file, decode_base64_to_file, mount_connection_pool
+
+# Vertex AI SDK 延遲到建立 VeoService 時才匯入（由 _load_vertex_ai 填入）
+vertexai = None
+
+# SDK 載入前（或不可用時）使用的異常類別
+class google_api_exceptions:
+    class GoogleAPIError(Exception):
+        pass
+    class NotFound(GoogleAPIError):
+        pass
+    class TooManyRequests(GoogleAPIError):
+        pass
+    class ResourceExhausted(TooManyRequests):
+        pass
+
+def _load_vertex_ai() -> bool:
+    """匯入 Vertex AI SDK，成功時回傳 True"""
+    global vertexai, google_api_exceptions
+
+    if vertexai is not None:
+        return True
+
+    vertexai_module = import_sdk('vertexai', 'pip install google-cloud-aiplatform')
+    exceptions_module = import_sdk('google.api_core.exceptions', 'pip install google-cloud-aiplatform')
+    if vertexai_module is None or exceptions_module is None:
+        return False
+
+    google_api_exceptions = exceptions_module
+    vertexai = vertexai_module
+    return True
 
 # 載入環境變數
 load_dotenv()
@@ -43,14 +50,23 @@ load_dotenv()
 class VeoService:
     """Veo 影片生成服務 - 使用 Vertex AI SDK"""
     
-    def __init__(self, project_id: str = None, location: str = None):
+    API_TIMEOUT = 60  # 單次 API 呼叫的逾時秒數
+    
+    def __init__(self, project_id: str = None, location: str = None, operation_tracker: OperationTracker = None,
+                 generated_dir: str = None):
         """
         初始化 Veo 服務
         
         Args:
             project_id: Google Cloud 專案 ID
             location: 服務區域，預設為 us-central1
+            operation_tracker: 輪詢影片生成操作的追蹤器，未提供時自行建立
+            generated_dir: 影片輸出目錄（未指定時使用 Config.GENERATED_FOLDER）
         """
+        if generated_dir is None:
+            from config.config import Config
+            generated_dir = Config.GENERATED_FOLDER
+        self.generated_dir = generated_dir
         self.project_id = project_id or os.getenv('GOOGLE_CLOUD_PROJECT', 'ai-dataset-generator')
         self.location = location or os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
         self.credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
@@ -80,12 +96,16 @@ class VeoService:
         if model_env not in self.available_models:
             self.available_models.insert(0, model_env)
         
+        # 主要模型；失敗時的備用模型在每個請求內依序嘗試，不修改此屬性
         self.model_name = model_env
-        self.current_model_index = 0
+        
+        # 已認證的 HTTP 連線（第一次呼叫 API 時建立）
+        self.http_session = None
+        self.http_session_lock = threading.Lock()
         self.use_mock = False  # 預設使用真實 API
         
         # 初始化 Vertex AI
-        if not VERTEX_AI_AVAILABLE:
+        if not _load_vertex_ai():
             raise Exception("Vertex AI SDK 不可用，請安裝: pip install google-cloud-aiplatform")
         
         try:
@@ -102,6 +122,10 @@ class VeoService:
             print(f"   備用模型: {self.available_models[1:] if len(self.available_models) > 1 else '無'}")
             print(f"   費用將計算到 Vertex AI 帳單")
             
+            # 影片生成為長時間操作，由追蹤器的單一背景執行緒輪詢
+            self.operation_tracker = operation_tracker or OperationTracker()
+            self.operation_tracker.register_handler('veo', self._poll_operation, self._complete_operation)
+            
         except Exception as e:
             error_msg = f"初始化 Veo 服務失敗: {e}"
             if "authentication" in str(e).lower():
@@ -111,22 +135,8 @@ class VeoService:
             print(f"❌ {error_msg}")
             raise Exception(error_msg)
     
-    def _try_next_model(self) -> bool:
-        """嘗試切換到下一個可用的模型"""
-        if self.current_model_index < len(self.available_models) - 1:
-            self.current_model_index += 1
-            old_model = self.model_name
-            self.model_name = self.available_models[self.current_model_index]
-            print(f"🔄 切換模型: {old_model} → {self.model_name}")
-            return True
-        return False
-    
-    def _reset_model_selection(self):
-        """重置模型選擇到初始狀態"""
-        self.current_model_index = 0
-        self.model_name = self.available_models[0]
-    
-    def generate_videos(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_videos(self, params: Dict[str, Any], progress_callback: Optional[Callable] = None,
+                        on_complete: Optional[Callable] = None) -> Dict[str, Any]:
         """
         生成影片 - 使用 Vertex AI API
         
@@ -137,6 +147,8 @@ class VeoService:
                 - duration: 影片長度 (5-8 秒)
                 - personGeneration: 人物生成設定 ('disallow' 或 'allow_adult')
                 - style: 影片風格
+            progress_callback: 進度回報函數 (stage, message, **details)
+            on_complete: 提供時不等待生成完成，立即回傳 deferred 結果，完成後以最終結果呼叫
         
         Returns:
             包含生成結果的字典
@@ -155,12 +167,15 @@ class VeoService:
             duration = params.get('duration', 5)
             person_generation = params.get('personGeneration', 'allow_adult')
             
+            if progress_callback:
+                progress_callback('validated', '參數驗證完成', progress=5)
+            
             print(f"🎬 開始生成影片 (Vertex AI Veo 2.0)...")
             print(f"   Prompt: {prompt[:100]}...")
             print(f"   比例: {aspect_ratio}, 長度: {duration}秒")
             
             # 使用 Vertex AI API 調用
-            return self._generate_real_video(prompt, aspect_ratio, duration, person_generation)
+            return self._generate_real_video(prompt, aspect_ratio, duration, person_generation, progress_callback, on_complete)
                 
         except Exception as e:
             print(f"❌ 影片生成錯誤: {e}")
@@ -170,242 +185,245 @@ class VeoService:
                 'error': f'影片生成失敗: {str(e)}'
             }
     
-    def _generate_real_video(self, prompt: str, aspect_ratio: str, duration: int, person_generation: str) -> Dict[str, Any]:
-        """使用 Vertex AI 的 Veo API 生成影片"""
-        max_retries = len(self.available_models)
-        
-        for attempt in range(max_retries):
+    def _generate_real_video(self, prompt: str, aspect_ratio: str, duration: int, person_generation: str,
+                             progress_callback: Optional[Callable] = None,
+                             on_complete: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        使用 Vertex AI 的 Veo API 生成影片
+
+        每個請求依序嘗試 available_models，不修改服務本身的狀態；配額用盡的模型由共用的斷路器標記，
+        冷卻期間其他請求直接跳過該模型。
+        """
+        breakers = get_circuit_breakers()
+        failover_chain = list(self.available_models)
+        quota_exhausted = False
+        rate_limited_error = None
+        
+        for attempt, model_name in enumerate(failover_chain):
+            breaker = breakers.get('veo', model_name)
+            if not breaker.allow_request():
+                print(f"⏭️ 模型 {model_name} 配額冷卻中（約 {breaker.retry_after():.0f} 秒後重試），跳過")
+                quota_exhausted = True
+                continue
+            
             try:
-                print(f"🌐 調用 Vertex AI Veo API (嘗試 {attempt + 1}/{max_retries})...")
-                print(f"   當前模型: {self.model_name}")
+                print(f"🌐 調用 Vertex AI Veo API (嘗試 {attempt + 1}/{len(failover_chain)})...")
+                print(f"   當前模型: {model_name}")
                 
-                # 使用穩定的 Prediction API
-                return self._generate_with_prediction_api(prompt, aspect_ratio, duration, person_generation)
+                # 提交長時間操作；成功提交即表示模型有配額
+                operation_name = self._submit_operation(prompt, aspect_ratio, duration, person_generation, model_name)
+                breaker.record_success()
                     
-            except google_api_exceptions.ResourceExhausted as e:
-                print(f"❌ 配額超限錯誤 (模型: {self.model_name}): {e}")
-                
-                # 嘗試切換到下一個模型
-                if self._try_next_model():
-                    print(f"🔄 嘗試使用備用模型: {self.model_name}")
-                    continue
-                else:
-                    print("❌ 所有模型配額都已用盡")
-                    self._print_quota_solutions()
-                    break
+            except google_api_exceptions.TooManyRequests as e:
+                # REST 的 429 轉為 TooManyRequests，gRPC 的 RESOURCE_EXHAUSTED 為其子類別 ResourceExhausted
+                print(f"❌ 配額超限錯誤 (模型: {model_name}): {e}")
+                breaker.record_failure()
+                quota_exhausted = True
+                # 嘗試下一個模型
+                continue
+                    
+            except RateLimitExceeded as e:
+                print(f"⚠️ 本地速率限制 (模型: {model_name}): {e}")
+                breaker.release()
+                rate_limited_error = e
+                # 嘗試下一個模型，各模型有獨立的配額
+                continue
                     
             except Exception as e:
-                print(f"❌ Vertex AI API 調用錯誤 (模型: {self.model_name}): {e}")
+                print(f"❌ Vertex AI API 調用錯誤 (模型: {model_name}): {e}")
+                breaker.release()
                 
                 # 如果是模型不存在的錯誤，嘗試下一個模型
                 if "not found" in str(e).lower() or "does not exist" in str(e).lower():
-                    if self._try_next_model():
-                        print(f"🔄 模型不存在，嘗試備用模型: {self.model_name}")
-                        continue
+                    print(f"🔄 模型不存在，嘗試下一個備用模型")
+                    continue
                 
                 # 其他錯誤，直接跳出
                 traceback.print_exc()
                 break
+            
+            # 提交成功後交給操作追蹤器，之後的失敗不再切換模型
+            return self._track_operation(operation_name, model_name, prompt, aspect_ratio, duration, person_generation,
+                                         progress_callback, on_complete)
+        
+        if rate_limited_error is not None:
+            # 其餘模型都已達本地速率上限，直接回報而不浪費 API 呼叫
+            return {
+                'success': False,
+                'error': str(rate_limited_error),
+                'error_type': 'rate_limited'
+            }
+        if quota_exhausted:
+            print("❌ 所有模型配額都已用盡")
+            self._print_quota_solutions()
         
         # 所有嘗試都失敗，回退到模擬模式
         print(f"🔄 所有模型嘗試都失敗，創建模擬影片作為備案...")
-        self._reset_model_selection()  # 重置模型選擇
         return self._generate_mock_video(prompt, aspect_ratio, duration, person_generation)
     
-    def _process_video_response(self, response, prompt: str, aspect_ratio: str, duration: int, person_generation: str) -> Dict[str, Any]:
-        """處理影片生成響應"""
-        # 確保 generated 目錄存在
-        generated_dir = os.path.join(os.getcwd(), 'generated')
-        os.makedirs(generated_dir, exist_ok=True)
+    def _get_http_session(self):
+        """取得帶有 Google Cloud 認證的共用 HTTP 連線（含連線池，API 呼叫與影片下載共用）"""
+        with self.http_session_lock:
+            if self.http_session is None:
+                google_auth = import_sdk('google.auth', 'pip install google-auth')
+                auth_transport = import_sdk('google.auth.transport.requests', 'pip install google-auth')
+                credentials, _ = google_auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+                self.http_session = mount_connection_pool(auth_transport.AuthorizedSession(credentials))
+            return self.http_session
+    
+    def _model_url(self, model_name: str, method: str) -> str:
+        """模型端點的 REST URL"""
+        return (f"https://{self.location}-aiplatform.googleapis.com/v1/projects/{self.project_id}"
+                f"/locations/{self.location}/publishers/google/models/{model_name}:{method}")
+    
+    def _post(self, model_name: str, method: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """呼叫模型端點，HTTP 錯誤轉為對應的 Google API 異常（429 為 TooManyRequests）"""
+        response = self._get_http_session().post(self._model_url(model_name, method), json=body, timeout=self.API_TIMEOUT)
+        if response.status_code >= 400:
+            raise google_api_exceptions.from_http_response(response)
+        return response.json()
+    
+    def _submit_operation(self, prompt: str, aspect_ratio: str, duration: int, person_generation: str,
+                          model_name: str) -> str:
+        """提交影片生成的長時間操作，回傳操作名稱"""
+        # 轉換人物生成設定
+        person_gen_mapping = {
+            'disallow': 'dont_allow',
+            'allow_adult': 'allow_adult'
+        }
         
-        # 生成檔案名稱
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_prompt = "".join(filter(str.isalnum, prompt[:30])).lower()
-        filename = f"veo_vertex_{safe_prompt}_{timestamp}.mp4"
-        local_path = os.path.join(generated_dir, filename)
+        # 構建請求參數
+        body = {
+            "instances": [{"prompt": prompt}],
+            "parameters": {
+                "aspectRatio": aspect_ratio,
+                "durationSeconds": duration,
+                "personGeneration": person_gen_mapping.get(person_generation, 'dont_allow'),
+                "sampleCount": 1
+            }
+        }
         
-        print(f"📥 正在處理影片...")
+        print(f"📝 發送影片生成請求（predictLongRunning）...")
+        print(f"   模型: {model_name}")
+        print(f"   參數: {body['parameters']}")
         
-        # 保存影片
-        try:
-            if hasattr(response, 'video_bytes'):
-                # 如果有 video_bytes，直接保存
-                with open(local_path, 'wb') as f:
-                    f.write(response.video_bytes)
-                print(f"✅ 從 video_bytes 保存影片")
-            elif hasattr(response, 'uri'):
-                # 如果有 URI，下載影片
-                video_uri = response.uri
-                print(f"🔗 影片 URI: {video_uri}")
-                
-                video_response = requests.get(video_uri)
-                video_response.raise_for_status()
-                with open(local_path, 'wb') as f:
-                    f.write(video_response.content)
-                print(f"✅ 從 URI 下載並保存影片")
-            elif hasattr(response, 'video_url'):
-                # 如果有 video_url，下載影片
-                video_url = response.video_url
-                print(f"🔗 影片 URL: {video_url}")
-                
-                video_response = requests.get(video_url)
-                video_response.raise_for_status()
-                with open(local_path, 'wb') as f:
-                    f.write(video_response.content)
-                print(f"✅ 從 URL 下載並保存影片")
-            else:
-                # 檢查響應的所有屬性
-                print(f"🔍 響應屬性: {dir(response)}")
-                print(f"⚠️ 響應中沒有預期的影片數據格式，創建模擬影片")
-                self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
-                local_path = os.path.join(generated_dir, filename)
+        # 依速率限制取得權杖後才調用 API
+        get_rate_limiter().acquire('veo', model_name)
         
-        except Exception as e:
-            print(f"❌ 保存影片時發生錯誤: {e}")
-            print(f"🔄 創建模擬影片作為備案")
-            self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
-            local_path = os.path.join(generated_dir, filename)
-        
-        # 檢查檔案是否成功創建
-        if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-            video_info = {
-                'url': f'/generated/{filename}',
-                'filename': filename,
-                'path': local_path,
-                'aspectRatio': aspect_ratio,
-                'duration': duration,
-                'file_size': os.path.getsize(local_path),
-                'timestamp': datetime.now().isoformat(),
-                'model': self.model_name
-            }
-            
-            print(f"✅ 影片已保存: {filename} ({os.path.getsize(local_path):,} bytes)")
-            
+        operation = self._post(model_name, 'predictLongRunning', body)
+        print(f"🛰️ 已建立操作: {operation['name']}")
+        return operation['name']
+    
+    def _track_operation(self, operation_name: str, model_name: str, prompt: str, aspect_ratio: str, duration: int,
+                         person_generation: str, progress_callback: Optional[Callable] = None,
+                         on_complete: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        交給操作追蹤器輪詢
+
+        有 on_complete 時立即回傳 deferred 結果，完成後由追蹤器呼叫 on_complete；
+        否則（同步呼叫）等待追蹤器完成後回傳結果。
+        """
+        context = {
+            'model_name': model_name,
+            'prompt': prompt,
+            'aspect_ratio': aspect_ratio,
+            'duration': duration,
+            'person_generation': person_generation
+        }
+        
+        def report_poll(attempts, elapsed):
+            # 真實進度無法得知，依等待時間估算（最多到 75%，保留下載與保存的進度）
+            progress_callback('generating', f'影片生成中（已等待 {elapsed:.0f} 秒）',
+                              progress=min(75, 10 + int(elapsed / 2)))
+        
+        on_poll = report_poll if progress_callback else None
+        if progress_callback:
+            progress_callback('submitted', f'已提交至 Vertex AI Veo（模型: {model_name}）',
+                              progress=10, model=model_name, operation=operation_name)
+        
+        job_id = getattr(progress_callback, 'job_id', None)
+        
+        if on_complete is not None:
+            self.operation_tracker.track('veo', operation_name, context, job_id=job_id,
+                                         on_complete=on_complete, on_poll=on_poll)
             return {
                 'success': True,
-                'videos': [video_info],
-                'total_count': 1,
-                'generation_time': f'{duration * 3} 秒',
-                'model': self.model_name,
-                'prompt': prompt,
-                'parameters': {
-                    'aspect_ratio': aspect_ratio,
-                    'duration': duration,
-                    'person_generation': person_generation
-                },
-                'mock_mode': False,
-                'api_type': 'Vertex AI'
-            }
-        else:
-            print(f"❌ 影片檔案創建失敗或檔案大小為0: {filename}")
-            return {
-                'success': False,
-                'error': '無法保存生成的影片'
+                'deferred': True,
+                'operation_name': operation_name,
+                'model': model_name
             }
+        
+        done = threading.Event()
+        results = []
+        
+        def finish(result):
+            results.append(result)
+            done.set()
+        
+        self.operation_tracker.track('veo', operation_name, context, job_id=job_id, on_complete=finish, on_poll=on_poll)
+        if not done.wait(timeout=self.operation_tracker.timeout + 60):
+            return {'success': False, 'error': '等待影片生成結果逾時'}
+        return results[0]
     
-    def _generate_with_prediction_api(self, prompt: str, aspect_ratio: str, duration: int, person_generation: str) -> Dict[str, Any]:
-        """使用 Prediction API 方式生成影片"""
-        try:
-            # 建立客戶端
-            client_options = {"api_endpoint": f"{self.location}-aiplatform.googleapis.com"}
-            client = aiplatform_v1.PredictionServiceClient(client_options=client_options)
-            
-            # 構建端點
-            endpoint = f"projects/{self.project_id}/locations/{self.location}/publishers/google/models/{self.model_name}"
-            
-            # 轉換人物生成設定
-            person_gen_mapping = {
-                'disallow': 'PERSON_GENERATION_DONT_ALLOW',
-                'allow_adult': 'PERSON_GENERATION_ALLOW_ALL'
-            }
-            person_gen_value = person_gen_mapping.get(person_generation, 'PERSON_GENERATION_DONT_ALLOW')
-            
-            # 構建請求參數
-            instances = [{
-                "prompt": prompt,
-                "config": {
-                    "aspect_ratio": aspect_ratio.replace(':', '_'),  # 16:9 -> 16_9
-                    "person_generation": person_gen_value,
-                    "duration": f"{duration}s"
-                }
-            }]
-            
-            # 調用 API
-            print(f"📝 發送影片生成請求（Prediction API）...")
-            print(f"   端點: {endpoint}")
-            print(f"   參數: {instances[0]}")
-            
-            response = client.predict(
-                endpoint=endpoint,
-                instances=instances
-            )
-            
-            # 處理響應
-            return self._process_prediction_response(response, prompt, aspect_ratio, duration, person_generation)
-            
-        except google_api_exceptions.ResourceExhausted as e:
-            print(f"❌ 配額超限錯誤: {e}")
-            raise e  # 重新拋出配額錯誤
-        except Exception as e:
-            print(f"❌ Prediction API 調用錯誤: {e}")
-            raise e
+    def _poll_operation(self, operation: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """查詢操作狀態（由操作追蹤器呼叫），未完成回傳 None"""
+        result = self._post(operation['context']['model_name'], 'fetchPredictOperation',
+                            {'operationName': operation['operation_name']})
+        return result if result.get('done') else None
     
-    def _process_prediction_response(self, response, prompt: str, aspect_ratio: str, duration: int, person_generation: str) -> Dict[str, Any]:
-        """處理 Prediction API 的響應"""
-        print(f"📝 影片生成請求已提交")
-        print(f"⏳ 正在處理響應...")
-        
-        # 處理響應
-        if not response.predictions:
-            print(f"❌ 響應中沒有預測結果")
-            print(f"⚠️ 可能 Vertex AI 的 Veo 模型尚未在此區域提供，回退到模擬模式")
-            return self._generate_mock_video(prompt, aspect_ratio, duration, person_generation)
+    def _complete_operation(self, operation: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """處理完成的操作：保存影片並組成生成結果（由操作追蹤器呼叫）"""
+        context = operation['context']
+        model_name = context['model_name']
+        prompt = context['prompt']
+        aspect_ratio = context['aspect_ratio']
+        duration = context['duration']
+        
+        if result.get('error'):
+            error = result['error']
+            message = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+            print(f"❌ Veo 操作失敗: {message}")
+            return {'success': False, 'error': f'影片生成失敗: {message}'}
+        
+        response = result.get('response', {})
+        predictions = response.get('videos', [])
+        if not predictions:
+            if response.get('raiMediaFilteredCount'):
+                return {'success': False, 'error': '生成的影片被安全過濾器阻擋，請調整 prompt 後再試'}
+            return {'success': False, 'error': 'Veo 未返回任何影片'}
         
         # 處理生成的影片
         videos = []
         
         # 確保 generated 目錄存在
-        generated_dir = os.path.join(os.getcwd(), 'generated')
+        generated_dir = self.generated_dir
         os.makedirs(generated_dir, exist_ok=True)
         
-        for i, prediction in enumerate(response.predictions):
+        for i, prediction in enumerate(predictions):
             try:
                 # 生成檔案名稱
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 safe_prompt = "".join(filter(str.isalnum, prompt[:30])).lower()
-                filename = f"veo_vertex_{safe_prompt}_{timestamp}_{i}.mp4"
+                file_id = str(uuid.uuid4())[:8]
+                filename = f"veo_vertex_{safe_prompt}_{timestamp}_{file_id}_{i}.mp4"
                 local_path = os.path.join(generated_dir, filename)
                 
                 print(f"📥 正在處理影片 {i+1}...")
                 
-                # 從預測結果中提取影片數據
-                if isinstance(prediction, dict):
-                    if 'video_uri' in prediction:
-                        # 如果有 video_uri，下載影片
-                        video_uri = prediction['video_uri']
-                        print(f"🔗 影片 URI: {video_uri}")
+                if 'gcsUri' in prediction:
+                    # 影片存放在 Cloud Storage，透過已認證的連線串流下載（中斷時續傳）
+                    video_uri = prediction['gcsUri']
+                    print(f"🔗 影片 URI: {video_uri}")
+                    bucket_and_path = video_uri[len('gs://'):]
+                    download_to_file(self._get_http_session(), f"https://storage.googleapis.com/{bucket_and_path}",
+                                     local_path, timeout=self.API_TIMEOUT)
                         
-                        # 下載影片檔案
-                        video_response = requests.get(video_uri)
-                        with open(local_path, 'wb') as f:
-                            f.write(video_response.content)
-                            
-                    elif 'video_bytes' in prediction:
-                        # 如果有 video_bytes，直接保存
-                        import base64
-                        video_bytes = base64.b64decode(prediction['video_bytes'])
-                        with open(local_path, 'wb') as f:
-                            f.write(video_bytes)
-                    else:
-                        # 創建模擬影片（臨時解決方案）
-                        print(f"⚠️ 預測結果中沒有影片數據，創建模擬影片")
-                        self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
-                        local_path = os.path.join(generated_dir, filename)
+                elif 'bytesBase64Encoded' in prediction:
+                    # 影片內容內嵌在回應中：取出後分段解碼寫入，不保留完整的解碼結果
+                    decode_base64_to_file(prediction.pop('bytesBase64Encoded'), local_path)
                 else:
-                    # 如果 prediction 不是字典，創建模擬影片
-                    print(f"⚠️ 預測結果格式未知，創建模擬影片")
-                    self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
-                    local_path = os.path.join(generated_dir, filename)
+                    print(f"⚠️ 操作結果中沒有影片數據: {list(prediction)}")
+                    continue
                 
                 # 檢查檔案是否成功創建
                 if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
@@ -417,7 +435,7 @@ class VeoService:
                         'duration': duration,
                         'file_size': os.path.getsize(local_path),
                         'timestamp': datetime.now().isoformat(),
-                        'model': self.model_name
+                        'model': model_name
                     }
                     videos.append(video_info)
                     print(f"✅ 影片 {i+1} 已保存: {filename} ({os.path.getsize(local_path):,} bytes)")
@@ -434,16 +452,17 @@ class VeoService:
                 'success': True,
                 'videos': videos,
                 'total_count': len(videos),
-                'generation_time': f'{len(videos) * 20} 秒',
-                'model': self.model_name,
+                'generation_time': f'{time.time() - operation["created_at"]:.0f} 秒',
+                'model': model_name,
                 'prompt': prompt,
                 'parameters': {
                     'aspect_ratio': aspect_ratio,
                     'duration': duration,
-                    'person_generation': person_generation
+                    'person_generation': context['person_generation']
                 },
+                'operation_name': operation['operation_name'],
                 'mock_mode': False,
-                'api_type': 'Vertex AI Prediction'
+                'api_type': 'Vertex AI Long-Running Operation'
             }
         else:
             return {
@@ -458,7 +477,8 @@ class VeoService:
         
         # 生成模擬影片資訊
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"veo_mock_{timestamp}_{duration}s_{aspect_ratio.replace(':', 'x')}.mp4"
+        file_id = str(uuid.uuid4())[:8]
+        filename = f"veo_mock_{timestamp}_{file_id}_{duration}s_{aspect_ratio.replace(':', 'x')}.mp4"
         
         # 創建符合標準的模擬影片檔案
         mock_video_path = self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
@@ -538,7 +558,7 @@ class VeoService:
     def _create_standard_mock_video(self, filename: str, duration: int, aspect_ratio: str, prompt: str) -> str:
         """創建符合標準的模擬影片檔案"""
         # 確保 generated 目錄存在
-        generated_dir = os.path.join(os.getcwd(), 'generated')
+        generated_dir = self.generated_dir
         os.makedirs(generated_dir, exist_ok=True)
         
         mp4_path = os.path.join(generated_dir, filename)
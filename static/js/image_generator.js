@@ -216,20 +216,17 @@ class ImageGenerator {
             try {
                 // 調用翻譯 API
                 console.log('📡 調用翻譯 API...');
-                const response = await apiRequest('/api/image/translate-prompt', {
-                    method: 'POST',
-                    body: JSON.stringify({ prompt: trimmedPrompt })
+                const translatedPrompt = await translatePromptStream('/api/image/translate-prompt/stream', trimmedPrompt, (partial) => {
+                    finalPromptDisplay.value = partial;
                 });
                 
-                console.log('📡 翻譯 API 回應:', response);
-                
-                if (response.success && response.translated_prompt) {
-                    console.log('✅ 翻譯成功:', response.translated_prompt);
-                    finalPromptDisplay.value = response.translated_prompt;
+                if (translatedPrompt) {
+                    console.log('✅ 翻譯成功:', translatedPrompt);
+                    finalPromptDisplay.value = translatedPrompt;
                     showNotification('已更新最終生成 Prompt（已轉換為英文）', 'success');
                 } else {
                     // 翻譯失敗，使用原始文本
-                    console.warn('⚠️ 翻譯失敗，使用原始文本:', response.error);
+                    console.warn('⚠️ 翻譯結果為空，使用原始文本');
                     finalPromptDisplay.value = trimmedPrompt;
                     showNotification('已更新最終生成 Prompt', 'success');
                 }
@@ -285,19 +282,28 @@ class ImageGenerator {
         try {
             showLoading('正在分析 Prompt 安全性...', false);
             
-            const response = await apiRequest('/api/image/optimize-prompt', {
-                method: 'POST',
-                body: JSON.stringify({ prompt, content_type: contentType })
+            // 每種風格完成即顯示，不必等待全部完成
+            let loadingHidden = false;
+            let streamError = null;
+            await streamRequest('/api/image/optimize-prompt/stream', { prompt, content_type: contentType }, (event) => {
+                if (event.type === 'error') {
+                    streamError = event.error;
+                    return;
+                }
+                if (event.type !== 'style') return;
+                if (!loadingHidden) {
+                    hideLoading();
+                    loadingHidden = true;
+                }
+                this.displayOptimizationResult(event.index + 1, event.prompt);
             });
             
             hideLoading();
             
-            if (response.error) {
-                throw new Error(response.error);
+            if (streamError) {
+                throw new Error(streamError);
             }
             
-            this.displayOptimizationResults(response.optimizations);
-            
         } catch (error) {
             hideLoading();
             handleError(error, 'Prompt 優化');
@@ -309,6 +315,25 @@ class ImageGenerator {
         }
     }
     
+    // 顯示單一風格的優化結果
+    displayOptimizationResult(optionNumber, optimizedPrompt) {
+        const resultsContainer = document.getElementById('optimization-results');
+        
+        if (!resultsContainer) return;
+        
+        if (resultsContainer.style.display !== 'block') {
+            resultsContainer.style.display = 'block';
+            resultsContainer.scrollIntoView({ behavior: 'smooth' });
+        }
+        
+        const optionElement = document.getElementById(`optimization-option-${optionNumber}`);
+        const textarea = optionElement?.querySelector('.optimization-textarea');
+        
+        if (textarea && optimizedPrompt) {
+            textarea.value = optimizedPrompt;
+        }
+    }
+    
     // 顯示優化選項
     displayOptimizationResults(optimizations) {
         const resultsContainer = document.getElementById('optimization-results');
@@ -512,20 +537,19 @@ class ImageGenerator {
                 
                 try {
                     // 使用 OpenAI 翻譯 API
-                    const translateResponse = await apiRequest('/api/image/translate-prompt', {
-                        method: 'POST',
-                        body: JSON.stringify({ prompt })
+                    const translatedPrompt = await translatePromptStream('/api/image/translate-prompt/stream', prompt, (partial) => {
+                        showLoading(`正在翻譯：${partial}`, false);
                     });
                     
                     // 隱藏翻譯載入畫面
                     hideLoading();
                     
-                    if (translateResponse.success && translateResponse.translated_prompt) {
-                        prompt = translateResponse.translated_prompt;
+                    if (translatedPrompt) {
+                        prompt = translatedPrompt;
                         console.log('🌐 OpenAI 翻譯結果:', prompt);
                         showNotification('已使用 OpenAI 翻譯為英文 Prompt', 'success');
                     } else {
-                        console.warn('翻譯失敗，使用原始文本:', translateResponse.error);
+                        console.warn('翻譯結果為空，使用原始文本');
                         showNotification('翻譯失敗，使用原始 Prompt', 'warning');
                     }
                 } catch (error) {
@@ -560,14 +584,13 @@ class ImageGenerator {
             
             showLoading('正在生成圖像...', true);
             
-            // 模擬進度更新
-            this.simulateProgress();
-            
-            const response = await apiRequest('/api/image/generate', {
+            const submission = await apiRequest('/api/image/generate', {
                 method: 'POST',
-                body: JSON.stringify(params)
+                body: JSON.stringify({ ...params, async: true })
             });
             
+            const response = await waitForJob(submission.job.job_id, (event) => this.handleJobProgress(event));
+            
             hideLoading();
             
             if (response.success) {
@@ -589,17 +612,16 @@ class ImageGenerator {
         }
     }
     
-    // 模擬進度更新
-    simulateProgress() {
-        let progress = 0;
-        const interval = setInterval(() => {
-            progress += Math.random() * 20;
-            if (progress >= 100) {
-                progress = 100;
-                clearInterval(interval);
-            }
-            updateLoadingProgress(Math.floor(progress));
-        }, 500);
+    // 顯示背景任務的真實進度
+    handleJobProgress(event) {
+        if (typeof event.progress === 'number') {
+            updateLoadingProgress(event.progress);
+        }
+        
+        const messageEl = document.getElementById('loading-message');
+        if (messageEl && event.message) {
+            messageEl.textContent = event.message;
+        }
     }
     
     // 驗證生成參數
@@ -693,6 +693,127 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+// 以 POST 發出請求並逐一處理回應中的 SSE 事件（EventSource 僅支援 GET）
+async function streamRequest(url, body, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+    });
+    
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `HTTP error! status: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop();
+        
+        for (const message of messages) {
+            const dataLines = message.split('\n')
+                .filter(line => line.startsWith('data: '))
+                .map(line => line.slice(6));
+            if (dataLines.length > 0) {
+                onEvent(JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+}
+
+// 串流翻譯 prompt，每收到一段文字即以目前累積的翻譯呼叫 onDelta
+async function translatePromptStream(url, prompt, onDelta = null) {
+    let translated = '';
+    let error = null;
+    
+    await streamRequest(url, { prompt }, (event) => {
+        if (event.type === 'delta') {
+            translated += event.content;
+            if (onDelta) {
+                onDelta(translated);
+            }
+        } else if (event.type === 'done') {
+            translated = event.translated_prompt;
+        } else if (event.type === 'error') {
+            error = event.error;
+        }
+    });
+    
+    if (error) {
+        throw new Error(error);
+    }
+    
+    return translated.trim();
+}
+
+// 等待背景生成任務完成（優先使用 SSE 串流真實進度，不支援時改用輪詢）
+function waitForJob(jobId, onProgress = null) {
+    if (!window.EventSource) {
+        return pollJob(jobId, onProgress);
+    }
+    
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        let finished = false;
+        
+        source.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            
+            if (onProgress) {
+                onProgress(event);
+            }
+            
+            if (event.stage === 'completed') {
+                finished = true;
+                source.close();
+                resolve(event.result);
+            } else if (event.stage === 'failed') {
+                finished = true;
+                source.close();
+                reject(new Error(event.message || '生成任務失敗'));
+            }
+        };
+        
+        source.onerror = () => {
+            if (finished) return;
+            // 串流中斷時改用輪詢取得最終結果
+            source.close();
+            pollJob(jobId, onProgress).then(resolve, reject);
+        };
+    });
+}
+
+// 輪詢背景生成任務狀態
+async function pollJob(jobId, onProgress = null, pollInterval = 2000) {
+    while (true) {
+        const response = await apiRequest(`/api/jobs/${jobId}`);
+        const job = response.job;
+        
+        if (onProgress) {
+            onProgress({ stage: job.stage, progress: job.progress });
+        }
+        
+        if (job.status === 'completed') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || '生成任務失敗');
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, pollInterval));
+    }
+}
+
 // 防抖函數
 function debounce(func, wait) {
     let timeout;
@@ -173,19 +173,28 @@ class VideoGenerator {
         try {
             showLoading('正在優化影片 Prompt...', false);
             
-            const response = await apiRequest('/api/video/optimize-prompt', {
-                method: 'POST',
-                body: JSON.stringify({ prompt: finalPrompt, content_type: contentType })
+            // 每種風格完成即顯示，不必等待全部完成
+            let loadingHidden = false;
+            let streamError = null;
+            await streamRequest('/api/video/optimize-prompt/stream', { prompt: finalPrompt, content_type: contentType }, (event) => {
+                if (event.type === 'error') {
+                    streamError = event.error;
+                    return;
+                }
+                if (event.type !== 'style') return;
+                if (!loadingHidden) {
+                    hideLoading();
+                    loadingHidden = true;
+                }
+                this.displayOptimizationResult(event.index + 1, event.prompt);
             });
             
             hideLoading();
             
-            if (response.error) {
-                throw new Error(response.error);
+            if (streamError) {
+                throw new Error(streamError);
             }
             
-            this.displayOptimizationResults(response.optimizations);
-            
         } catch (error) {
             hideLoading();
             handleError(error, 'Prompt 優化');
@@ -197,6 +206,25 @@ class VideoGenerator {
         }
     }
     
+    // 顯示單一風格的優化結果
+    displayOptimizationResult(optionNumber, optimizedPrompt) {
+        const resultsContainer = document.getElementById('video-optimization-results');
+        
+        if (!resultsContainer) return;
+        
+        if (resultsContainer.style.display !== 'block') {
+            resultsContainer.style.display = 'block';
+            resultsContainer.scrollIntoView({ behavior: 'smooth' });
+        }
+        
+        const optionElement = document.getElementById(`video-optimization-option-${optionNumber}`);
+        const textarea = optionElement?.querySelector('.optimization-textarea');
+        
+        if (textarea && optimizedPrompt) {
+            textarea.value = optimizedPrompt;
+        }
+    }
+    
     // 顯示優化選項
     displayOptimizationResults(optimizations) {
         const resultsContainer = document.getElementById('video-optimization-results');
@@ -306,20 +334,19 @@ class VideoGenerator {
                 
                 try {
                     // 使用 OpenAI 翻譯 API
-                    const translateResponse = await apiRequest('/api/video/translate-prompt', {
-                        method: 'POST',
-                        body: JSON.stringify({ prompt })
+                    const translatedPrompt = await translatePromptStream('/api/video/translate-prompt/stream', prompt, (partial) => {
+                        showLoading(`正在翻譯：${partial}`, false);
                     });
                     
                     // 隱藏翻譯載入畫面
                     hideLoading();
                     
-                    if (translateResponse.success && translateResponse.translated_prompt) {
-                        prompt = translateResponse.translated_prompt;
+                    if (translatedPrompt) {
+                        prompt = translatedPrompt;
                         console.log('🌐 OpenAI 翻譯結果:', prompt);
                         showNotification('已使用 OpenAI 翻譯為英文 Prompt', 'success');
                     } else {
-                        console.warn('翻譯失敗，使用原始文本:', translateResponse.error);
+                        console.warn('翻譯結果為空，使用原始文本');
                         showNotification('翻譯失敗，使用原始 Prompt', 'warning');
                     }
                 } catch (error) {
@@ -350,14 +377,13 @@ class VideoGenerator {
             
             showLoading('正在生成影片，這可能需要 2-3 分鐘...', true);
             
-            // 模擬進度更新
-            this.simulateProgress();
-            
-            const response = await apiRequest('/api/video/generate', {
+            const submission = await apiRequest('/api/video/generate', {
                 method: 'POST',
-                body: JSON.stringify(params)
+                body: JSON.stringify({ ...params, async: true })
             });
             
+            const response = await waitForJob(submission.job.job_id, (event) => this.handleJobProgress(event));
+            
             hideLoading();
             
             if (response.success) {
@@ -379,17 +405,16 @@ class VideoGenerator {
         }
     }
     
-    // 模擬進度更新
-    simulateProgress() {
-        let progress = 0;
-        const interval = setInterval(() => {
-            progress += Math.random() * 10;
-            if (progress >= 100) {
-                progress = 100;
-                clearInterval(interval);
-            }
-            updateLoadingProgress(Math.floor(progress));
-        }, 2000); // 較慢的進度更新，因為影片生成需要更長時間
+    // 顯示背景任務的真實進度
+    handleJobProgress(event) {
+        if (typeof event.progress === 'number') {
+            updateLoadingProgress(event.progress);
+        }
+        
+        const messageEl = document.getElementById('loading-message');
+        if (messageEl && event.message) {
+            messageEl.textContent = event.message;
+        }
     }
     
     // 驗證生成參數
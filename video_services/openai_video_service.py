@@ -5,42 +5,40 @@ OpenAI 影片生成服務
 
 import os
 import time
+import uuid
 import requests
 import subprocess
 import traceback
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from dotenv import load_dotenv
 
+from services.sdk_loader import import_sdk
+
 # 載入環境變數
 load_dotenv()
 
-# 嘗試導入 OpenAI SDK
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-    print("✅ OpenAI SDK 可用")
-except ImportError as e:
-    print(f"⚠️ OpenAI SDK 不可用: {e}")
-    print("💡 請執行: pip install openai")
-    OPENAI_AVAILABLE = False
-    
-    # 創建模擬的 OpenAI 類別
-    class openai:
-        class OpenAI:
-            def __init__(self, api_key=None):
-                raise Exception("OpenAI SDK 不可用")
-
 class OpenAIVideoService:
     """OpenAI 影片生成服務"""
     
-    def __init__(self):
-        """初始化 OpenAI 影片生成服務"""
+    def __init__(self, generated_dir: str = None):
+        """
+        初始化 OpenAI 影片生成服務
+
+        Args:
+            generated_dir: 影片輸出目錄（未指定時使用 Config.GENERATED_FOLDER）
+        """
+        if generated_dir is None:
+            from config.config import Config
+            generated_dir = Config.GENERATED_FOLDER
+        self.generated_dir = generated_dir
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.model = os.getenv('OPENAI_VIDEO_GEN_MODEL', 'veo-2.0-generate-001')
         self.use_mock = False
         
-        if not OPENAI_AVAILABLE:
+        # OpenAI SDK 延遲到建立服務時才匯入
+        openai = import_sdk('openai', 'pip install openai')
+        if openai is None:
             print("⚠️ OpenAI SDK 不可用，將使用模擬模式")
             self.use_mock = True
             return
@@ -62,7 +60,7 @@ class OpenAIVideoService:
             print(f"❌ OpenAI 影片服務初始化失敗: {e}")
             self.use_mock = True
     
-    def generate_videos(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_videos(self, params: Dict[str, Any], progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
         """
         生成影片
         
@@ -72,11 +70,14 @@ class OpenAIVideoService:
                 - aspectRatio: 影片比例 ('16:9' 或 '9:16')
                 - duration: 影片長度 (5-8 秒)
                 - personGeneration: 人物生成設定
+            progress_callback: 進度回報函數 (stage, message, **details)
         
         Returns:
             包含生成結果的字典
         """
         if self.use_mock:
+            if progress_callback:
+                progress_callback('submitted', '使用模擬模式生成影片', progress=10)
             return self._generate_mock_video(params)
         
         try:
@@ -93,6 +94,9 @@ class OpenAIVideoService:
             duration = params.get('duration', 5)
             person_generation = params.get('personGeneration', 'allow_adult')
             
+            if progress_callback:
+                progress_callback('validated', '參數驗證完成', progress=5)
+            
             print(f"🎬 開始生成影片 (OpenAI)...")
             print(f"   Prompt: {prompt[:100]}...")
             print(f"   比例: {aspect_ratio}, 長度: {duration}秒")
@@ -137,7 +141,8 @@ class OpenAIVideoService:
         
         # 生成模擬影片資訊
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"openai_mock_{timestamp}_{duration}s_{aspect_ratio.replace(':', 'x')}.mp4"
+        file_id = str(uuid.uuid4())[:8]
+        filename = f"openai_mock_{timestamp}_{file_id}_{duration}s_{aspect_ratio.replace(':', 'x')}.mp4"
         
         # 創建符合標準的模擬影片檔案
         mock_video_path = self._create_standard_mock_video(filename, duration, aspect_ratio, prompt)
@@ -174,9 +179,8 @@ class OpenAIVideoService:
     
     def _create_standard_mock_video(self, filename: str, duration: int, aspect_ratio: str, prompt: str) -> str:
         """創建符合標準的模擬影片檔案"""
-        generated_dir = os.path.join(os.getcwd(), 'generated')
-        os.makedirs(generated_dir, exist_ok=True)
-        output_path = os.path.join(generated_dir, filename)
+        os.makedirs(self.generated_dir, exist_ok=True)
+        output_path = os.path.join(self.generated_dir, filename)
         
         # 根據比例設定解析度
         if aspect_ratio == '16:9':
@@ -16,7 +16,8 @@ except ImportError:
 class VeoService:
     """Veo 影片生成服務（支援 Vertex AI）"""
     
-    def __init__(self, project_id: str = None, location: str = "us-central1", use_mock: bool = False, model_name: str = None):
+    def __init__(self, project_id: str = None, location: str = "us-central1", use_mock: bool = False, model_name: str = None,
+                 output_dir: str = None):
         """
         初始化 Veo 服務
         
@@ -25,6 +26,7 @@ class VeoService:
             location: Google Cloud 區域
             use_mock: 是否使用模擬模式
             model_name: 使用的模型名稱（如果未指定則使用環境變數或預設值）
+            output_dir: 影片輸出目錄（未指定時使用 Config.GENERATED_FOLDER 下的 videos）
         """
         self.project_id = project_id
         self.location = location
@@ -43,7 +45,10 @@ class VeoService:
         self.supported_styles = ['natural', 'cinematic', 'artistic']
         
         # 建立輸出目錄
-        self.output_dir = 'generated/videos'
+        if output_dir is None:
+            from config.config import Config
+            output_dir = os.path.join(Config.GENERATED_FOLDER, 'videos')
+        self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         
         if not self.use_mock and VERTEX_AI_AVAILABLE and project_id: